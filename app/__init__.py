@@ -4,7 +4,7 @@ import os
 from flask_migrate import Migrate
 from .config import BaseConfig
 from .models import db
-from .extensions import login_manager, bcrypt
+from .extensions import login_manager, bcrypt, broker, jobs
 
 def create_app():
     app = Flask(__name__)
@@ -44,6 +44,16 @@ def create_app():
     login_manager.init_app(app)
     bcrypt.init_app(app)
 
+    # tempo real
+    broker.init_app(app)
+
+    # tarefas em segundo plano
+    jobs.init_app(app)
+
+    # encerra castigos vencidos periodicamente (as leituras de castigo não gravam)
+    from .utils.mutes import sweep_expired_mutes
+    jobs.schedule(sweep_expired_mutes, app.config.get('MUTE_SWEEP_INTERVAL', 60))
+
     # Jinja helpers
     # Tentamos importar os helpers (se existirem e forem compatíveis com a versão do Python).
     # Se a importação falhar (ex.: sintaxe não suportada no ambiente), registramos
@@ -100,5 +110,8 @@ def create_app():
     app.register_blueprint(comunidade_bp)
     app.register_blueprint(dashboard_bp)
 
+    # comandos de manutenção (flask --app run <comando>)
+    from .commands import register_commands
+    register_commands(app)
 
     return app
\ No newline at end of file
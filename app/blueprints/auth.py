@@ -69,7 +69,7 @@ def login():
     if request.method == 'POST':
         email = request.form.get('email')
         senha = request.form.get('senha')
-        usuario = Usuario.query.filter_by(email=email).first()
+        usuario = Usuario.query.filter_by(email=email, deleted_at=None).first()
 
         if not email or not senha:
             flash('E-mail e senha são obrigatórios.', 'warning')
@@ -98,4 +98,6 @@ def logout():
 # Função para o Flask-Login recarregar o usuário a partir do ID salvo na sessão
 @login_manager.user_loader
 def load_user(user_id):
-    return Usuario.query.get(int(user_id))
\ No newline at end of file
+    # Snapshot em cache (utils.identity); contas excluídas encerram a sessão
+    from ..utils.identity import load_session_user
+    return load_session_user(int(user_id))
\ No newline at end of file
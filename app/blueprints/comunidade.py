@@ -1,8 +1,23 @@
 #Rota responsável por renderizar a página da comunidade e lidar com postagens
-from flask import Blueprint, render_template, request, redirect, url_for, jsonify, flash
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify, flash, Response, stream_with_context
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta
-from ..models import db, CommunityPost, Community, CommunityBlock, CommunityPostLike, CommunityPostComment, Usuario
+from ..models import db, CommunityPost, Community, CommunityBlock, CommunityPostLike, CommunityPostComment, CommunityMember, Usuario
+from ..utils.feed import (visible_posts_query, fetch_feed_page, fetch_comments_page, attach_post_stats,
+                          is_valid_cursor, FEED_SORTS)
+from ..utils.counters import bump_post_likes, bump_post_comments
+from ..utils.membership import touch_membership
+from ..utils.realtime import sse_stream, community_channel
+from ..utils.community_cache import invalidate_catalog
+from ..utils.notifications import notify_admins_async
+from ..utils.spam import screen_new_post, announce_duplicate_post
+from ..utils.sensitive_terms import (
+    screen_post_terms, screen_comment_terms, screen_community_terms, announce_sensitive_terms
+)
+from ..utils.user_stats import bump_user_stat, recount_user_stats
+from ..utils.moderation import delete_posts
+from ..utils.identity import invalidate_identity
+from ..extensions import broker
 
 comunidade_bp = Blueprint('comunidade', __name__, url_prefix='/comunidade')
 
@@ -20,46 +35,18 @@ def minhas_comunidades():
     """Lista apenas comunidades em que o usuário é membro (dono ou interagiu)."""
     include_filtered = request.args.get('include_filtered', 'false').lower() == 'true'
 
-    # Subconsultas de participação por posts, comentários e likes
-    user_post_communities = db.session.query(CommunityPost.community_id).filter(
-        CommunityPost.author_id == current_user.id
-    )
-
-    user_comment_communities = (db.session.query(CommunityPost.community_id)
-        .join(CommunityPostComment, CommunityPostComment.post_id == CommunityPost.id)
-        .filter(CommunityPostComment.user_id == current_user.id)
-    )
-
-    user_like_communities = (db.session.query(CommunityPost.community_id)
-        .join(CommunityPostLike, CommunityPostLike.post_id == CommunityPost.id)
-        .filter(CommunityPostLike.user_id == current_user.id)
-    )
-
-    # Comunidades bloqueadas pelo usuário (para exclusão)
-    blocked_ids = db.session.query(CommunityBlock.community_id).filter(
-        CommunityBlock.user_id == current_user.id
-    )
-
-    query = Community.query.filter(Community.status == 'active')
-
-    # Participação: dono ou interagiu (post, comentário, like)
-    query = query.filter(
-        (
-            (Community.owner_id == current_user.id) |
-            (Community.id.in_(user_post_communities)) |
-            (Community.id.in_(user_comment_communities)) |
-            (Community.id.in_(user_like_communities))
-        )
-    )
-
-    # Excluir bloqueadas
-    query = query.filter(~Community.id.in_(blocked_ids))
-
-    # Filtragem de conteúdo sensível
-    if not include_filtered:
-        query = query.filter(Community.is_filtered.is_(False))
-
-    comunidades = query.order_by(Community.created_at.asc()).all()
+    # Participação materializada em tb_community_members (dono, posts, comentários e likes),
+    # cruzada com as comunidades acessíveis em cache (ativas, não bloqueadas e, se
+    # for o caso, sem filtro de conteúdo sensível)
+    member_ids = {
+        row[0] for row in CommunityMember.query
+        .with_entities(CommunityMember.community_id)
+        .filter_by(user_id=current_user.id)
+    }
+    comunidades = [
+        comunidade for comunidade in current_user.get_accessible_communities(include_filtered=include_filtered)
+        if comunidade.id in member_ids
+    ]
 
     return render_template('lista_comunidades.html', comunidades=comunidades)
 
@@ -109,22 +96,114 @@ def comunidade_users(community_id):
             
             nova_mensagem = CommunityPost(content=texto, author_id=current_user.id, community_id=comunidade.id)
             db.session.add(nova_mensagem)
+            touch_membership(current_user.id, comunidade.id)
+            bump_user_stat(current_user.id, 'posts', 1)
+            duplicates = screen_new_post(nova_mensagem, current_user)
+            terms = screen_post_terms(nova_mensagem, current_user)
             db.session.commit()
+            if duplicates:
+                announce_duplicate_post(nova_mensagem, duplicates)
+            if terms:
+                announce_sensitive_terms('post', nova_mensagem.id, terms,
+                                         url_for('posts.view_post', post_id=nova_mensagem.id))
+            if not nova_mensagem.is_hidden:
+                broker.publish(community_channel(comunidade.id), 'post_created', {'post_id': nova_mensagem.id})
             return redirect(url_for('comunidade.comunidade_users', community_id=comunidade.id))
 
-    # Filtrar posts: mostrar todos para admin, ocultos apenas para o autor
-    query = CommunityPost.query.filter_by(community_id=comunidade.id)
-    if not current_user.is_admin:
-        # Usuários comuns só veem posts não ocultos ou seus próprios posts ocultos
-        from sqlalchemy import or_
-        query = query.filter(
-            or_(
-                CommunityPost.is_hidden == False,
-                (CommunityPost.is_hidden == True) & (CommunityPost.author_id == current_user.id)
-            )
-        )
-    mensagens = query.order_by(CommunityPost.created_at.desc()).all()
-    return render_template('comunidade.html', comunidade=comunidade, mensagens=mensagens)
+    # Primeira página do feed (as demais vêm de comunidade.community_feed)
+    sort = request.args.get('sort', 'new')
+    if sort not in FEED_SORTS:
+        sort = 'new'
+    query = visible_posts_query(comunidade.id, current_user)
+    mensagens, next_cursor = fetch_feed_page(query, sort=sort)
+    attach_post_stats(mensagens, current_user)
+    return render_template('comunidade.html', comunidade=comunidade, mensagens=mensagens,
+                           next_cursor=next_cursor, sort=sort)
+
+@comunidade_bp.route('/<int:community_id>/feed', methods=['GET'])
+@login_required
+def community_feed(community_id):
+    """Próxima página do feed (JSON com os posts já renderizados)"""
+    comunidade = Community.query.get_or_404(community_id)
+
+    if not comunidade.can_user_access(current_user.id) or current_user.is_community_blocked(community_id):
+        return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+
+    sort = request.args.get('sort', 'new')
+    if sort not in FEED_SORTS:
+        sort = 'new'
+    cursor = request.args.get('cursor')
+    if not is_valid_cursor(cursor, sort):
+        return jsonify({'success': False, 'message': 'Cursor inválido'}), 400
+    query = visible_posts_query(comunidade.id, current_user)
+    mensagens, next_cursor = fetch_feed_page(query, cursor=cursor, sort=sort)
+    attach_post_stats(mensagens, current_user)
+    html = render_template('comunidade/_post_list.html', comunidade=comunidade, mensagens=mensagens)
+
+    return jsonify({
+        'success': True,
+        'html': html,
+        'count': len(mensagens),
+        'next_cursor': next_cursor
+    })
+
+@comunidade_bp.route('/<int:community_id>/stream', methods=['GET'])
+@login_required
+def community_stream(community_id):
+    """Stream SSE com novos posts, comentários, curtidas e ocultações/exclusões"""
+    comunidade = Community.query.get_or_404(community_id)
+
+    if not comunidade.can_user_access(current_user.id) or current_user.is_community_blocked(community_id):
+        return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+
+    # A conexão fica aberta por muito tempo: devolver a conexão do banco ao pool
+    db.session.close()
+
+    response = Response(stream_with_context(sse_stream(broker, community_channel(community_id))),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@comunidade_bp.route('/<int:community_id>/post/<int:post_id>/card', methods=['GET'])
+@login_required
+def post_card(community_id, post_id):
+    """Um post renderizado para o usuário atual (usado pelas atualizações em tempo real)"""
+    comunidade = Community.query.get_or_404(community_id)
+
+    if not comunidade.can_user_access(current_user.id) or current_user.is_community_blocked(community_id):
+        return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+
+    post = visible_posts_query(comunidade.id, current_user).filter(CommunityPost.id == post_id).first()
+    if not post:
+        return jsonify({'success': False, 'message': 'Post não encontrado'}), 404
+
+    attach_post_stats([post], current_user)
+    html = render_template('comunidade/_post_list.html', comunidade=comunidade, mensagens=[post])
+    return jsonify({'success': True, 'html': html})
+
+@comunidade_bp.route('/<int:community_id>/post/<int:post_id>/comments', methods=['GET'])
+@login_required
+def post_comments(community_id, post_id):
+    """Comentários mais antigos de um post (JSON com os comentários já renderizados)"""
+    comunidade = Community.query.get_or_404(community_id)
+
+    if not comunidade.can_user_access(current_user.id) or current_user.is_community_blocked(community_id):
+        return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+
+    before = request.args.get('before')
+    if not is_valid_cursor(before):
+        return jsonify({'success': False, 'message': 'Cursor inválido'}), 400
+    post = visible_posts_query(comunidade.id, current_user).filter(CommunityPost.id == post_id).first_or_404()
+    comments, next_cursor = fetch_comments_page(post.id, before=before)
+    html = render_template('comunidade/_comment_list.html', comments=comments, community_owner_id=comunidade.owner_id)
+
+    return jsonify({
+        'success': True,
+        'html': html,
+        'count': len(comments),
+        'next_cursor': next_cursor
+    })
 
 @comunidade_bp.route('/<int:community_id>/post/<int:post_id>/like', methods=['POST'])
 @login_required
@@ -133,12 +212,23 @@ def like_post(community_id, post_id):
     existing = CommunityPostLike.query.filter_by(user_id=current_user.id, post_id=post.id).first()
     if existing:
         db.session.delete(existing)
+        bump_post_likes(post.id, -1)
+        bump_user_stat(current_user.id, 'likes', -1)
         db.session.commit()
-        return jsonify({'liked': False, 'likes_count': CommunityPostLike.query.filter_by(post_id=post.id).count()})
+        likes_count = post.likes_count()
+        broker.publish(community_channel(community_id), 'likes_changed',
+                       {'post_id': post.id, 'delta': -1, 'likes_count': likes_count})
+        return jsonify({'liked': False, 'likes_count': likes_count})
     novo = CommunityPostLike(user_id=current_user.id, post_id=post.id)
     db.session.add(novo)
+    bump_post_likes(post.id, 1)
+    bump_user_stat(current_user.id, 'likes', 1)
+    touch_membership(current_user.id, post.community_id)
     db.session.commit()
-    return jsonify({'liked': True, 'likes_count': CommunityPostLike.query.filter_by(post_id=post.id).count()})
+    likes_count = post.likes_count()
+    broker.publish(community_channel(community_id), 'likes_changed',
+                   {'post_id': post.id, 'delta': 1, 'likes_count': likes_count})
+    return jsonify({'liked': True, 'likes_count': likes_count})
 
 @comunidade_bp.route('/<int:community_id>/post/<int:post_id>/comment', methods=['POST'])
 @login_required
@@ -149,22 +239,36 @@ def comment_post(community_id, post_id):
         return jsonify({'success': False, 'message': 'Comentário vazio'}), 400
     comment = CommunityPostComment(user_id=current_user.id, post_id=post.id, text=text)
     db.session.add(comment)
+    bump_post_comments(post.id, 1)
+    bump_user_stat(current_user.id, 'comments', 1)
+    touch_membership(current_user.id, post.community_id)
+    terms = screen_comment_terms(comment, current_user)
     db.session.commit()
+    if terms:
+        announce_sensitive_terms('comment', comment.id, terms, url_for('posts.view_post', post_id=post.id))
     
     # Importar o helper de formatação de data
     from ..utils.helpers import format_datetime
     
+    comment_data = {
+        'id': comment.id,
+        'author': current_user.nome,
+        'author_id': current_user.id,
+        'text': comment.text,
+        'created_at': format_datetime(comment.created_at, '%d/%m/%Y %H:%M'),
+        'created_at_iso': comment.created_at.isoformat(),
+        'created_at_ts': int(comment.created_at.timestamp() * 1000)
+    }
+    comments_count = post.comments_count()
+    # Post oculto: o stream é de todos da comunidade, o comentário não pode vazar por ele
+    if not post.is_hidden:
+        broker.publish(community_channel(community_id), 'comment_created',
+                       {'post_id': post.id, 'comments_count': comments_count, 'comment': comment_data})
+    
     return jsonify({
         'success': True,
-        'comments_count': CommunityPostComment.query.filter_by(post_id=post.id).count(),
-        'comment': {
-            'id': comment.id,
-            'author': current_user.nome,
-            'text': comment.text,
-            'created_at': format_datetime(comment.created_at, '%d/%m/%Y %H:%M'),
-            'created_at_iso': comment.created_at.isoformat(),
-            'created_at_ts': int(comment.created_at.timestamp() * 1000)
-        }
+        'comments_count': comments_count,
+        'comment': comment_data
     })
 
 @comunidade_bp.route('/criar', methods=['GET', 'POST'])
@@ -177,7 +281,15 @@ def criar_comunidade():
         if nome:
             nova_comunidade = Community(owner_id=current_user.id, name=nome, description=descricao)
             db.session.add(nova_comunidade)
+            db.session.flush()
+            touch_membership(current_user.id, nova_comunidade.id)
+            bump_user_stat(current_user.id, 'communities', 1)
+            terms = screen_community_terms(nova_comunidade, current_user)
             db.session.commit()
+            invalidate_catalog()
+            if terms:
+                announce_sensitive_terms('community', nova_comunidade.id, terms,
+                                         url_for('comunidade.comunidade_users', community_id=nova_comunidade.id))
             return redirect(url_for('comunidade.comunidade_users', community_id=nova_comunidade.id))
 
     return render_template('criar_comunidade.html')
@@ -203,13 +315,19 @@ def delete_community(community_id):
     community_name = comunidade.name
     
     try:
-        # Deletar todos os posts relacionados (e seus likes/comentários serão deletados em cascata)
-        CommunityPost.query.filter_by(community_id=community_id).delete()
+        post_ids = [row[0] for row in db.session.query(CommunityPost.id).filter_by(community_id=community_id)]
+        # Deletar todos os posts relacionados, com comentários, curtidas e impressões digitais (recalcula os perfis envolvidos)
+        delete_posts(post_ids)
         # Deletar todos os bloqueios relacionados à comunidade
         CommunityBlock.query.filter_by(community_id=community_id).delete()
+        # Deletar a participação dos membros
+        CommunityMember.query.filter_by(community_id=community_id).delete()
         # Deletar a comunidade
         db.session.delete(comunidade)
+        # Dono: contador de comunidades criadas
+        recount_user_stats([comunidade.owner_id])
         db.session.commit()
+        invalidate_catalog()
         flash(f'Comunidade "{community_name}" foi apagada com sucesso.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -271,6 +389,7 @@ def admin_block_community(community_id):
     comunidade = Community.query.get_or_404(community_id)
     comunidade.status = 'blocked'
     db.session.commit()
+    invalidate_catalog()
     
     flash(f'Comunidade "{comunidade.name}" foi bloqueada.', 'success')
     return redirect(url_for('comunidade.comunidade'))
@@ -286,6 +405,7 @@ def admin_unblock_community(community_id):
     comunidade = Community.query.get_or_404(community_id)
     comunidade.status = 'active'
     db.session.commit()
+    invalidate_catalog()
     
     flash(f'Comunidade "{comunidade.name}" foi desbloqueada.', 'success')
     return redirect(url_for('comunidade.comunidade'))
@@ -304,6 +424,7 @@ def admin_filter_community(community_id):
     comunidade.is_filtered = True
     comunidade.filter_reason = reason
     db.session.commit()
+    invalidate_catalog()
     
     flash(f'Comunidade "{comunidade.name}" foi marcada como filtrada.', 'success')
     return redirect(url_for('comunidade.comunidade'))
@@ -320,6 +441,7 @@ def admin_unfilter_community(community_id):
     comunidade.is_filtered = False
     comunidade.filter_reason = None
     db.session.commit()
+    invalidate_catalog()
     
     flash(f'Comunidade "{comunidade.name}" teve o filtro removido.', 'success')
     return redirect(url_for('comunidade.comunidade'))
@@ -343,15 +465,10 @@ def delete_post(community_id, post_id):
         return redirect(url_for('comunidade.comunidade_users', community_id=community_id))
     
     try:
-        # Deletar comentários associados
-        CommunityPostComment.query.filter_by(post_id=post_id).delete()
-        
-        # Deletar likes associados
-        CommunityPostLike.query.filter_by(post_id=post_id).delete()
-        
-        # Deletar o post
-        db.session.delete(post)
+        # Post, comentários, curtidas e impressões digitais; recalcula os contadores do perfil dos envolvidos
+        delete_posts([post_id])
         db.session.commit()
+        broker.publish(community_channel(community_id), 'post_deleted', {'post_id': post_id})
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return jsonify({'success': True, 'message': 'Post excluído'})
@@ -385,10 +502,15 @@ def delete_comment(comment_id):
     
     try:
         db.session.delete(comentario)
+        bump_post_comments(post_id, -1)
+        bump_user_stat(comentario.user_id, 'comments', -1)
         db.session.commit()
         
         # Contar comentários restantes
-        comments_count = CommunityPostComment.query.filter_by(post_id=post_id).count()
+        comments_count = post.comments_count() if post else 0
+        if post:
+            broker.publish(community_channel(post.community_id), 'comment_deleted',
+                           {'post_id': post_id, 'comment_id': comment_id, 'comments_count': comments_count})
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return jsonify({'success': True, 'message': 'Comentário excluído', 'comments_count': comments_count})
@@ -414,6 +536,7 @@ def hide_post(community_id, post_id):
     post.hidden_by = current_user.id
     post.hidden_at = datetime.utcnow()
     db.session.commit()
+    broker.publish(community_channel(post.community_id), 'post_visibility', {'post_id': post.id, 'hidden': True})
     
     return jsonify({'success': True, 'message': 'Post ocultado com sucesso'})
 
@@ -429,6 +552,7 @@ def unhide_post(community_id, post_id):
     post.hidden_by = None
     post.hidden_at = None
     db.session.commit()
+    broker.publish(community_channel(post.community_id), 'post_visibility', {'post_id': post.id, 'hidden': False})
     
     return jsonify({'success': True, 'message': 'Post desocultado com sucesso'})
 
@@ -445,6 +569,7 @@ def ban_user(user_id):
     
     user.is_banned = True
     db.session.commit()
+    invalidate_identity([user.id])
     
     return jsonify({'success': True, 'message': f'Usuário {user.nome} foi banido permanentemente'})
 
@@ -458,6 +583,7 @@ def unban_user(user_id):
     user = Usuario.query.get_or_404(user_id)
     user.is_banned = False
     db.session.commit()
+    invalidate_identity([user.id])
     
     return jsonify({'success': True, 'message': f'Usuário {user.nome} foi desbanido'})
 
@@ -480,6 +606,7 @@ def mute_user(user_id):
     user.mute_until = datetime.utcnow() + timedelta(days=days)
     user.mute_reason = reason
     db.session.commit()
+    invalidate_identity([user.id])
     
     from ..utils.helpers import format_datetime
     
@@ -500,6 +627,7 @@ def unmute_user(user_id):
     user.mute_until = None
     user.mute_reason = None
     db.session.commit()
+    invalidate_identity([user.id])
     
     return jsonify({'success': True, 'message': f'Castigo removido de {user.nome}'})
 
@@ -513,20 +641,12 @@ def appeal_mute():
     if not current_user.is_currently_muted():
         return jsonify({'success': False, 'message': 'Você não está sob castigo'}), 400
     
-    # Criar notificação para todos os admins sobre o recurso
-    from ..models import Notification
-    admins = Usuario.query.filter_by(is_admin=True).all()
-    for admin in admins:
-        notification = Notification(
-            user_id=admin.id,
-            type='appeal',
-            title='Recurso de Castigo',
-            message=f'O usuário {current_user.nome} está apelando de seu castigo. Motivo do castigo: {current_user.mute_reason or "Não especificado"}. Mensagem do usuário: {appeal_message}',
-            link=url_for('users.profile', user_id=current_user.id),
-            is_read=False
-        )
-        db.session.add(notification)
-    
-    db.session.commit()
+    # Notificar todos os admins sobre o recurso em segundo plano (um único INSERT em lote)
+    notify_admins_async(
+        'appeal',
+        'Recurso de Castigo',
+        f'O usuário {current_user.nome} está apelando de seu castigo. Motivo do castigo: {current_user.mute_reason or "Não especificado"}. Mensagem do usuário: {appeal_message}',
+        url_for('users.profile', user_id=current_user.id)
+    )
     
     return jsonify({'success': True, 'message': 'Recurso enviado. Os administradores serão notificados.'})
\ No newline at end of file
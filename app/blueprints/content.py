@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
 from flask_login import login_required, current_user
 from ..models import Content, Rating, db, Category, ContentCategory
+from ..utils.user_stats import bump_user_stat, recount_user_stats
 import os
 from werkzeug.utils import secure_filename
 import uuid
@@ -163,6 +164,7 @@ def create_content():
         )
 
         db.session.add(new_content)
+        bump_user_stat(current_user.id, 'contents', 1)
         db.session.commit()
 
         flash('Conteúdo criado com sucesso!', 'success')
@@ -263,6 +265,7 @@ def rate_content(content_id):
         existing.rating = rating_value
     else:
         db.session.add(Rating(user_id=current_user.id, content_id=content_id, rating=rating_value))
+        bump_user_stat(current_user.id, 'ratings', 1)
 
     db.session.commit()
     flash('Avaliação registrada com sucesso!', 'success')
@@ -303,7 +306,11 @@ def delete_content(content_id):
             if os.path.exists(thumb_path):
                 os.remove(thumb_path)
 
+        # As avaliações do conteúdo (de qualquer usuário) são apagadas em cascata
+        affected_user_ids = {content.user_id}
+        affected_user_ids.update(row[0] for row in db.session.query(Rating.user_id).filter_by(content_id=content.id))
         db.session.delete(content)
+        recount_user_stats(affected_user_ids)
         db.session.commit()
         flash('Conteúdo deletado com sucesso!', 'success')
     except Exception as e:
@@ -326,6 +333,7 @@ def remove_rating(rating_id):
 
     try:
         db.session.delete(rating)
+        bump_user_stat(rating.user_id, 'ratings', -1)
         db.session.commit()
         flash('Avaliação removida com sucesso!', 'success')
     except Exception as e:
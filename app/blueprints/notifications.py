@@ -1,31 +1,61 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, Response, stream_with_context, abort
 from flask_login import login_required, current_user
-from app.models import db, Notification
+from app.models import db, Notification, NotificationArchive
+from app.utils.notifications import (recent_notifications_payload, notification_stream,
+                                     announce_notifications_changed, bump_unread,
+                                     delete_orphan_payloads)
+from app.utils.feed import decode_cursor, encode_cursor
 from datetime import datetime
 
 notifications_bp = Blueprint('notifications', __name__, url_prefix='/notifications')
 
+# Notificações arquivadas por página
+ARCHIVE_PAGE_SIZE = 30
+
 @notifications_bp.route('/')
 @login_required
 def list_notifications():
     """Lista todas as notificações do usuário"""
     notifications = Notification.query.filter_by(user_id=current_user.id)\
-        .order_by(Notification.created_at.desc())\
+        .order_by(Notification.activity_at.desc(), Notification.id.desc())\
         .limit(50)\
         .all()
+    has_archive = db.session.query(NotificationArchive.id).filter_by(user_id=current_user.id).first() is not None
     
-    return render_template('notifications/list.html', notifications=notifications)
+    return render_template('notifications/list.html', notifications=notifications, has_archive=has_archive)
+
+@notifications_bp.route('/archive')
+@login_required
+def archive():
+    """Notificações antigas já lidas (arquivadas pela retenção), paginadas por cursor"""
+    query = NotificationArchive.query.filter_by(user_id=current_user.id)
+
+    before = request.args.get('before')
+    decoded = decode_cursor(before)
+    if before and decoded is None:
+        abort(400, 'Cursor inválido')
+    if decoded:
+        created_at, archived_id = decoded
+        query = query.filter(db.or_(
+            NotificationArchive.created_at < created_at,
+            db.and_(NotificationArchive.created_at == created_at, NotificationArchive.id < archived_id)
+        ))
+
+    notifications = query.order_by(NotificationArchive.created_at.desc(), NotificationArchive.id.desc())\
+        .limit(ARCHIVE_PAGE_SIZE + 1)\
+        .all()
+    next_cursor = None
+    if len(notifications) > ARCHIVE_PAGE_SIZE:
+        notifications = notifications[:ARCHIVE_PAGE_SIZE]
+        next_cursor = encode_cursor(notifications[-1])
+
+    return render_template('notifications/archive.html', notifications=notifications, next_cursor=next_cursor)
 
 @notifications_bp.route('/unread-count')
 @login_required
 def unread_count():
     """Retorna o número de notificações não lidas (JSON)"""
-    count = Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).count()
-    
-    return jsonify({'count': count})
+    return jsonify({'count': current_user.unread_notifications})
 
 @notifications_bp.route('/<int:notification_id>/read', methods=['POST'])
 @login_required
@@ -37,8 +67,12 @@ def mark_as_read(notification_id):
     if notification.user_id != current_user.id:
         return jsonify({'success': False, 'message': 'Acesso negado'}), 403
     
-    notification.is_read = True
+    # UPDATE condicional: só desconta do contador se ainda não estava lida
+    marked = Notification.query.filter_by(id=notification.id, is_read=False)\
+        .update({'is_read': True}, synchronize_session=False)
+    bump_unread([current_user.id], -marked)
     db.session.commit()
+    announce_notifications_changed(current_user.id)
     
     return jsonify({'success': True})
 
@@ -46,11 +80,13 @@ def mark_as_read(notification_id):
 @login_required
 def mark_all_as_read():
     """Marca todas as notificações do usuário como lidas"""
-    Notification.query.filter_by(
+    marked = Notification.query.filter_by(
         user_id=current_user.id,
         is_read=False
     ).update({'is_read': True})
+    bump_unread([current_user.id], -marked)
     db.session.commit()
+    announce_notifications_changed(current_user.id)
     
     return jsonify({'success': True})
 
@@ -58,8 +94,18 @@ def mark_all_as_read():
 @login_required
 def delete_all():
     """Apaga todas as notificações do usuário"""
+    payload_ids = {row[0] for row in db.session.query(Notification.payload_id)
+                   .filter_by(user_id=current_user.id).distinct()}
+    payload_ids.update(row[0] for row in db.session.query(NotificationArchive.payload_id)
+                       .filter_by(user_id=current_user.id).distinct())
+    unread_deleted = Notification.query.filter_by(user_id=current_user.id, is_read=False).delete()
     Notification.query.filter_by(user_id=current_user.id).delete()
+    NotificationArchive.query.filter_by(user_id=current_user.id).delete()
+    bump_unread([current_user.id], -unread_deleted)
+    # Conteúdos que não têm mais nenhum destinatário
+    delete_orphan_payloads(payload_ids)
     db.session.commit()
+    announce_notifications_changed(current_user.id)
     
     return jsonify({'success': True})
 
@@ -67,20 +113,20 @@ def delete_all():
 @login_required
 def recent_notifications():
     """Retorna notificações recentes (JSON) - para dropdown no header"""
-    notifications = Notification.query.filter_by(user_id=current_user.id)\
-        .order_by(Notification.created_at.desc())\
-        .limit(10)\
-        .all()
-    
-    return jsonify({
-        'notifications': [{
-            'id': n.id,
-            'type': n.type,
-            'title': n.title,
-            'message': n.message,
-            'link': n.link,
-            'is_read': n.is_read,
-            'created_at': n.created_at.isoformat() if n.created_at else None
-        } for n in notifications]
-    })
+    return jsonify(recent_notifications_payload(current_user.id))
+
+@notifications_bp.route('/stream')
+@login_required
+def stream():
+    """Stream SSE das notificações do usuário (substitui o polling de /recent)"""
+    user_id = current_user.id
+
+    # A conexão fica aberta por muito tempo: devolver a conexão do banco ao pool
+    db.session.close()
+
+    response = Response(stream_with_context(notification_stream(user_id)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
@@ -1,6 +1,14 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from ..models import db, Community, CommunityPost
+from ..utils.feed import attach_post_stats
+from ..utils.membership import touch_membership
+from ..utils.realtime import community_channel
+from ..utils.spam import screen_new_post, forget_post_fingerprints, announce_duplicate_post
+from ..utils.sensitive_terms import screen_post_terms, announce_sensitive_terms
+from ..utils.user_stats import bump_user_stat
+from ..utils.moderation import delete_posts
+from ..extensions import broker
 
 posts_bp = Blueprint('posts', __name__, url_prefix='/posts')
 
@@ -65,7 +73,17 @@ def create_post():
                 community_id=community_id
             )
             db.session.add(post)
+            touch_membership(current_user.id, community_id)
+            bump_user_stat(current_user.id, 'posts', 1)
+            duplicates = screen_new_post(post, current_user)
+            terms = screen_post_terms(post, current_user)
             db.session.commit()
+            if duplicates:
+                announce_duplicate_post(post, duplicates)
+            if terms:
+                announce_sensitive_terms('post', post.id, terms, url_for('posts.view_post', post_id=post.id))
+            if not post.is_hidden:
+                broker.publish(community_channel(community_id), 'post_created', {'post_id': post.id})
             flash('Post criado com sucesso!', 'success')
             return redirect(url_for('posts.list_posts'))
         except Exception:
@@ -80,6 +98,7 @@ def create_post():
 def view_post(post_id):
     """Visualiza um post específico"""
     post = CommunityPost.query.get_or_404(post_id)
+    attach_post_stats([post], current_user)
     return render_template('posts/view.html', post=post)
 
 @posts_bp.route('/<int:post_id>/edit', methods=['GET', 'POST'])
@@ -93,7 +112,14 @@ def edit_post(post_id):
             flash('Conteúdo é obrigatório.', 'warning')
             return redirect(url_for('posts.edit_post', post_id=post_id))
         post.content = conteudo
+        forget_post_fingerprints([post.id])
+        duplicates = screen_new_post(post, current_user)
+        terms = screen_post_terms(post, current_user)
         db.session.commit()
+        if duplicates:
+            announce_duplicate_post(post, duplicates)
+        if terms:
+            announce_sensitive_terms('post', post.id, terms, url_for('posts.view_post', post_id=post.id))
         flash('Post atualizado com sucesso!', 'success')
         return redirect(url_for('posts.view_post', post_id=post_id))
     
@@ -120,7 +146,9 @@ def delete_post(post_id):
     if not (is_author or can_admin_delete or can_delete_users()):
         flash('Você não tem permissão para excluir este post.', 'danger')
         return redirect(url_for('posts.view_post', post_id=post_id))
-    db.session.delete(post)
+    community_id = post.community_id
+    delete_posts([post.id])
     db.session.commit()
+    broker.publish(community_channel(community_id), 'post_deleted', {'post_id': post_id})
     flash('Post excluído com sucesso!', 'success')
     return redirect(url_for('posts.list_posts'))
\ No newline at end of file
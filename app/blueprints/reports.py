@@ -1,10 +1,62 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, abort
 from flask_login import login_required, current_user
-from app.models import db, Report, Usuario, CommunityPost, Content, CommunityPostComment, Notification
+from sqlalchemy.orm import selectinload
+from app.models import db, Report, SensitiveTerm
+from app.utils.notifications import announce_notifications, create_notification, notify_admins_async
+from app.utils.reported_items import (
+    get_reported_model, load_reported_item, attach_reported_items, pending_items_by_priority
+)
+from app.utils.feed import encode_cursor, decode_cursor
+from app.utils.sensitive_terms import add_term, remove_term
+from app.utils.moderation import (
+    pending_report_rows, bulk_review_reports, BULK_REVIEW_STATUSES, ITEM_ACTIONS, BULK_REVIEW_LIMIT
+)
 from datetime import datetime
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/reports')
 
+# Denúncias por página da fila de moderação
+REPORTS_PAGE_SIZE = 30
+
+# Itens por página da visão por prioridade
+PRIORITY_PAGE_SIZE = 30
+
+# Nomes exibidos nas notificações de denúncia
+REPORT_TYPE_LABELS = {
+    'post': 'Post',
+    'content': 'Conteúdo',
+    'user': 'Usuário',
+    'comment': 'Comentário',
+    'community': 'Comunidade'
+}
+
+REPORT_REASON_LABELS = {
+    'spam': 'Spam',
+    'inappropriate': 'Conteúdo Inadequado',
+    'harassment': 'Assédio',
+    'copyright': 'Violação de Direitos Autorais',
+    'other': 'Outro'
+}
+
+# Status da denúncia como aparece na notificação ao autor
+REPORT_STATUS_LABELS = {
+    'resolved': 'resolvida',
+    'dismissed': 'descartada',
+    'reviewed': 'revisada',
+    'pending': 'marcada como pendente'
+}
+
+
+def _review_notification(reported_type, reported_id, status, admin_notes=''):
+    """(título, mensagem, link) da notificação ao autor de uma denúncia revisada"""
+    status_label = REPORT_STATUS_LABELS.get(status, status)
+    tipo_nome = REPORT_TYPE_LABELS.get(reported_type, reported_type.title())
+
+    message = f"Sua denúncia sobre {tipo_nome} (ID: {reported_id}) foi {status_label}."
+    if admin_notes:
+        message += f" Resposta do administrador: {admin_notes}"
+    return f"Denúncia {status_label}", message, url_for('notifications.list_notifications')
+
 @reports_bp.route('/create', methods=['POST'])
 @login_required
 def create_report():
@@ -38,23 +90,13 @@ def create_report():
         return redirect(request.referrer or url_for('main.index'))
     
     # Verificar se o item denunciado existe
-    if reported_type == 'post':
-        item = CommunityPost.query.get(reported_id)
-    elif reported_type == 'content':
-        item = Content.query.get(reported_id)
-    elif reported_type == 'user':
-        item = Usuario.query.get(reported_id)
-    elif reported_type == 'comment':
-        item = CommunityPostComment.query.get(reported_id)
-    elif reported_type == 'community':
-        from app.models import Community
-        item = Community.query.get(reported_id)
-    else:
+    if get_reported_model(reported_type) is None:
         if request.is_json:
             return jsonify({'success': False, 'message': 'Tipo de denúncia inválido'}), 400
         flash('Tipo de denúncia inválido.', 'danger')
         return redirect(request.referrer or url_for('main.index'))
     
+    item = load_reported_item(reported_type, reported_id)
     if not item:
         if request.is_json:
             return jsonify({'success': False, 'message': 'Item não encontrado'}), 404
@@ -72,45 +114,21 @@ def create_report():
     )
     
     db.session.add(report)
-    db.session.flush()  # Para obter o ID da denúncia
-    
-    # Criar notificações para todos os administradores
-    admins = Usuario.query.filter_by(is_admin=True).all()
-    for admin in admins:
-        # Criar mensagem descritiva
-        tipo_nome = {
-            'post': 'Post',
-            'content': 'Conteúdo',
-            'user': 'Usuário',
-            'comment': 'Comentário',
-            'community': 'Comunidade'
-        }.get(reported_type, reported_type.title())
-        
-        motivo_nome = {
-            'spam': 'Spam',
-            'inappropriate': 'Conteúdo Inadequado',
-            'harassment': 'Assédio',
-            'copyright': 'Violação de Direitos Autorais',
-            'other': 'Outro'
-        }.get(reason, reason.title())
-        
-        title = f"Nova Denúncia: {tipo_nome}"
-        message = f"O usuário {current_user.nome} denunciou um {tipo_nome.lower()} (ID: {reported_id}). Motivo: {motivo_nome}."
-        if description:
-            message += f" Descrição: {description[:100]}{'...' if len(description) > 100 else ''}"
-        
-        notification = Notification(
-            user_id=admin.id,
-            type='report',
-            title=title,
-            message=message,
-            link=url_for('reports.view_report', report_id=report.id),
-            is_read=False
-        )
-        db.session.add(notification)
-    
     db.session.commit()
     
+    # Notificar todos os administradores em segundo plano (um único INSERT em lote).
+    # Denúncias do mesmo item são agrupadas numa notificação só por administrador.
+    tipo_nome = REPORT_TYPE_LABELS.get(reported_type, reported_type.title())
+    motivo_nome = REPORT_REASON_LABELS.get(reason, reason.title())
+    
+    title = f"Denúncias: {tipo_nome} (ID: {reported_id})"
+    message = f"Última denúncia: {current_user.nome} denunciou um {tipo_nome.lower()} (ID: {reported_id}). Motivo: {motivo_nome}."
+    if description:
+        message += f" Descrição: {description[:100]}{'...' if len(description) > 100 else ''}"
+    
+    notify_admins_async('report', title, message, url_for('reports.view_report', report_id=report.id),
+                        group_key=f'report:{reported_type}:{reported_id}')
+    
     if request.is_json:
         return jsonify({'success': True, 'message': 'Denúncia enviada com sucesso'})
     
@@ -127,32 +145,63 @@ def list_reports():
     
     status_filter = request.args.get('status', 'all')
     type_filter = request.args.get('type', 'all')
+    item_filter = request.args.get('item', type=int)
     
-    query = Report.query.order_by(Report.created_at.desc())
+    query = Report.query.options(
+        selectinload(Report.reporter),
+        selectinload(Report.reviewer)
+    )
     
     if status_filter != 'all':
         query = query.filter(Report.status == status_filter)
     
     if type_filter != 'all':
         query = query.filter(Report.reported_type == type_filter)
+        # Denúncias de um item específico (link da visão por prioridade)
+        if item_filter:
+            query = query.filter(Report.reported_id == item_filter)
     
-    reports = query.all()
-    
-    # Adicionar informações dos itens denunciados
-    for report in reports:
-        if report.reported_type == 'post':
-            report.reported_item = CommunityPost.query.get(report.reported_id)
-        elif report.reported_type == 'content':
-            report.reported_item = Content.query.get(report.reported_id)
-        elif report.reported_type == 'user':
-            report.reported_item = Usuario.query.get(report.reported_id)
-        elif report.reported_type == 'comment':
-            report.reported_item = CommunityPostComment.query.get(report.reported_id)
-        elif report.reported_type == 'community':
-            from app.models import Community
-            report.reported_item = Community.query.get(report.reported_id)
-    
-    return render_template('reports/list.html', reports=reports, status_filter=status_filter, type_filter=type_filter)
+    # Paginação por cursor (created_at, id) da última denúncia da página anterior
+    before = request.args.get('before')
+    decoded = decode_cursor(before)
+    if before and decoded is None:
+        abort(400, 'Cursor inválido')
+    if decoded:
+        created_at, report_id = decoded
+        query = query.filter(db.or_(
+            Report.created_at < created_at,
+            db.and_(Report.created_at == created_at, Report.id < report_id)
+        ))
+    
+    reports = query.order_by(Report.created_at.desc(), Report.id.desc())\
+        .limit(REPORTS_PAGE_SIZE + 1)\
+        .all()
+    next_cursor = None
+    if len(reports) > REPORTS_PAGE_SIZE:
+        reports = reports[:REPORTS_PAGE_SIZE]
+        next_cursor = encode_cursor(reports[-1])
+    
+    # Itens denunciados: uma consulta por tipo presente na página
+    attach_reported_items(reports)
+    
+    return render_template('reports/list.html', reports=reports, status_filter=status_filter, type_filter=type_filter,
+                           item_filter=item_filter if type_filter != 'all' else None, next_cursor=next_cursor)
+
+@reports_bp.route('/priority')
+@login_required
+def priority_queue():
+    """Itens com denúncias pendentes, dos mais denunciados para os menos (apenas para administradores)"""
+    if not current_user.is_admin:
+        flash('Acesso negado. Apenas administradores podem ver denúncias.', 'danger')
+        return redirect(url_for('main.index'))
+    
+    page = max(request.args.get('page', 1, type=int), 1)
+    items = pending_items_by_priority(limit=PRIORITY_PAGE_SIZE + 1, offset=(page - 1) * PRIORITY_PAGE_SIZE)
+    has_next = len(items) > PRIORITY_PAGE_SIZE
+    items = items[:PRIORITY_PAGE_SIZE]
+    
+    return render_template('reports/priority.html', items=items, page=page, has_next=has_next,
+                           type_labels=REPORT_TYPE_LABELS)
 
 @reports_bp.route('/<int:report_id>/review', methods=['POST'])
 @login_required
@@ -187,42 +236,21 @@ def review_report(report_id):
     report.admin_notes = admin_notes
 
     # Notificação para o autor da denúncia (usuário comum)
+    notified_ids = []
     try:
         reporter = report.reporter
         if reporter:
-            status_labels = {
-                'resolved': 'resolvida',
-                'dismissed': 'descartada',
-                'reviewed': 'revisada',
-                'pending': 'marcada como pendente'
-            }
-            status_label = status_labels.get(report.status, report.status)
-            tipo_nome = {
-                'post': 'Post',
-                'content': 'Conteúdo',
-                'user': 'Usuário',
-                'comment': 'Comentário',
-                'community': 'Comunidade'
-            }.get(report.reported_type, report.reported_type.title())
-
-            message = f"Sua denúncia sobre {tipo_nome} (ID: {report.reported_id}) foi {status_label}."
-            if admin_notes:
-                message += f" Resposta do administrador: {admin_notes}"
-
-            user_notification = Notification(
-                user_id=reporter.id,
-                type='report_response',
-                title=f"Denúncia {status_label}",
-                message=message,
-                link=url_for('notifications.list_notifications'),
-                is_read=False
+            title, message, link = _review_notification(
+                report.reported_type, report.reported_id, report.status, admin_notes
             )
-            db.session.add(user_notification)
+            create_notification(reporter.id, 'report_response', title, message, link=link)
+            notified_ids.append(reporter.id)
     except Exception:
         # Não interromper o fluxo de revisão se a notificação falhar
         pass
 
     db.session.commit()
+    announce_notifications(notified_ids)
     
     if action == 'update_status':
         flash('Status atualizado com sucesso.', 'success')
@@ -231,6 +259,115 @@ def review_report(report_id):
         flash(f'Denúncia {action} com sucesso.', 'success')
         return redirect(url_for('reports.list_reports'))
 
+@reports_bp.route('/bulk-review', methods=['POST'])
+@login_required
+def bulk_review():
+    """Revisa várias denúncias de uma vez (apenas para administradores).
+
+    Aceita report_ids (lista) ou reported_type + reported_id (todas as
+    pendentes do item), action ('resolve' ou 'dismiss'), admin_notes e
+    item_action opcional ('hide' ou 'delete'). Só denúncias pendentes são
+    alteradas.
+    """
+    wants_json = request.is_json
+    if not current_user.is_admin:
+        if wants_json:
+            return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+        flash('Acesso negado.', 'danger')
+        return redirect(url_for('main.index'))
+    
+    data = (request.get_json(silent=True) or {}) if wants_json else request.form
+    action = data.get('action')
+    item_action = data.get('item_action') or None
+    admin_notes = data.get('admin_notes', '')
+    
+    def fail(message):
+        if wants_json:
+            return jsonify({'success': False, 'message': message}), 400
+        flash(message, 'danger')
+        return redirect(request.referrer or url_for('reports.list_reports'))
+    
+    if action not in BULK_REVIEW_STATUSES:
+        return fail('Ação inválida.')
+    if item_action is not None and item_action not in ITEM_ACTIONS:
+        return fail('Ação inválida sobre o item.')
+    
+    if wants_json:
+        raw_ids = data.get('report_ids')
+    else:
+        raw_ids = request.form.getlist('report_ids') or None
+    
+    if raw_ids is not None:
+        # Só listas: uma string ("12") seria percorrida caractere a caractere (denúncias 1 e 2)
+        if not isinstance(raw_ids, list) or any(isinstance(report_id, bool) for report_id in raw_ids):
+            return fail('Lista de denúncias inválida.')
+        try:
+            report_ids = {int(report_id) for report_id in raw_ids}
+        except (TypeError, ValueError):
+            return fail('Lista de denúncias inválida.')
+        if not report_ids:
+            return fail('Nenhuma denúncia selecionada.')
+        if len(report_ids) > BULK_REVIEW_LIMIT:
+            return fail(f'Selecione no máximo {BULK_REVIEW_LIMIT} denúncias por vez.')
+        rows = pending_report_rows(report_ids=report_ids)
+    else:
+        reported_type = data.get('reported_type')
+        try:
+            reported_id = int(data.get('reported_id'))
+        except (TypeError, ValueError):
+            return fail('Informe as denúncias ou o item denunciado.')
+        if get_reported_model(reported_type) is None:
+            return fail('Tipo de denúncia inválido.')
+        rows = pending_report_rows(reported_type=reported_type, reported_id=reported_id)
+    
+    result = bulk_review_reports(
+        rows, action, current_user.id,
+        admin_notes=admin_notes,
+        item_action=item_action,
+        build_message=lambda reported_type, reported_id, status: _review_notification(
+            reported_type, reported_id, status, admin_notes
+        )
+    )
+    
+    if wants_json:
+        return jsonify({'success': True, **result})
+    
+    flash(f"{result['updated']} denúncia(s) revisada(s).", 'success')
+    return redirect(request.referrer or url_for('reports.priority_queue'))
+
+@reports_bp.route('/terms', methods=['GET', 'POST'])
+@login_required
+def sensitive_terms():
+    """Lista de termos sensíveis da varredura automática (apenas para administradores)"""
+    if not current_user.is_admin:
+        flash('Acesso negado.', 'danger')
+        return redirect(url_for('main.index'))
+    
+    if request.method == 'POST':
+        # Um termo por linha
+        added = [term for term in (add_term(line, current_user.id)
+                                   for line in request.form.get('terms', '').splitlines()) if term]
+        if added:
+            flash(f'{len(added)} termo(s) adicionado(s).', 'success')
+        else:
+            flash('Nenhum termo novo informado.', 'warning')
+        return redirect(url_for('reports.sensitive_terms'))
+    
+    terms = SensitiveTerm.query.order_by(SensitiveTerm.term.asc()).all()
+    return render_template('reports/terms.html', terms=terms)
+
+@reports_bp.route('/terms/<int:term_id>/delete', methods=['POST'])
+@login_required
+def delete_sensitive_term(term_id):
+    """Remove um termo sensível (apenas para administradores)"""
+    if not current_user.is_admin:
+        flash('Acesso negado.', 'danger')
+        return redirect(url_for('main.index'))
+    
+    if remove_term(term_id):
+        flash('Termo removido.', 'success')
+    return redirect(url_for('reports.sensitive_terms'))
+
 @reports_bp.route('/<int:report_id>/view')
 @login_required
 def view_report(report_id):
@@ -242,18 +379,7 @@ def view_report(report_id):
     report = Report.query.get_or_404(report_id)
     
     # Buscar o item denunciado
-    reported_item = None
-    if report.reported_type == 'post':
-        reported_item = CommunityPost.query.get(report.reported_id)
-    elif report.reported_type == 'content':
-        reported_item = Content.query.get(report.reported_id)
-    elif report.reported_type == 'user':
-        reported_item = Usuario.query.get(report.reported_id)
-    elif report.reported_type == 'comment':
-        reported_item = CommunityPostComment.query.get(report.reported_id)
-    elif report.reported_type == 'community':
-        from app.models import Community
-        reported_item = Community.query.get(report.reported_id)
+    reported_item = load_reported_item(report.reported_type, report.reported_id)
     
     return render_template('reports/view.html', report=report, reported_item=reported_item)
 
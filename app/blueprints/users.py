@@ -1,9 +1,12 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
 from flask_login import login_required, current_user, logout_user
-import os
-from ..models import (Usuario, db, Rating, CommunityPost, CommunityPostComment, 
-                     CommunityPostLike, Community, CommunityBlock, Content, Comment, 
-                     Like, WatchHistory, ContentCategory, Notification, Report)
+from ..models import Usuario, db, AccountPurge
+from ..utils.activity import fetch_activity_page, describe_activity, decode_activity_cursor
+from ..utils.user_stats import get_user_stats
+from ..utils.account_purge import request_account_purge, purge_progress
+from ..utils.directory import fetch_directory_page, typeahead, decode_directory_cursor, DIRECTORY_SORTS
+from ..utils.identity import invalidate_identity
+from ..utils.community_cache import invalidate_catalog
 
 users_bp = Blueprint('users', __name__, url_prefix='/users')
 
@@ -17,109 +20,54 @@ def can_delete_users():
 
 @users_bp.route('/list')
 def list_users():
-    """Lista todos os usuários cadastrados"""
-    usuarios = Usuario.query.all()
+    """Diretório de usuários (paginado por cursor, com busca por prefixo do nome/e-mail)"""
+    search = request.args.get('q', '').strip()
+    sort = request.args.get('sort', 'name')
+    if sort not in DIRECTORY_SORTS:
+        sort = 'name'
+    cursor = request.args.get('after')
+    # Cursor inválido não volta à primeira página fingindo ser uma página seguinte
+    if cursor and decode_directory_cursor(cursor, sort) is None:
+        abort(400, 'Cursor inválido')
+    usuarios, next_cursor = fetch_directory_page(search=search, sort=sort, cursor=cursor)
     can_delete = can_delete_users() if current_user.is_authenticated else False
-    return render_template('users/list.html', usuarios=usuarios, usuario=current_user, can_delete_users=can_delete)
+    return render_template('users/list.html', usuarios=usuarios, usuario=current_user, can_delete_users=can_delete,
+                           search=search, sort=sort, next_cursor=next_cursor, is_first_page=not cursor)
+
+@users_bp.route('/search')
+@login_required
+def search_users():
+    """Autocompletar de usuários (JSON, apenas administradores)"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+    return jsonify({'success': True, 'users': typeahead(request.args.get('q', ''))})
 
 @users_bp.route('/profile/<int:user_id>')
 def profile(user_id):
     """Exibe o perfil de um usuário específico"""
-    from sqlalchemy import desc
-    from datetime import datetime, timedelta
-    
-    usuario = Usuario.query.get_or_404(user_id)
-    
-    # Buscar atividades recentes (últimos 30 dias)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    
-    # Avaliações recentes
-    recent_ratings = Rating.query.filter(
-        Rating.user_id == user_id,
-        Rating.created_at >= thirty_days_ago
-    ).order_by(desc(Rating.created_at)).limit(5).all()
-    
-    # Posts em comunidades recentes
-    recent_posts = CommunityPost.query.filter(
-        CommunityPost.author_id == user_id,
-        CommunityPost.created_at >= thirty_days_ago
-    ).order_by(desc(CommunityPost.created_at)).limit(5).all()
-    
-    # Comentários recentes
-    recent_comments = CommunityPostComment.query.filter(
-        CommunityPostComment.user_id == user_id,
-        CommunityPostComment.created_at >= thirty_days_ago
-    ).order_by(desc(CommunityPostComment.created_at)).limit(5).all()
-    
-    # Likes recentes
-    recent_likes = CommunityPostLike.query.filter(
-        CommunityPostLike.user_id == user_id,
-        CommunityPostLike.created_at >= thirty_days_ago
-    ).order_by(desc(CommunityPostLike.created_at)).limit(5).all()
-    
-    # Criar lista unificada de atividades
-    activities = []
-    
-    # Adicionar avaliações
-    for rating in recent_ratings:
-        if rating.content:  # Verificar se o conteúdo existe
-            activities.append({
-                'type': 'rating',
-                'icon': 'fas fa-star',
-                'color': 'warning',
-                'title': f'Avaliou "{rating.content.title}"',
-                'description': f'{rating.rating} estrelas' + (f' - "{rating.review}"' if rating.review else ''),
-                'date': rating.created_at,
-                'url': url_for('content.view_content', content_id=rating.content_id)
-            })
-    
-    # Adicionar posts
-    for post in recent_posts:
-        if post.comunidade:  # Verificar se a comunidade existe
-            activities.append({
-                'type': 'post',
-                'icon': 'fas fa-comment',
-                'color': 'primary',
-                'title': f'Postou em "{post.comunidade.name}"',
-                'description': post.content[:100] + ('...' if len(post.content) > 100 else ''),
-                'date': post.created_at,
-                'url': url_for('comunidade.comunidade_users', community_id=post.community_id)
-            })
-    
-    # Adicionar comentários
-    for comment in recent_comments:
-        if comment.post and comment.post.comunidade:  # Verificar se o post e a comunidade existem
-            activities.append({
-                'type': 'comment',
-                'icon': 'fas fa-reply',
-                'color': 'info',
-                'title': f'Comentou em "{comment.post.comunidade.name}"',
-                'description': comment.text[:100] + ('...' if len(comment.text) > 100 else ''),
-                'date': comment.created_at,
-                'url': url_for('comunidade.comunidade_users', community_id=comment.post.community_id)
-            })
-    
-    # Adicionar likes
-    for like in recent_likes:
-        if like.post and like.post.comunidade:  # Verificar se o post e a comunidade existem
-            activities.append({
-                'type': 'like',
-                'icon': 'fas fa-heart',
-                'color': 'danger',
-                'title': f'Curtiu post em "{like.post.comunidade.name}"',
-                'description': like.post.content[:100] + ('...' if len(like.post.content) > 100 else ''),
-                'date': like.created_at,
-                'url': url_for('comunidade.comunidade_users', community_id=like.post.community_id)
-            })
-    
-    # Ordenar atividades por data (mais recente primeiro)
-    activities.sort(key=lambda x: x['date'], reverse=True)
+    usuario = Usuario.query.filter_by(id=user_id, deleted_at=None).first_or_404()
     
-    # Limitar a 10 atividades mais recentes
-    activities = activities[:10]
+    # Atividades recentes (avaliações, posts, comentários e curtidas) numa única consulta
+    rows, next_cursor = fetch_activity_page(user_id)
+    activities = [describe_activity(row) for row in rows]
     
     can_delete = can_delete_users() if current_user.is_authenticated else False
-    return render_template('users/profile.html', usuario=usuario, activities=activities, can_delete_users=can_delete)
+    return render_template('users/profile.html', usuario=usuario, activities=activities,
+                           next_cursor=next_cursor, stats=get_user_stats(user_id),
+                           can_delete_users=can_delete)
+
+@users_bp.route('/profile/<int:user_id>/activity')
+def profile_activity(user_id):
+    """Atividades anteriores do perfil (JSON com as atividades já renderizadas)"""
+    before = request.args.get('before')
+    # Cursor inválido não vira primeira página (o cliente repetiria as atividades já exibidas)
+    if before and decode_activity_cursor(before) is None:
+        return jsonify({'success': False, 'message': 'Cursor inválido'}), 400
+    usuario = Usuario.query.filter_by(id=user_id, deleted_at=None).first_or_404()
+    rows, next_cursor = fetch_activity_page(usuario.id, cursor=before)
+    activities = [describe_activity(row) for row in rows]
+    html = render_template('users/_activity_list.html', activities=activities)
+    return jsonify({'html': html, 'next_cursor': next_cursor})
 
 @users_bp.route('/edit/<int:user_id>', methods=['GET', 'POST'])
 @login_required
@@ -133,6 +81,7 @@ def edit_user(user_id):
         return redirect(url_for('main.index'))
 
     if request.method == 'POST':
+        nome_anterior = usuario.nome
         usuario.nome = request.form.get('nome')
         usuario.email = request.form.get('email')
         usuario.biografia = request.form.get('biografia')
@@ -142,6 +91,10 @@ def edit_user(user_id):
             usuario.senha = nova_senha  # setter do hash
 
         db.session.commit()
+        invalidate_identity([user_id])
+        if usuario.nome != nome_anterior:
+            # O catálogo de comunidades guarda o nome do criador (owner_name)
+            invalidate_catalog()
         flash('Perfil atualizado com sucesso!', 'success')
         return redirect(url_for('users.profile', user_id=user_id))
 
@@ -152,125 +105,23 @@ def edit_user(user_id):
 def delete_user():
     """Deleta a conta do usuário atual (própria conta)"""
     try:
-        user_id = current_user.id  # Salva o ID do usuário atual
-        user_name = current_user.nome  # Salva o nome para a mensagem
-        
-        # Buscar o usuário novamente para ter uma instância fresca
-        usuario = Usuario.query.get(user_id)
+        usuario = Usuario.query.get(current_user.id)
         if not usuario:
             flash('Usuário não encontrado.', 'danger')
             return redirect(url_for('main.index'))
-        
-        # Deletar dados relacionados em cascata
-        print(f"🗑️ Deletando dados do usuário {user_name} (ID: {user_id})...")
-        
-        # 0. Deletar conteúdos criados pelo usuário (e todos os dados relacionados)
-        contents_to_delete = Content.query.filter_by(user_id=user_id).all()
-        for content in contents_to_delete:
-            # Deletar arquivos físicos se existirem
-            if content.file_path:
-                file_full_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', content.file_path)
-                if os.path.exists(file_full_path):
-                    try:
-                        os.remove(file_full_path)
-                        print(f"  ✓ Arquivo deletado: {content.file_path}")
-                    except Exception as e:
-                        print(f"  ⚠️ Erro ao deletar arquivo {content.file_path}: {e}")
-            
-            if content.thumbnail and content.thumbnail.startswith('uploads/'):
-                thumb_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', content.thumbnail)
-                if os.path.exists(thumb_path):
-                    try:
-                        os.remove(thumb_path)
-                        print(f"  ✓ Thumbnail deletado: {content.thumbnail}")
-                    except Exception as e:
-                        print(f"  ⚠️ Erro ao deletar thumbnail {content.thumbnail}: {e}")
-            
-            # Deletar dados relacionados ao conteúdo (cascade já faz isso, mas vamos garantir)
-            Comment.query.filter_by(content_id=content.id).delete()
-            Like.query.filter_by(content_id=content.id).delete()
-            WatchHistory.query.filter_by(content_id=content.id).delete()
-            Rating.query.filter_by(content_id=content.id).delete()
-            ContentCategory.query.filter_by(content_id=content.id).delete()
-            
-            # Deletar o conteúdo
-            db.session.delete(content)
-        print(f"✓ {len(contents_to_delete)} conteúdos deletados")
-        
-        # 1. Deletar avaliações restantes do usuário (caso haja alguma)
-        Rating.query.filter_by(user_id=user_id).delete()
-        print("✓ Avaliações deletadas")
-        
-        # 2. Deletar likes em posts de comunidades
-        CommunityPostLike.query.filter_by(user_id=user_id).delete()
-        print("Likes em posts deletados")
-        
-        # 3. Deletar comentários em posts de comunidades
-        CommunityPostComment.query.filter_by(user_id=user_id).delete()
-        print("Comentários em posts deletados")
-        
-        # 4. Deletar posts em comunidades
-        CommunityPost.query.filter_by(author_id=user_id).delete()
-        print("Posts em comunidades deletados")
-        
-        # 5. Deletar comunidades criadas pelo usuário
-        # Nota: Isso também deletará todos os posts, likes e comentários dessas comunidades
-        communities_to_delete = Community.query.filter_by(owner_id=user_id).all()
-        for community in communities_to_delete:
-            # Deletar posts da comunidade (e seus likes/comentários em cascata)
-            posts_in_community = CommunityPost.query.filter_by(community_id=community.id).all()
-            for post in posts_in_community:
-                CommunityPostLike.query.filter_by(post_id=post.id).delete()
-                CommunityPostComment.query.filter_by(post_id=post.id).delete()
-            CommunityPost.query.filter_by(community_id=community.id).delete()
-            
-            # Deletar bloqueios da comunidade
-            CommunityBlock.query.filter_by(community_id=community.id).delete()
-            
-            # Deletar a comunidade
-            db.session.delete(community)
-        print(f"✓ {len(communities_to_delete)} comunidades deletadas")
-        
-        # 6. Deletar bloqueios feitos pelo usuário
-        CommunityBlock.query.filter_by(user_id=user_id).delete()
-        print("✓ Bloqueios deletados")
-        
-        # 7. Deletar comentários e likes em conteúdos de outros usuários
-        Comment.query.filter_by(user_id=user_id).delete()
-        Like.query.filter_by(user_id=user_id).delete()
-        WatchHistory.query.filter_by(user_id=user_id).delete()
-        print("✓ Comentários, likes e histórico em conteúdos deletados")
-        
-        # 8. Deletar notificações do usuário
-        Notification.query.filter_by(user_id=user_id).delete()
-        print("✓ Notificações deletadas")
-        
-        # 9. Deletar denúncias feitas pelo usuário e limpar referências de revisão
-        Report.query.filter_by(reporter_id=user_id).delete()
-        # Atualizar denúncias revisadas por este usuário para NULL (já que reviewed_by é nullable)
-        Report.query.filter_by(reviewed_by=user_id).update({Report.reviewed_by: None})
-        print("✓ Denúncias deletadas e referências de revisão limpas")
-        
-        # Deslogar o usuário antes de deletar
+
+        # A conta some na hora; os dados são apagados em segundo plano
+        request_account_purge(usuario, requested_by=usuario.id)
         logout_user()
-        
-        # Deletar o usuário do banco
-        db.session.delete(usuario)
-        db.session.commit()
-        
-        print(f"Usuário {user_name} deletado com sucesso!")
-        flash(f'Conta de {user_name} foi deletada com sucesso!', 'success')
+
+        flash('Sua conta foi excluída. Os dados restantes serão removidos em instantes.', 'success')
         return redirect(url_for('main.index'))
-        
+
     except Exception as e:
         db.session.rollback()
         print(f"Erro ao deletar usuário: {str(e)}")
         flash(f'Erro ao deletar usuário: {str(e)}', 'danger')
-        # Se der erro, tentar redirecionar para o perfil se ainda estiver logado
-        if current_user.is_authenticated:
-            return redirect(url_for('users.profile', user_id=current_user.id))
-        else:
-            return redirect(url_for('main.index'))
+        return redirect(url_for('users.profile', user_id=current_user.id))
 
 @users_bp.route('/delete/<int:user_id>', methods=['POST'])
 @login_required
@@ -287,113 +138,26 @@ def delete_other_user(user_id):
         return redirect(url_for('users.profile', user_id=user_id))
     
     try:
-        # Buscar o usuário a ser deletado
         usuario = Usuario.query.get(user_id)
-        if not usuario:
+        if not usuario or usuario.deleted_at is not None:
             flash('Usuário não encontrado.', 'danger')
             return redirect(url_for('users.list_users'))
-        
-        user_name = usuario.nome
-        
-        # Deletar dados relacionados em cascata
-        print(f"🗑️ Deletando dados do usuário {user_name} (ID: {user_id})...")
-        
-        # 0. Deletar conteúdos criados pelo usuário (e todos os dados relacionados)
-        contents_to_delete = Content.query.filter_by(user_id=user_id).all()
-        for content in contents_to_delete:
-            # Deletar arquivos físicos se existirem
-            if content.file_path:
-                file_full_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', content.file_path)
-                if os.path.exists(file_full_path):
-                    try:
-                        os.remove(file_full_path)
-                        print(f"  ✓ Arquivo deletado: {content.file_path}")
-                    except Exception as e:
-                        print(f"  ⚠️ Erro ao deletar arquivo {content.file_path}: {e}")
-            
-            if content.thumbnail and content.thumbnail.startswith('uploads/'):
-                thumb_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', content.thumbnail)
-                if os.path.exists(thumb_path):
-                    try:
-                        os.remove(thumb_path)
-                        print(f"  ✓ Thumbnail deletado: {content.thumbnail}")
-                    except Exception as e:
-                        print(f"  ⚠️ Erro ao deletar thumbnail {content.thumbnail}: {e}")
-            
-            # Deletar dados relacionados ao conteúdo (cascade já faz isso, mas vamos garantir)
-            Comment.query.filter_by(content_id=content.id).delete()
-            Like.query.filter_by(content_id=content.id).delete()
-            WatchHistory.query.filter_by(content_id=content.id).delete()
-            Rating.query.filter_by(content_id=content.id).delete()
-            ContentCategory.query.filter_by(content_id=content.id).delete()
-            
-            # Deletar o conteúdo
-            db.session.delete(content)
-        print(f"✓ {len(contents_to_delete)} conteúdos deletados")
-        
-        # 1. Deletar avaliações restantes do usuário (caso haja alguma)
-        Rating.query.filter_by(user_id=user_id).delete()
-        print("✓ Avaliações deletadas")
-        
-        # 2. Deletar likes em posts de comunidades
-        CommunityPostLike.query.filter_by(user_id=user_id).delete()
-        print("Likes em posts deletados")
-        
-        # 3. Deletar comentários em posts de comunidades
-        CommunityPostComment.query.filter_by(user_id=user_id).delete()
-        print("Comentários em posts deletados")
-        
-        # 4. Deletar posts em comunidades
-        CommunityPost.query.filter_by(author_id=user_id).delete()
-        print("Posts em comunidades deletados")
-        
-        # 5. Deletar comunidades criadas pelo usuário
-        communities_to_delete = Community.query.filter_by(owner_id=user_id).all()
-        for community in communities_to_delete:
-            # Deletar posts da comunidade (e seus likes/comentários em cascata)
-            posts_in_community = CommunityPost.query.filter_by(community_id=community.id).all()
-            for post in posts_in_community:
-                CommunityPostLike.query.filter_by(post_id=post.id).delete()
-                CommunityPostComment.query.filter_by(post_id=post.id).delete()
-            CommunityPost.query.filter_by(community_id=community.id).delete()
-            
-            # Deletar bloqueios da comunidade
-            CommunityBlock.query.filter_by(community_id=community.id).delete()
-            
-            # Deletar a comunidade
-            db.session.delete(community)
-        print(f"✓ {len(communities_to_delete)} comunidades deletadas")
-        
-        # 6. Deletar bloqueios feitos pelo usuário
-        CommunityBlock.query.filter_by(user_id=user_id).delete()
-        print("✓ Bloqueios deletados")
-        
-        # 7. Deletar comentários e likes em conteúdos de outros usuários
-        Comment.query.filter_by(user_id=user_id).delete()
-        Like.query.filter_by(user_id=user_id).delete()
-        WatchHistory.query.filter_by(user_id=user_id).delete()
-        print("✓ Comentários, likes e histórico em conteúdos deletados")
-        
-        # 8. Deletar notificações do usuário
-        Notification.query.filter_by(user_id=user_id).delete()
-        print("✓ Notificações deletadas")
-        
-        # 9. Deletar denúncias feitas pelo usuário e limpar referências de revisão
-        Report.query.filter_by(reporter_id=user_id).delete()
-        # Atualizar denúncias revisadas por este usuário para NULL (já que reviewed_by é nullable)
-        Report.query.filter_by(reviewed_by=user_id).update({Report.reviewed_by: None})
-        print("✓ Denúncias deletadas e referências de revisão limpas")
-        
-        # Deletar o usuário do banco
-        db.session.delete(usuario)
-        db.session.commit()
-        
-        print(f"Usuário {user_name} deletado com sucesso!")
-        flash(f'Conta de {user_name} foi deletada com sucesso!', 'success')
+
+        purge = request_account_purge(usuario, requested_by=current_user.id)
+        flash(f'Conta de {purge.user_name} foi excluída. Os dados restantes serão removidos em segundo plano.', 'success')
         return redirect(url_for('users.list_users'))
         
     except Exception as e:
         db.session.rollback()
         print(f"Erro ao deletar usuário: {str(e)}")
         flash(f'Erro ao deletar usuário: {str(e)}', 'danger')
-        return redirect(url_for('users.list_users'))
\ No newline at end of file
+        return redirect(url_for('users.list_users'))
+
+@users_bp.route('/purges/<int:purge_id>')
+@login_required
+def purge_status(purge_id):
+    """Andamento da exclusão de uma conta (JSON, apenas para o administrador autorizado)"""
+    if not can_delete_users():
+        return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+    purge = AccountPurge.query.get_or_404(purge_id)
+    return jsonify({'success': True, 'purge': purge_progress(purge)})
@@ -0,0 +1,123 @@
+"""
+Comandos de manutenção disponíveis via `flask --app run <comando>`
+"""
+import click
+from flask.cli import with_appcontext
+
+
+@click.command('reconcile-counters')
+@click.option('--batch-size', default=500, show_default=True, help='Posts recalculados por transação.')
+@with_appcontext
+def reconcile_counters_command(batch_size):
+    """Recalcula os contadores de curtidas/comentários dos posts."""
+    from .utils.counters import reconcile_post_counters
+
+    fixed = reconcile_post_counters(batch_size=batch_size)
+    click.echo(f"✅ Contadores reconciliados: {fixed} post(s) corrigido(s)")
+
+
+@click.command('backfill-members')
+@with_appcontext
+def backfill_members_command():
+    """Reconstrói tb_community_members a partir das interações existentes."""
+    from .utils.membership import rebuild_memberships
+
+    total = rebuild_memberships()
+    click.echo(f"✅ Participações reconstruídas: {total} registro(s)")
+
+
+@click.command('repair-unread-counters')
+@with_appcontext
+def repair_unread_counters_command():
+    """Recalcula o contador de notificações não lidas de cada usuário."""
+    from .utils.notifications import reconcile_unread_counters
+
+    fixed = reconcile_unread_counters()
+    click.echo(f"✅ Contadores de não lidas reparados: {fixed} usuário(s) corrigido(s)")
+
+
+@click.command('prune-notifications')
+@click.option('--days', type=int, default=None, help='Idade mínima (dias) das notificações lidas. Padrão: NOTIFICATION_RETENTION_DAYS.')
+@click.option('--mode', type=click.Choice(['archive', 'purge']), default=None, help='Arquivar ou apagar. Padrão: NOTIFICATION_RETENTION_MODE.')
+@click.option('--batch-size', default=1000, show_default=True, help='Notificações processadas por transação.')
+@with_appcontext
+def prune_notifications_command(days, mode, batch_size):
+    """Aplica a política de retenção às notificações lidas antigas."""
+    from flask import current_app
+    from .utils.notification_retention import apply_notification_retention
+
+    days = days if days is not None else current_app.config['NOTIFICATION_RETENTION_DAYS']
+    mode = mode or current_app.config['NOTIFICATION_RETENTION_MODE']
+    total = apply_notification_retention(days, mode=mode, batch_size=batch_size)
+    action = 'arquivada(s)' if mode == 'archive' else 'apagada(s)'
+    click.echo(f"✅ Retenção aplicada: {total} notificação(ões) {action} (lidas há mais de {days} dias)")
+
+
+@click.command('prune-post-fingerprints')
+@with_appcontext
+def prune_post_fingerprints_command():
+    """Apaga as impressões digitais de posts fora da janela de detecção de spam."""
+    from .utils.spam import prune_fingerprints
+
+    deleted = prune_fingerprints()
+    click.echo(f"✅ Impressões digitais antigas apagadas: {deleted} registro(s)")
+
+
+@click.command('scan-sensitive-terms')
+@click.option('--workers', default=4, show_default=True, help='Processos que fazem a busca dos termos.')
+@click.option('--batch-size', default=500, show_default=True, help='Linhas lidas do banco por lote.')
+@with_appcontext
+def scan_sensitive_terms_command(workers, batch_size):
+    """Revarre posts, comentários e comunidades com a lista atual de termos sensíveis."""
+    from .utils.sensitive_terms import rescan_existing
+
+    totals = rescan_existing(workers=workers, batch_size=batch_size)
+    click.echo(f"✅ Revarredura concluída: {totals['post']} post(s) ocultado(s), "
+               f"{totals['community']} comunidade(s) filtrada(s), {totals['comment']} comentário(s) sinalizado(s)")
+
+
+@click.command('rebuild-user-stats')
+@click.option('--batch-size', default=500, show_default=True, help='Usuários recalculados por transação.')
+@with_appcontext
+def rebuild_user_stats_command(batch_size):
+    """Recalcula os contadores do perfil (tb_user_stats) de todos os usuários."""
+    from .utils.user_stats import rebuild_user_stats
+
+    total = rebuild_user_stats(batch_size=batch_size)
+    click.echo(f"✅ Contadores do perfil recalculados: {total} usuário(s)")
+
+
+@click.command('purge-accounts')
+@click.option('--batch-size', default=500, show_default=True, help='Linhas apagadas por transação.')
+@with_appcontext
+def purge_accounts_command(batch_size):
+    """Retoma exclusões de conta não concluídas e esvazia a fila de arquivos a apagar."""
+    from .utils.account_purge import resume_purges, process_file_cleanup
+
+    for purge_id, status in resume_purges(batch_size=batch_size):
+        click.echo(f"{'✅' if status == 'done' else '❌'} Exclusão {purge_id}: {status}")
+    removed = process_file_cleanup()
+    click.echo(f"✅ Arquivos removidos do disco: {removed}")
+
+
+@click.command('sweep-mutes')
+@with_appcontext
+def sweep_mutes_command():
+    """Encerra os castigos já vencidos."""
+    from .utils.mutes import sweep_expired_mutes
+
+    total = sweep_expired_mutes()
+    click.echo(f"✅ Castigos encerrados: {total} usuário(s)")
+
+
+def register_commands(app):
+    """Registra os comandos de manutenção na CLI do Flask"""
+    app.cli.add_command(reconcile_counters_command)
+    app.cli.add_command(backfill_members_command)
+    app.cli.add_command(repair_unread_counters_command)
+    app.cli.add_command(prune_notifications_command)
+    app.cli.add_command(prune_post_fingerprints_command)
+    app.cli.add_command(scan_sensitive_terms_command)
+    app.cli.add_command(rebuild_user_stats_command)
+    app.cli.add_command(purge_accounts_command)
+    app.cli.add_command(sweep_mutes_command)
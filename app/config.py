@@ -8,3 +8,29 @@ class BaseConfig:
         f"sqlite:///{os.path.join(basedir, 'database/meubanco.db')}"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Broker de eventos em tempo real: 'memory' (um processo) ou 'sqlite' (vários workers na mesma máquina)
+    REALTIME_BACKEND = os.getenv("REALTIME_BACKEND", "memory")
+    REALTIME_SQLITE_PATH = os.getenv(
+        "REALTIME_SQLITE_PATH",
+        os.path.join(basedir, 'database/realtime.db')
+    )
+
+    # Retenção de notificações (`flask prune-notifications`): lidas há mais de N dias
+    # são movidas para tb_notification_archive ('archive') ou apagadas ('purge')
+    NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "30"))
+    NOTIFICATION_RETENTION_MODE = os.getenv("NOTIFICATION_RETENTION_MODE", "archive")
+
+    # Tarefas em segundo plano (utils.jobs): tamanho do pool e modo síncrono
+    JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+    JOBS_EAGER = os.getenv("JOBS_EAGER", "false").lower() == "true"
+
+    # Intervalo (segundos) da varredura que encerra castigos vencidos (utils.mutes); 0 desliga
+    MUTE_SWEEP_INTERVAL = int(os.getenv("MUTE_SWEEP_INTERVAL", "60"))
+
+    # Spam repetido (utils.spam): post quase igual a SPAM_DUPLICATE_MIN_MATCHES posts das últimas
+    # SPAM_DUPLICATE_WINDOW_HOURS horas é ocultado ('hide'), só sinalizado ('flag') ou ignorado ('off')
+    SPAM_DUPLICATE_ACTION = os.getenv("SPAM_DUPLICATE_ACTION", "hide")
+    SPAM_DUPLICATE_WINDOW_HOURS = int(os.getenv("SPAM_DUPLICATE_WINDOW_HOURS", "24"))
+    SPAM_DUPLICATE_MIN_MATCHES = int(os.getenv("SPAM_DUPLICATE_MIN_MATCHES", "2"))
+    SPAM_DUPLICATE_SIMILARITY = float(os.getenv("SPAM_DUPLICATE_SIMILARITY", "0.8"))
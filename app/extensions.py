@@ -1,8 +1,16 @@
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
+from .utils.realtime import EventBroker
+from .utils.jobs import BackgroundJobs
 
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 
 # Password hashing
 bcrypt = Bcrypt()
+
+# Eventos em tempo real (SSE)
+broker = EventBroker()
+
+# Tarefas em segundo plano
+jobs = BackgroundJobs()
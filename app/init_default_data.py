@@ -2,6 +2,8 @@
 Módulo para criar dados padrão: conta MemóriaViva e comunidade oficial
 """
 from .models import db, Usuario, Community
+from .utils.membership import touch_membership
+from .utils.user_stats import bump_user_stat
 
 def create_default_account_and_community():
     """
@@ -60,6 +62,9 @@ def create_default_account_and_community():
                 is_filtered=False
             )
             db.session.add(memoria_viva_community)
+            db.session.flush()
+            touch_membership(memoria_viva_user.id, memoria_viva_community.id)
+            bump_user_stat(memoria_viva_user.id, 'communities', 1)
             db.session.commit()
             print("✅ Comunidade MemóriaViva criada com sucesso!")
         else:
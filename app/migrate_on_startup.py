@@ -1,7 +1,9 @@
 """
 Módulo para aplicar migrações pendentes na inicialização da aplicação
 """
+import warnings
 from sqlalchemy import text
+from sqlalchemy.exc import SAWarning
 
 def apply_content_migration(db):
     """
@@ -101,6 +103,7 @@ def apply_all_migrations(db):
                 print('✅ Campo cnt_views_count adicionado em tb_contents')
 
         # Adicionar usr_role em tb_users se não existir
+        unread_counter_added = False
         if 'tb_users' in tables:
             user_columns = [col['name'] for col in inspector.get_columns('tb_users')]
             if 'usr_role' not in user_columns:
@@ -126,11 +129,49 @@ def apply_all_migrations(db):
                 db.session.execute(text("ALTER TABLE tb_users ADD COLUMN usr_mute_reason TEXT"))
                 print("✅ Coluna usr_mute_reason adicionada em tb_users")
                 needs_commit = True
+
+            # Contador de notificações não lidas (preenchido depois de tb_notifications existir)
+            if 'usr_unread_notifications' not in user_columns:
+                db.session.execute(text("ALTER TABLE tb_users ADD COLUMN usr_unread_notifications INTEGER DEFAULT 0 NOT NULL"))
+                print("✅ Coluna usr_unread_notifications adicionada em tb_users")
+                unread_counter_added = True
+                needs_commit = True
+
+            # Conta marcada para exclusão (utils.account_purge)
+            if 'usr_deleted_at' not in user_columns:
+                db.session.execute(text("ALTER TABLE tb_users ADD COLUMN usr_deleted_at DATETIME"))
+                print("✅ Coluna usr_deleted_at adicionada em tb_users")
+                needs_commit = True
+
+            # Nome e e-mail normalizados do diretório de usuários
+            for column_name in ('usr_search_name', 'usr_search_email'):
+                if column_name not in user_columns:
+                    db.session.execute(text(f"ALTER TABLE tb_users ADD COLUMN {column_name} VARCHAR(255)"))
+                    print(f"✅ Coluna {column_name} adicionada em tb_users")
+                    needs_commit = True
             
             # Commit se alguma coluna foi adicionada
             if needs_commit:
                 db.session.commit()
 
+            # Preencher as colunas normalizadas (a normalização de acentos é feita em Python)
+            from .utils.directory import backfill_search_columns
+            filled = backfill_search_columns()
+            if filled:
+                print(f"✅ Nome/e-mail normalizados preenchidos para {filled} usuário(s)")
+
+            user_indexes = [idx['name'] for idx in inspector.get_indexes('tb_users')]
+            for index_name, columns in (
+                ('ix_users_search_name', 'usr_search_name, usr_id'),
+                ('ix_users_search_email', 'usr_search_email'),
+                ('ix_users_created', 'usr_created_at, usr_id'),
+                ('ix_users_mute_until', 'usr_mute_until'),
+            ):
+                if index_name not in user_indexes:
+                    db.session.execute(text(f'CREATE INDEX IF NOT EXISTS {index_name} ON tb_users ({columns})'))
+                    db.session.commit()
+                    print(f"✅ Índice {index_name} criado em tb_users")
+
         # Criar tabelas ausentes (SQLite: CREATE TABLE IF NOT EXISTS)
         if 'tb_media' not in tables:
             db.session.execute(text(
@@ -185,26 +226,190 @@ def apply_all_migrations(db):
                 db.session.execute(text("ALTER TABLE tb_community_posts ADD COLUMN post_hidden_at DATETIME"))
                 print("✅ Coluna post_hidden_at adicionada em tb_community_posts")
                 needs_commit = True
+
+            # Contadores desnormalizados de curtidas e comentários
+            counters_added = False
+            if 'post_like_count' not in post_columns:
+                db.session.execute(text("ALTER TABLE tb_community_posts ADD COLUMN post_like_count INTEGER DEFAULT 0 NOT NULL"))
+                print("✅ Coluna post_like_count adicionada em tb_community_posts")
+                counters_added = True
+            if 'post_comment_count' not in post_columns:
+                db.session.execute(text("ALTER TABLE tb_community_posts ADD COLUMN post_comment_count INTEGER DEFAULT 0 NOT NULL"))
+                print("✅ Coluna post_comment_count adicionada em tb_community_posts")
+                counters_added = True
+
+            # Pontuação do feed "em alta" (calculada a partir dos contadores)
+            hot_score_added = False
+            if 'post_hot_score' not in post_columns:
+                db.session.execute(text("ALTER TABLE tb_community_posts ADD COLUMN post_hot_score FLOAT DEFAULT 0 NOT NULL"))
+                print("✅ Coluna post_hot_score adicionada em tb_community_posts")
+                hot_score_added = True
+            if counters_added:
+                # A reconciliação também recalcula a pontuação hot de todos os posts
+                db.session.commit()
+                from .utils.counters import reconcile_post_counters
+                fixed = reconcile_post_counters()
+                print(f"✅ Contadores preenchidos em {fixed} post(s)")
+            elif hot_score_added:
+                db.session.commit()
+                from .utils.ranking import rebuild_hot_scores
+                scored = rebuild_hot_scores()
+                print(f"✅ Pontuação hot calculada em {scored} post(s)")
+
+            # Índice usado pela paginação por cursor do feed
+            post_indexes = [idx['name'] for idx in inspector.get_indexes('tb_community_posts')]
+            if 'ix_community_posts_feed' not in post_indexes:
+                db.session.execute(text(
+                    'CREATE INDEX IF NOT EXISTS ix_community_posts_feed '
+                    'ON tb_community_posts (post_community_id, post_created_at, post_id)'
+                ))
+                print("✅ Índice ix_community_posts_feed criado em tb_community_posts")
+                needs_commit = True
+            if 'ix_community_posts_hot' not in post_indexes:
+                db.session.execute(text(
+                    'CREATE INDEX IF NOT EXISTS ix_community_posts_hot '
+                    'ON tb_community_posts (post_community_id, post_hot_score, post_id)'
+                ))
+                print("✅ Índice ix_community_posts_hot criado em tb_community_posts")
+                needs_commit = True
             
             if needs_commit:
                 db.session.commit()
 
-        # Criar tabela tb_notifications se não existir
-        if 'tb_notifications' not in tables:
+        # Índice da prévia/paginação de comentários dos posts
+        if 'tb_community_post_comments' in tables:
+            comment_indexes = [idx['name'] for idx in inspector.get_indexes('tb_community_post_comments')]
+            if 'ix_community_post_comments_post' not in comment_indexes:
+                db.session.execute(text(
+                    'CREATE INDEX IF NOT EXISTS ix_community_post_comments_post '
+                    'ON tb_community_post_comments (cpc_post_id, cpc_created_at, cpc_id)'
+                ))
+                db.session.commit()
+                print("✅ Índice ix_community_post_comments_post criado em tb_community_post_comments")
+
+        # Índices (usuário, created_at, id) da linha do tempo do perfil
+        for table_name, index_name, columns in (
+            ('tb_ratings', 'ix_ratings_user', 'rat_user_id, rat_created_at, rat_id'),
+            ('tb_community_posts', 'ix_community_posts_author', 'post_author_id, post_created_at, post_id'),
+            ('tb_community_post_comments', 'ix_community_post_comments_user', 'cpc_user_id, cpc_created_at, cpc_id'),
+            ('tb_community_post_likes', 'ix_community_post_likes_user', 'cpl_user_id, cpl_created_at, cpl_id'),
+        ):
+            if table_name not in tables:
+                continue
+            if index_name not in [idx['name'] for idx in inspector.get_indexes(table_name)]:
+                db.session.execute(text(f'CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({columns})'))
+                db.session.commit()
+                print(f"✅ Índice {index_name} criado em {table_name}")
+
+        # Índices das contagens de conteúdos e comunidades por usuário (tb_user_stats)
+        for table_name, index_name, columns in (
+            ('tb_contents', 'ix_contents_user', 'cnt_user_id'),
+            ('tb_communities', 'ix_communities_owner', 'com_owner_id'),
+        ):
+            if table_name not in tables:
+                continue
+            if index_name not in [idx['name'] for idx in inspector.get_indexes(table_name)]:
+                db.session.execute(text(f'CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({columns})'))
+                db.session.commit()
+                print(f"✅ Índice {index_name} criado em {table_name}")
+
+        # Preencher tb_user_stats (criada pelo db.create_all()) na primeira execução
+        if 'tb_user_stats' in tables:
+            has_stats = db.session.execute(text('SELECT 1 FROM tb_user_stats LIMIT 1')).first()
+            has_users = db.session.execute(text('SELECT 1 FROM tb_users LIMIT 1')).first()
+            if not has_stats and has_users:
+                from .utils.user_stats import rebuild_user_stats
+                total = rebuild_user_stats()
+                print(f"✅ tb_user_stats preenchida para {total} usuário(s)")
+
+        # Preencher tb_community_members (criada pelo db.create_all()) na primeira execução
+        if 'tb_community_members' in tables and 'tb_communities' in tables:
+            has_members = db.session.execute(text('SELECT 1 FROM tb_community_members LIMIT 1')).first()
+            has_communities = db.session.execute(text('SELECT 1 FROM tb_communities LIMIT 1')).first()
+            if not has_members and has_communities:
+                from .utils.membership import rebuild_memberships
+                total = rebuild_memberships()
+                print(f"✅ tb_community_members preenchida com {total} participação(ões)")
+
+        # Notificações: tb_notifications (texto repetido por destinatário) foi dividida em
+        # tb_notification_payloads (texto) + tb_notification_recipients (destinatário, lida/não lida).
+        # As tabelas novas vêm do create_all; aqui só migram as linhas antigas.
+        if 'tb_notifications' in tables:
+            recipients_count = db.session.execute(text('SELECT COUNT(*) FROM tb_notification_recipients')).scalar()
+            if recipients_count:
+                print("⚠️  tb_notifications e tb_notification_recipients têm dados; migração de notificações ignorada")
+            else:
+                # Um payload por texto distinto (ex.: a mesma denúncia enviada a todos os admins)
+                db.session.execute(text(
+                    'INSERT INTO tb_notification_payloads (npl_type, npl_title, npl_message, npl_link, npl_created_at) '
+                    'SELECT not_type, not_title, not_message, not_link, MIN(not_created_at) '
+                    'FROM tb_notifications '
+                    'GROUP BY not_type, not_title, not_message, not_link'
+                ))
+                # Destinatários mantêm o id antigo (links e ids já entregues continuam válidos)
+                migrated = db.session.execute(text(
+                    'INSERT INTO tb_notification_recipients (nrc_id, nrc_user_id, nrc_payload_id, nrc_is_read, nrc_created_at) '
+                    'SELECT n.not_id, n.not_user_id, p.npl_id, n.not_is_read, n.not_created_at '
+                    'FROM tb_notifications n '
+                    'JOIN tb_notification_payloads p ON p.npl_type = n.not_type '
+                    'AND p.npl_title = n.not_title '
+                    'AND p.npl_message = n.not_message '
+                    'AND (p.npl_link = n.not_link OR (p.npl_link IS NULL AND n.not_link IS NULL))'
+                )).rowcount
+                payloads = db.session.execute(text('SELECT COUNT(*) FROM tb_notification_payloads')).scalar()
+                db.session.execute(text('DROP TABLE tb_notifications'))
+                db.session.commit()
+                print(f"✅ Notificações migradas: {migrated} destinatário(s), {payloads} conteúdo(s)")
+
+        # Agrupamento de notificações repetidas (group_key no payload, contador no destinatário)
+        if 'tb_notification_payloads' in tables:
+            payload_columns = [col['name'] for col in inspector.get_columns('tb_notification_payloads')]
+            if 'npl_group_key' not in payload_columns:
+                db.session.execute(text('ALTER TABLE tb_notification_payloads ADD COLUMN npl_group_key VARCHAR(100)'))
+                print("✅ Coluna npl_group_key adicionada em tb_notification_payloads")
             db.session.execute(text(
-                'CREATE TABLE IF NOT EXISTS tb_notifications ('
-                'not_id INTEGER PRIMARY KEY, '
-                'not_user_id INTEGER NOT NULL, '
-                'not_type VARCHAR(50) NOT NULL, '
-                'not_title VARCHAR(255) NOT NULL, '
-                'not_message TEXT NOT NULL, '
-                'not_link VARCHAR(500), '
-                'not_is_read INTEGER DEFAULT 0 NOT NULL, '
-                'not_created_at DATETIME NOT NULL, '
-                'FOREIGN KEY(not_user_id) REFERENCES tb_users(usr_id))'
+                'CREATE INDEX IF NOT EXISTS ix_notification_payloads_group '
+                'ON tb_notification_payloads (npl_group_key)'
             ))
             db.session.commit()
-            print('✅ Tabela tb_notifications criada')
+
+        for table_name, prefix in (('tb_notification_recipients', 'nrc'), ('tb_notification_archive', 'nar')):
+            if table_name not in tables:
+                continue
+            columns = [col['name'] for col in inspector.get_columns(table_name)]
+            if f'{prefix}_count' not in columns:
+                db.session.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {prefix}_count INTEGER DEFAULT 1 NOT NULL'))
+                print(f"✅ Coluna {prefix}_count adicionada em {table_name}")
+            if f'{prefix}_last_at' not in columns:
+                db.session.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {prefix}_last_at DATETIME'))
+                print(f"✅ Coluna {prefix}_last_at adicionada em {table_name}")
+            db.session.commit()
+
+        # Índice (user_id, is_read, created_at) das notificações
+        if 'tb_notification_recipients' in tables:
+            with warnings.catch_warnings():
+                # ix_notification_recipients_activity é de expressão: o inspector avisa e não o lista
+                warnings.simplefilter('ignore', SAWarning)
+                recipient_indexes = [idx['name'] for idx in inspector.get_indexes('tb_notification_recipients')]
+            if 'ix_notification_recipients_user' not in recipient_indexes:
+                db.session.execute(text(
+                    'CREATE INDEX IF NOT EXISTS ix_notification_recipients_user '
+                    'ON tb_notification_recipients (nrc_user_id, nrc_is_read, nrc_created_at)'
+                ))
+                db.session.commit()
+                print("✅ Índice ix_notification_recipients_user criado em tb_notification_recipients")
+            # Ordem de última atividade (avisos agrupados sobem quando recebem um aviso novo);
+            # índice de expressão, que o inspector não lista
+            db.session.execute(text(
+                'CREATE INDEX IF NOT EXISTS ix_notification_recipients_activity '
+                'ON tb_notification_recipients (nrc_user_id, coalesce(nrc_last_at, nrc_created_at), nrc_id)'
+            ))
+            db.session.commit()
+
+        if unread_counter_added:
+            from .utils.notifications import reconcile_unread_counters
+            fixed = reconcile_unread_counters()
+            print(f"✅ Contador de não lidas preenchido para {fixed} usuário(s)")
 
         # Criar tabela tb_reports se não existir
         if 'tb_reports' not in tables:
@@ -226,6 +431,20 @@ def apply_all_migrations(db):
             ))
             db.session.commit()
             print('✅ Tabela tb_reports criada')
+
+        # Índices da fila de moderação e da verificação de duplicadas
+        report_indexes = [idx['name'] for idx in inspector.get_indexes('tb_reports')] if 'tb_reports' in tables else []
+        for index_name, columns in (
+            ('ix_reports_created', 'rpt_created_at, rpt_id'),
+            ('ix_reports_status_created', 'rpt_status, rpt_created_at, rpt_id'),
+            ('ix_reports_type_created', 'rpt_type, rpt_created_at, rpt_id'),
+            ('ix_reports_item', 'rpt_type, rpt_reported_id, rpt_status'),
+            ('ix_reports_reporter_item', 'rpt_reporter_id, rpt_type, rpt_reported_id, rpt_status'),
+        ):
+            if index_name not in report_indexes:
+                db.session.execute(text(f'CREATE INDEX IF NOT EXISTS {index_name} ON tb_reports ({columns})'))
+                db.session.commit()
+                print(f"✅ Índice {index_name} criado em tb_reports")
     except Exception as e:
         print(f"❌ Erro ao aplicar migração de views_count: {e}")
         db.session.rollback()
@@ -1,6 +1,7 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.orm import validates
 from .extensions import bcrypt
 from werkzeug.security import check_password_hash as werkzeug_check_password_hash
 
@@ -12,6 +13,10 @@ class Usuario(UserMixin, db.Model):
     __tablename__ = 'tb_users'
     __table_args__ = (
         db.UniqueConstraint('usr_email', name='uq_usuario_email'),
+        # Diretório de usuários: ordem por nome/data e busca por prefixo (utils.directory)
+        db.Index('ix_users_search_name', 'usr_search_name', 'usr_id'),
+        db.Index('ix_users_search_email', 'usr_search_email'),
+        db.Index('ix_users_created', 'usr_created_at', 'usr_id'),
         {'sqlite_autoincrement': True}
     )
 
@@ -28,6 +33,13 @@ class Usuario(UserMixin, db.Model):
     is_muted = db.Column('usr_is_muted', db.Boolean, default=False, nullable=False)  # Castigo temporário
     mute_until = db.Column('usr_mute_until', db.DateTime, nullable=True)  # Data de término do castigo
     mute_reason = db.Column('usr_mute_reason', db.Text)  # Motivo do castigo
+    # Contador desnormalizado de notificações não lidas (utils.notifications, `flask repair-unread-counters`)
+    unread_notifications = db.Column('usr_unread_notifications', db.Integer, default=0, server_default='0', nullable=False)
+    # Marcada para exclusão: a conta some na hora e os dados são apagados em segundo plano (utils.account_purge)
+    deleted_at = db.Column('usr_deleted_at', db.DateTime, nullable=True)
+    # Nome e e-mail normalizados (minúsculas, sem acentos), mantidos pelos validadores abaixo
+    search_name = db.Column('usr_search_name', db.String(255))
+    search_email = db.Column('usr_search_email', db.String(255))
 
     seguidores = db.relationship('Follower', foreign_keys='Follower.follower_id', backref='seguidor', lazy='dynamic')
     seguidos = db.relationship('Follower', foreign_keys='Follower.followed_id', backref='seguido', lazy='dynamic')
@@ -40,21 +52,28 @@ class Usuario(UserMixin, db.Model):
 
     def __repr__(self):
         return f"<Usuario {self.email}>"
+
+    @validates('nome')
+    def _normalizar_nome(self, key, value):
+        from .utils.helpers import fold_text
+        self.search_name = fold_text(value)
+        return value
+
+    @validates('email')
+    def _normalizar_email(self, key, value):
+        from .utils.helpers import fold_text
+        self.search_email = fold_text(value)
+        return value
     
     def is_currently_muted(self):
-        """Verifica se o usuário está atualmente sob castigo"""
+        """Verifica se o usuário está atualmente sob castigo.
+
+        Só leitura: castigos vencidos contam como encerrados aqui e são
+        limpos no banco pela varredura periódica (utils.mutes).
+        """
         if not self.is_muted:
             return False
-        if self.mute_until and datetime.utcnow() > self.mute_until:
-            # Castigo expirou, atualizar status
-            self.is_muted = False
-            self.mute_until = None
-            try:
-                db.session.commit()
-            except:
-                pass
-            return False
-        return True
+        return not (self.mute_until and datetime.utcnow() > self.mute_until)
     
     def can_post(self):
         """Verifica se o usuário pode postar (não está banido ou mutado)"""
@@ -91,6 +110,7 @@ class Usuario(UserMixin, db.Model):
     def block_community(self, community_id, reason=None):
         """Bloqueia uma comunidade para o usuário"""
         from .models import CommunityBlock, Community
+        from .utils.community_cache import invalidate_user
         
         # Verifica se já existe um bloqueio
         existing_block = CommunityBlock.query.filter_by(
@@ -114,12 +134,14 @@ class Usuario(UserMixin, db.Model):
         )
         db.session.add(block)
         db.session.commit()
+        invalidate_user(self.id)
         
         return True, "Comunidade bloqueada com sucesso"
     
     def unblock_community(self, community_id):
         """Remove o bloqueio de uma comunidade"""
         from .models import CommunityBlock
+        from .utils.community_cache import invalidate_user
         
         block = CommunityBlock.query.filter_by(
             user_id=self.id, 
@@ -131,17 +153,15 @@ class Usuario(UserMixin, db.Model):
         
         db.session.delete(block)
         db.session.commit()
+        invalidate_user(self.id)
         
         return True, "Bloqueio removido com sucesso"
     
     def is_community_blocked(self, community_id):
-        """Verifica se uma comunidade está bloqueada pelo usuário"""
-        from .models import CommunityBlock
+        """Verifica se uma comunidade está bloqueada pelo usuário (ids em cache)"""
+        from .utils.community_cache import get_blocked_ids
         
-        return CommunityBlock.query.filter_by(
-            user_id=self.id, 
-            community_id=community_id
-        ).first() is not None
+        return community_id in get_blocked_ids(self.id)
     
     def get_blocked_communities(self):
         """Retorna todas as comunidades bloqueadas pelo usuário"""
@@ -151,22 +171,15 @@ class Usuario(UserMixin, db.Model):
         return [block.community for block in blocks]
     
     def get_accessible_communities(self, include_filtered=False):
-        """Retorna todas as comunidades acessíveis ao usuário"""
-        from sqlalchemy import select
-        from .models import Community, CommunityBlock
-        
-        # Base: somente comunidades ativas
-        query = Community.query.filter(Community.status == 'active')
-        
-        # Excluir comunidades bloqueadas pelo usuário (subconsulta com select())
-        blocked_ids_select = select(CommunityBlock.community_id).where(CommunityBlock.user_id == self.id)
-        query = query.filter(~Community.id.in_(blocked_ids_select))
-        
-        # Filtrar conteúdo sensível, se aplicável
-        if not include_filtered:
-            query = query.filter(Community.is_filtered.is_(False))
+        """Retorna as comunidades acessíveis ao usuário.
+
+        Ativas, não bloqueadas pelo usuário e (opcionalmente) sem filtro de
+        conteúdo sensível, em ordem de criação. Vem do cache de comunidades
+        (utils.community_cache), então os itens são snapshots somente leitura.
+        """
+        from .utils.community_cache import get_accessible_communities
         
-        return query.order_by(Community.created_at.asc()).all()
+        return get_accessible_communities(self.id, include_filtered=include_filtered)
     
     
 
@@ -187,9 +200,24 @@ class PrivateMessage(db.Model):
     sent_at = db.Column('msg_sent_at', db.DateTime, default=datetime.utcnow, nullable=False)
     is_read = db.Column('msg_is_read', db.Boolean, default=False, nullable=False)
 
+def _initial_hot_score(context):
+    """Pontuação hot de um post recém-criado (sem curtidas nem comentários)"""
+    from .utils.ranking import hot_score
+
+    created_at = context.get_current_parameters().get('post_created_at') or datetime.utcnow()
+    return hot_score(0, 0, created_at)
+
 #Classe para que as mensagens fiquem visiveis para todos os usuários
 class CommunityPost(db.Model):
     __tablename__ = 'tb_community_posts'
+    __table_args__ = (
+        # Índice do feed paginado por cursor (community_id, created_at, id)
+        db.Index('ix_community_posts_feed', 'post_community_id', 'post_created_at', 'post_id'),
+        # Índice do feed "em alta" (community_id, hot_score, id)
+        db.Index('ix_community_posts_hot', 'post_community_id', 'post_hot_score', 'post_id'),
+        # Linha do tempo do perfil (author_id, created_at, id)
+        db.Index('ix_community_posts_author', 'post_author_id', 'post_created_at', 'post_id'),
+    )
 
     id = db.Column('post_id', db.Integer, primary_key=True)
     author_id = db.Column('post_author_id', db.Integer, db.ForeignKey('tb_users.usr_id'), nullable=False)
@@ -199,30 +227,53 @@ class CommunityPost(db.Model):
     is_hidden = db.Column('post_is_hidden', db.Boolean, default=False, nullable=False)  # Post oculto
     hidden_by = db.Column('post_hidden_by', db.Integer, db.ForeignKey('tb_users.usr_id'), nullable=True)  # Quem ocultou
     hidden_at = db.Column('post_hidden_at', db.DateTime, nullable=True)  # Quando foi oculto
+    # Contadores desnormalizados (mantidos por utils.counters, reconciliados por `flask reconcile-counters`)
+    like_total = db.Column('post_like_count', db.Integer, default=0, server_default='0', nullable=False)
+    comment_total = db.Column('post_comment_count', db.Integer, default=0, server_default='0', nullable=False)
+    # Pontuação "em alta" (utils.ranking), recalculada junto com os contadores
+    hot_score = db.Column('post_hot_score', db.Float, default=_initial_hot_score, server_default='0', nullable=False)
 
     usuario = db.relationship('Usuario', foreign_keys=[author_id], backref='community_posts')
     hidden_by_user = db.relationship('Usuario', foreign_keys=[hidden_by], backref='hidden_posts')
     comunidade = db.relationship('Community', back_populates='posts')
 
     # Helpers
+    # Quando o post vem do feed, utils.feed.attach_post_stats já pré-carregou
+    # os comentários e a curtida do usuário em lote e os helpers não consultam
+    # o banco novamente.
     def likes_count(self):
-        return CommunityPostLike.query.filter_by(post_id=self.id).count()
+        return self.like_total or 0
 
     def comments_count(self):
-        return CommunityPostComment.query.filter_by(post_id=self.id).count()
+        return self.comment_total or 0
 
     def get_comments(self):
+        if getattr(self, '_comments', None) is not None:
+            return self._comments
         return (CommunityPostComment.query
                 .filter_by(post_id=self.id)
                 .order_by(CommunityPostComment.created_at.desc())
                 .all())
 
+    def is_liked_by(self, user):
+        """Verifica se o usuário curtiu o post"""
+        if user is None or not user.is_authenticated:
+            return False
+        preloaded = getattr(self, '_liked_by', None)
+        if preloaded is not None and preloaded[0] == user.id:
+            return preloaded[1]
+        return CommunityPostLike.query.filter_by(post_id=self.id, user_id=user.id).first() is not None
+
 
 
 #Classe para comunidades criadas por usuários 
 
 class Community(db.Model):
     __tablename__ = 'tb_communities'
+    __table_args__ = (
+        # Contagem de comunidades por dono (utils.user_stats)
+        db.Index('ix_communities_owner', 'com_owner_id'),
+    )
 
     id = db.Column('com_id', db.Integer, primary_key=True)
     owner_id = db.Column('com_owner_id', db.Integer, db.ForeignKey('tb_users.usr_id'), nullable=False)
@@ -253,6 +304,46 @@ class Community(db.Model):
             return False
         return True
 
+    @property
+    def owner_name(self):
+        """Nome do criador (mesmo atributo dos snapshots do cache de comunidades)"""
+        return self.owner.nome if self.owner else ''
+
+
+#Classe com a participação materializada de usuários em comunidades (dono, posts, comentários e curtidas)
+class CommunityMember(db.Model):
+    __tablename__ = 'tb_community_members'
+    __table_args__ = (
+        db.Index('ix_community_members_community', 'mem_community_id'),
+    )
+
+    user_id = db.Column('mem_user_id', db.Integer, db.ForeignKey('tb_users.usr_id'), primary_key=True)
+    community_id = db.Column('mem_community_id', db.Integer, db.ForeignKey('tb_communities.com_id'), primary_key=True)
+    first_seen = db.Column('mem_first_seen', db.DateTime, default=datetime.utcnow, nullable=False)
+    last_activity = db.Column('mem_last_activity', db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<CommunityMember {self.user_id} -> {self.community_id}>"
+
+
+#Classe com as impressões digitais (buckets LSH do MinHash) dos posts recentes, para detectar spam repetido
+class PostFingerprint(db.Model):
+    __tablename__ = 'tb_post_fingerprints'
+    __table_args__ = (
+        db.Index('ix_post_fingerprints_bucket', 'pfp_band', 'pfp_bucket', 'pfp_created_at'),
+        db.Index('ix_post_fingerprints_post', 'pfp_post_id'),
+    )
+
+    id = db.Column('pfp_id', db.Integer, primary_key=True)
+    post_id = db.Column('pfp_post_id', db.Integer,
+                        db.ForeignKey('tb_community_posts.post_id', ondelete='CASCADE'), nullable=False)
+    band = db.Column('pfp_band', db.Integer, nullable=False)  # Faixa da assinatura (0..LSH_BANDS-1)
+    bucket = db.Column('pfp_bucket', db.BigInteger, nullable=False)  # Hash das linhas da faixa
+    created_at = db.Column('pfp_created_at', db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<PostFingerprint post={self.post_id} band={self.band}>"
+
 
 #Classe para gerenciar bloqueios de comunidades por usuários
 class CommunityBlock(db.Model):
@@ -288,6 +379,10 @@ class Like(db.Model):
 
 class CommunityPostLike(db.Model):
     __tablename__ = 'tb_community_post_likes'
+    __table_args__ = (
+        # Linha do tempo do perfil (user_id, created_at, id)
+        db.Index('ix_community_post_likes_user', 'cpl_user_id', 'cpl_created_at', 'cpl_id'),
+    )
 
     id = db.Column('cpl_id', db.Integer, primary_key=True)
     user_id = db.Column('cpl_user_id', db.Integer, db.ForeignKey('tb_users.usr_id'), nullable=False)
@@ -300,6 +395,12 @@ class CommunityPostLike(db.Model):
 
 class CommunityPostComment(db.Model):
     __tablename__ = 'tb_community_post_comments'
+    __table_args__ = (
+        # Prévia (ROW_NUMBER por post) e paginação dos comentários de um post
+        db.Index('ix_community_post_comments_post', 'cpc_post_id', 'cpc_created_at', 'cpc_id'),
+        # Linha do tempo do perfil (user_id, created_at, id)
+        db.Index('ix_community_post_comments_user', 'cpc_user_id', 'cpc_created_at', 'cpc_id'),
+    )
 
     id = db.Column('cpc_id', db.Integer, primary_key=True)
     user_id = db.Column('cpc_user_id', db.Integer, db.ForeignKey('tb_users.usr_id'), nullable=False)
@@ -322,6 +423,10 @@ class WatchHistory(db.Model):
 
 class Rating(db.Model):
     __tablename__ = 'tb_ratings'
+    __table_args__ = (
+        # Linha do tempo do perfil (user_id, created_at, id)
+        db.Index('ix_ratings_user', 'rat_user_id', 'rat_created_at', 'rat_id'),
+    )
 
     id = db.Column('rat_id', db.Integer, primary_key=True)
     user_id = db.Column('rat_user_id', db.Integer, db.ForeignKey('tb_users.usr_id'), nullable=False)
@@ -335,6 +440,10 @@ class Rating(db.Model):
 
 class Content(db.Model):
     __tablename__ = 'tb_contents'
+    __table_args__ = (
+        # Contagem de conteúdos por autor (utils.user_stats)
+        db.Index('ix_contents_user', 'cnt_user_id'),
+    )
 
     id = db.Column('cnt_id', db.Integer, primary_key=True)
     title = db.Column('cnt_title', db.String(255), nullable=False)
@@ -406,25 +515,127 @@ class ContentCategory(db.Model):
     content_id = db.Column('cct_content_id', db.Integer, db.ForeignKey('tb_contents.cnt_id'), primary_key=True)
     category_id = db.Column('cct_category_id', db.Integer, db.ForeignKey('tb_categories.cat_id'), primary_key=True)
 
+#Classe com o conteúdo de uma notificação, compartilhado por todos os destinatários
+class NotificationPayload(db.Model):
+    __tablename__ = 'tb_notification_payloads'
+    __table_args__ = (
+        db.Index('ix_notification_payloads_group', 'npl_group_key'),
+    )
+
+    id = db.Column('npl_id', db.Integer, primary_key=True)
+    type = db.Column('npl_type', db.String(50), nullable=False)  # 'report', 'message', 'system', etc.
+    title = db.Column('npl_title', db.String(255), nullable=False)
+    message = db.Column('npl_message', db.Text, nullable=False)
+    link = db.Column('npl_link', db.String(500))  # URL relacionada à notificação
+    created_at = db.Column('npl_created_at', db.DateTime, default=datetime.utcnow, nullable=False)
+    # Chave de agrupamento (ex.: 'report:post:42'): avisos repetidos sobre o mesmo item viram um só
+    group_key = db.Column('npl_group_key', db.String(100), nullable=True)
+
+    def __repr__(self):
+        return f"<NotificationPayload {self.id}: {self.type}>"
+
+
+def _coalesced_title(payload, count):
+    """Título da notificação, com a quantidade de avisos agrupados quando houver mais de um"""
+    if count and count > 1:
+        return f"{payload.title} ({count} novas)"
+    return payload.title
+
+#Classe com a entrega de uma notificação a um usuário (linha estreita: destinatário, conteúdo e lida/não lida)
 class Notification(db.Model):
-    __tablename__ = 'tb_notifications'
+    __tablename__ = 'tb_notification_recipients'
+    __table_args__ = (
+        # Listagem, não lidas e retenção por usuário (user_id, is_read, created_at)
+        db.Index('ix_notification_recipients_user', 'nrc_user_id', 'nrc_is_read', 'nrc_created_at'),
+    )
 
-    id = db.Column('not_id', db.Integer, primary_key=True)
-    user_id = db.Column('not_user_id', db.Integer, db.ForeignKey('tb_users.usr_id'), nullable=False)
-    type = db.Column('not_type', db.String(50), nullable=False)  # 'report', 'message', 'system', etc.
-    title = db.Column('not_title', db.String(255), nullable=False)
-    message = db.Column('not_message', db.Text, nullable=False)
-    link = db.Column('not_link', db.String(500))  # URL relacionada à notificação
-    is_read = db.Column('not_is_read', db.Boolean, default=False, nullable=False)
-    created_at = db.Column('not_created_at', db.DateTime, default=datetime.utcnow, nullable=False)
+    id = db.Column('nrc_id', db.Integer, primary_key=True)
+    user_id = db.Column('nrc_user_id', db.Integer, db.ForeignKey('tb_users.usr_id'), nullable=False)
+    payload_id = db.Column('nrc_payload_id', db.Integer, db.ForeignKey('tb_notification_payloads.npl_id'), nullable=False)
+    is_read = db.Column('nrc_is_read', db.Boolean, default=False, nullable=False)
+    created_at = db.Column('nrc_created_at', db.DateTime, default=datetime.utcnow, nullable=False)
+    # Avisos agrupados nesta linha (payload com group_key) e quando chegou o último
+    count = db.Column('nrc_count', db.Integer, default=1, server_default='1', nullable=False)
+    last_at = db.Column('nrc_last_at', db.DateTime, nullable=True)
 
     user = db.relationship('Usuario', backref='notifications', lazy=True)
+    payload = db.relationship('NotificationPayload', lazy='joined')
+
+    # Campos do conteúdo compartilhado, com os mesmos nomes de antes
+    @property
+    def type(self):
+        return self.payload.type
+
+    @property
+    def title(self):
+        return _coalesced_title(self.payload, self.count)
+
+    @property
+    def message(self):
+        return self.payload.message
+
+    @property
+    def link(self):
+        return self.payload.link
 
     def __repr__(self):
-        return f"<Notification {self.id}: {self.type} for user {self.user_id}>"
+        return f"<Notification {self.id}: payload {self.payload_id} for user {self.user_id}>"
+
+
+# Última atividade da linha: o aviso mais recente agrupado nela (last_at) ou a criação
+Notification.activity_at = db.func.coalesce(Notification.last_at, Notification.created_at)
+
+# Caixa de entrada e dropdown em ordem de última atividade (user_id, activity_at, id)
+db.Index('ix_notification_recipients_activity', Notification.user_id, Notification.activity_at, Notification.id)
+
+#Classe com notificações lidas antigas retiradas de tb_notification_recipients pela política de retenção
+class NotificationArchive(db.Model):
+    __tablename__ = 'tb_notification_archive'
+    __table_args__ = (
+        db.Index('ix_notification_archive_user', 'nar_user_id', 'nar_created_at', 'nar_id'),
+    )
+
+    id = db.Column('nar_id', db.Integer, primary_key=True)  # mesmo id que tinha em tb_notification_recipients
+    user_id = db.Column('nar_user_id', db.Integer, db.ForeignKey('tb_users.usr_id'), nullable=False)
+    payload_id = db.Column('nar_payload_id', db.Integer, db.ForeignKey('tb_notification_payloads.npl_id'), nullable=False)
+    created_at = db.Column('nar_created_at', db.DateTime, nullable=False)
+    count = db.Column('nar_count', db.Integer, default=1, server_default='1', nullable=False)
+    last_at = db.Column('nar_last_at', db.DateTime, nullable=True)
+    archived_at = db.Column('nar_archived_at', db.DateTime, default=datetime.utcnow, nullable=False)
+
+    payload = db.relationship('NotificationPayload', lazy='joined')
+
+    @property
+    def type(self):
+        return self.payload.type
+
+    @property
+    def title(self):
+        return _coalesced_title(self.payload, self.count)
+
+    @property
+    def message(self):
+        return self.payload.message
+
+    @property
+    def link(self):
+        return self.payload.link
+
+    def __repr__(self):
+        return f"<NotificationArchive {self.id}: payload {self.payload_id} for user {self.user_id}>"
 
 class Report(db.Model):
     __tablename__ = 'tb_reports'
+    __table_args__ = (
+        # Fila de moderação (keyset em created_at, id) com e sem filtros
+        db.Index('ix_reports_created', 'rpt_created_at', 'rpt_id'),
+        db.Index('ix_reports_status_created', 'rpt_status', 'rpt_created_at', 'rpt_id'),
+        db.Index('ix_reports_type_created', 'rpt_type', 'rpt_created_at', 'rpt_id'),
+        # Denúncias de um item (visão por prioridade, revisão em lote)
+        db.Index('ix_reports_item', 'rpt_type', 'rpt_reported_id', 'rpt_status'),
+        # Verificação de denúncia duplicada em create_report
+        db.Index('ix_reports_reporter_item', 'rpt_reporter_id', 'rpt_type', 'rpt_reported_id', 'rpt_status'),
+    )
 
     id = db.Column('rpt_id', db.Integer, primary_key=True)
     reporter_id = db.Column('rpt_reporter_id', db.Integer, db.ForeignKey('tb_users.usr_id'), nullable=False)
@@ -442,4 +653,70 @@ class Report(db.Model):
     reviewer = db.relationship('Usuario', foreign_keys=[reviewed_by], backref='reports_reviewed')
 
     def __repr__(self):
-        return f"<Report {self.id}: {self.reported_type}:{self.reported_id} by {self.reporter_id}>"
\ No newline at end of file
+        return f"<Report {self.id}: {self.reported_type}:{self.reported_id} by {self.reporter_id}>"
+
+
+#Classe com os termos sensíveis mantidos pelos administradores (varredura automática de posts, comentários e comunidades)
+class SensitiveTerm(db.Model):
+    __tablename__ = 'tb_sensitive_terms'
+
+    id = db.Column('stm_id', db.Integer, primary_key=True)
+    term = db.Column('stm_term', db.String(200), nullable=False, unique=True)  # Termo já normalizado (sem acentos, minúsculo)
+    created_by = db.Column('stm_created_by', db.Integer, db.ForeignKey('tb_users.usr_id'), nullable=True)
+    created_at = db.Column('stm_created_at', db.DateTime, default=datetime.utcnow, nullable=False)
+
+    creator = db.relationship('Usuario', foreign_keys=[created_by])
+
+    def __repr__(self):
+        return f"<SensitiveTerm {self.id}: {self.term}>"
+
+
+#Classe com os contadores do perfil de cada usuário (utils.user_stats, `flask rebuild-user-stats`)
+class UserStats(db.Model):
+    __tablename__ = 'tb_user_stats'
+
+    user_id = db.Column('ust_user_id', db.Integer, db.ForeignKey('tb_users.usr_id'), primary_key=True)
+    posts = db.Column('ust_posts', db.Integer, default=0, server_default='0', nullable=False)  # Posts em comunidades
+    comments = db.Column('ust_comments', db.Integer, default=0, server_default='0', nullable=False)  # Comentários em posts
+    likes = db.Column('ust_likes', db.Integer, default=0, server_default='0', nullable=False)  # Curtidas em posts
+    ratings = db.Column('ust_ratings', db.Integer, default=0, server_default='0', nullable=False)
+    contents = db.Column('ust_contents', db.Integer, default=0, server_default='0', nullable=False)
+    communities = db.Column('ust_communities', db.Integer, default=0, server_default='0', nullable=False)  # Comunidades criadas
+    updated_at = db.Column('ust_updated_at', db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<UserStats {self.user_id}>"
+
+
+#Classe com o andamento da exclusão de uma conta em segundo plano (utils.account_purge)
+class AccountPurge(db.Model):
+    __tablename__ = 'tb_account_purges'
+
+    id = db.Column('apg_id', db.Integer, primary_key=True)
+    user_id = db.Column('apg_user_id', db.Integer, nullable=False, index=True)  # Sem FK: o usuário é apagado no fim
+    user_name = db.Column('apg_user_name', db.String(255))
+    requested_by = db.Column('apg_requested_by', db.Integer, nullable=True)
+    status = db.Column('apg_status', db.String(20), default='pending', nullable=False)  # pending, running, done, failed
+    step = db.Column('apg_step', db.String(50))  # Etapa atual
+    rows_deleted = db.Column('apg_rows_deleted', db.Integer, default=0, server_default='0', nullable=False)
+    error = db.Column('apg_error', db.Text)
+    created_at = db.Column('apg_created_at', db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column('apg_started_at', db.DateTime)
+    finished_at = db.Column('apg_finished_at', db.DateTime)
+
+    def __repr__(self):
+        return f"<AccountPurge {self.id}: usuário {self.user_id} ({self.status})>"
+
+
+#Classe com a fila de arquivos enviados (em static/) a apagar do disco
+class FileCleanup(db.Model):
+    __tablename__ = 'tb_file_cleanup'
+
+    id = db.Column('fcl_id', db.Integer, primary_key=True)
+    path = db.Column('fcl_path', db.String(500), nullable=False)  # Relativo a static/
+    attempts = db.Column('fcl_attempts', db.Integer, default=0, server_default='0', nullable=False)
+    last_error = db.Column('fcl_last_error', db.Text)
+    created_at = db.Column('fcl_created_at', db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<FileCleanup {self.path}>"
@@ -0,0 +1,315 @@
+# app/utils/account_purge.py
+"""
+Exclusão de contas em segundo plano.
+
+Excluir uma conta antiga apagava, dentro da requisição e numa única
+transação, cada conteúdo, comunidade e post do usuário com deletes linha a
+linha e remoção de arquivos: o SQLite ficava travado para escrita por
+segundos e a requisição podia expirar. Agora:
+
+1. `request_account_purge` marca a conta como excluída (usr_deleted_at: ela
+   some do login, da listagem e do perfil na hora), registra a exclusão em
+   tb_account_purges e agenda `run_account_purge`.
+2. `run_account_purge` apaga os dados dependentes em etapas (PURGE_STEPS).
+   Cada etapa apaga em lotes de no máximo `batch_size` linhas
+   (`DELETE ... WHERE pk IN (SELECT pk ... LIMIT n)`), com commit por lote:
+   a trava de escrita dura um lote, não a exclusão inteira. O andamento
+   (etapa, linhas apagadas) fica em tb_account_purges (`purge_progress`).
+3. Os arquivos enviados (obras, capas) vão para a fila tb_file_cleanup e são
+   apagados do disco por `process_file_cleanup`, fora das transações.
+
+As etapas só apagam o que ainda existe, então uma exclusão interrompida pode
+ser retomada do início (`flask purge-accounts`).
+"""
+import os
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, delete, update, or_, tuple_
+from ..models import (db, Usuario, AccountPurge, FileCleanup, Content, Comment, Like, WatchHistory, Rating,
+                      ContentCategory, Community, CommunityBlock, CommunityMember, CommunityPost,
+                      CommunityPostComment, CommunityPostLike, PostFingerprint, Follower, PrivateMessage,
+                      Notification, NotificationArchive, Report, SensitiveTerm, UserStats)
+from ..extensions import jobs
+from .counters import recount_posts
+from .user_stats import recount_user_stats, invalidate_user_stats
+from .notifications import delete_orphan_payloads
+
+# Linhas apagadas por transação
+PURGE_BATCH_SIZE = 500
+
+# Arquivos apagados do disco por lote da fila
+FILE_CLEANUP_BATCH_SIZE = 200
+
+# Tentativas antes de desistir de um arquivo (fica na fila com o último erro)
+FILE_CLEANUP_MAX_ATTEMPTS = 5
+
+
+def _owned_communities(user_id):
+    return select(Community.id).where(Community.owner_id == user_id)
+
+
+def _doomed_posts(user_id):
+    """Posts apagados: os do usuário e todos os das comunidades dele"""
+    return select(CommunityPost.id).where(or_(
+        CommunityPost.author_id == user_id,
+        CommunityPost.community_id.in_(_owned_communities(user_id))
+    ))
+
+
+def _user_contents(user_id):
+    return select(Content.id).where(Content.user_id == user_id)
+
+
+def _others(user_id, rows, index):
+    return {row[index] for row in rows} - {user_id}
+
+
+def _after_post_interactions(user_id, rows):
+    # rows: (id, post_id, user_id) — contadores dos posts que continuam e perfis de terceiros
+    recount_posts({row[1] for row in rows})
+    recount_user_stats(_others(user_id, rows, 2))
+
+
+def _after_posts(user_id, rows):
+    recount_user_stats(_others(user_id, rows, 1))
+
+
+def _after_ratings(user_id, rows):
+    recount_user_stats(_others(user_id, rows, 1))
+
+
+def _after_contents(user_id, rows):
+    # rows: (id, file_path, thumbnail) — arquivos vão para a fila, apagados fora da transação
+    paths = [row[1] for row in rows if row[1]]
+    paths += [row[2] for row in rows if row[2] and row[2].startswith('uploads/')]
+    enqueue_file_cleanup(paths)
+
+
+def _after_notifications(user_id, rows):
+    delete_orphan_payloads({row[1] for row in rows})
+
+
+# (etapa, modelo, condição(user_id), colunas lidas antes de apagar, função(user_id, linhas) no mesmo lote)
+PURGE_STEPS = [
+    ('post_likes', CommunityPostLike,
+     lambda user_id: or_(CommunityPostLike.user_id == user_id, CommunityPostLike.post_id.in_(_doomed_posts(user_id))),
+     (CommunityPostLike.post_id, CommunityPostLike.user_id), _after_post_interactions),
+    ('post_comments', CommunityPostComment,
+     lambda user_id: or_(CommunityPostComment.user_id == user_id,
+                         CommunityPostComment.post_id.in_(_doomed_posts(user_id))),
+     (CommunityPostComment.post_id, CommunityPostComment.user_id), _after_post_interactions),
+    ('post_fingerprints', PostFingerprint,
+     lambda user_id: PostFingerprint.post_id.in_(_doomed_posts(user_id)), (), None),
+    ('posts', CommunityPost,
+     lambda user_id: CommunityPost.id.in_(_doomed_posts(user_id)),
+     (CommunityPost.author_id,), _after_posts),
+    ('community_blocks', CommunityBlock,
+     lambda user_id: or_(CommunityBlock.user_id == user_id,
+                         CommunityBlock.community_id.in_(_owned_communities(user_id))), (), None),
+    ('community_members', CommunityMember,
+     lambda user_id: or_(CommunityMember.user_id == user_id,
+                         CommunityMember.community_id.in_(_owned_communities(user_id))), (), None),
+    ('communities', Community, lambda user_id: Community.owner_id == user_id, (), None),
+    ('content_comments', Comment,
+     lambda user_id: or_(Comment.user_id == user_id, Comment.content_id.in_(_user_contents(user_id))), (), None),
+    ('content_likes', Like,
+     lambda user_id: or_(Like.user_id == user_id, Like.content_id.in_(_user_contents(user_id))), (), None),
+    ('watch_history', WatchHistory,
+     lambda user_id: or_(WatchHistory.user_id == user_id, WatchHistory.content_id.in_(_user_contents(user_id))),
+     (), None),
+    ('ratings', Rating,
+     lambda user_id: or_(Rating.user_id == user_id, Rating.content_id.in_(_user_contents(user_id))),
+     (Rating.user_id,), _after_ratings),
+    ('content_categories', ContentCategory,
+     lambda user_id: ContentCategory.content_id.in_(_user_contents(user_id)), (), None),
+    ('contents', Content, lambda user_id: Content.user_id == user_id,
+     (Content.file_path, Content.thumbnail), _after_contents),
+    ('followers', Follower,
+     lambda user_id: or_(Follower.follower_id == user_id, Follower.followed_id == user_id), (), None),
+    ('private_messages', PrivateMessage,
+     lambda user_id: or_(PrivateMessage.sender_id == user_id, PrivateMessage.receiver_id == user_id), (), None),
+    ('notifications', Notification, lambda user_id: Notification.user_id == user_id,
+     (Notification.payload_id,), _after_notifications),
+    ('notification_archive', NotificationArchive, lambda user_id: NotificationArchive.user_id == user_id,
+     (NotificationArchive.payload_id,), _after_notifications),
+    ('reports', Report, lambda user_id: Report.reporter_id == user_id, (), None),
+    ('user_stats', UserStats, lambda user_id: UserStats.user_id == user_id, (), None),
+]
+
+
+def enqueue_file_cleanup(paths):
+    """Coloca arquivos (relativos a static/) na fila de remoção (sem commit)"""
+    paths = [path for path in paths if path]
+    if paths:
+        db.session.add_all([FileCleanup(path=path) for path in paths])
+
+
+def _delete_in_batches(purge, step, model, condition, columns, after_batch, batch_size):
+    """Apaga as linhas da etapa em lotes, com commit e registro do andamento por lote"""
+    table = model.__table__
+    pk = list(table.primary_key.columns)
+    key = pk[0] if len(pk) == 1 else tuple_(*pk)
+
+    purge.step = step
+    db.session.commit()
+    total = 0
+    while True:
+        if after_batch is None:
+            batch = select(*pk).where(condition).limit(batch_size)
+            deleted = db.session.execute(delete(table).where(key.in_(batch))).rowcount
+        else:
+            rows = db.session.execute(select(pk[0], *columns).where(condition).limit(batch_size)).all()
+            deleted = 0
+            if rows:
+                deleted = db.session.execute(delete(table).where(pk[0].in_([row[0] for row in rows]))).rowcount
+                after_batch(purge.user_id, rows)
+        if not deleted:
+            break
+        purge.rows_deleted += deleted
+        db.session.commit()
+        total += deleted
+    return total
+
+
+def request_account_purge(usuario, requested_by=None):
+    """Marca a conta como excluída e agenda a remoção dos dados (com commit).
+
+    Returns:
+        O AccountPurge da conta (o existente, se a exclusão já foi pedida).
+    """
+    existing = AccountPurge.query.filter(AccountPurge.user_id == usuario.id,
+                                         AccountPurge.status != 'done').first()
+    if existing:
+        return existing
+
+    usuario.deleted_at = datetime.utcnow()
+    purge = AccountPurge(user_id=usuario.id, user_name=usuario.nome, requested_by=requested_by)
+    db.session.add(purge)
+    db.session.commit()
+
+    from .community_cache import invalidate_user
+    from .identity import invalidate_identity
+    invalidate_user(usuario.id)
+    invalidate_identity([usuario.id])
+
+    jobs.submit(run_account_purge, purge.id)
+    return purge
+
+
+def run_account_purge(purge_id, batch_size=PURGE_BATCH_SIZE):
+    """Executa (ou retoma) a exclusão registrada em tb_account_purges.
+
+    Returns:
+        O status final ('done' ou 'failed').
+    """
+    purge = db.session.get(AccountPurge, purge_id)
+    if purge is None or purge.status == 'done':
+        return purge.status if purge else None
+
+    purge.status = 'running'
+    purge.started_at = purge.started_at or datetime.utcnow()
+    purge.error = None
+    db.session.commit()
+
+    user_id = purge.user_id
+    had_communities = db.session.query(_owned_communities(user_id).exists()).scalar()
+    try:
+        for step, model, condition, columns, after_batch in PURGE_STEPS:
+            _delete_in_batches(purge, step, model, condition(user_id), columns, after_batch, batch_size)
+
+        # Referências que ficam (o registro continua, sem o usuário)
+        purge.step = 'references'
+        db.session.execute(update(CommunityPost).where(CommunityPost.hidden_by == user_id)
+                           .values(hidden_by=None))
+        db.session.execute(update(Report).where(Report.reviewed_by == user_id).values(reviewed_by=None))
+        db.session.execute(update(SensitiveTerm).where(SensitiveTerm.created_by == user_id)
+                           .values(created_by=None))
+        db.session.commit()
+
+        purge.step = 'user'
+        purge.rows_deleted += db.session.execute(delete(Usuario.__table__)
+                                                 .where(Usuario.__table__.c.usr_id == user_id)).rowcount
+        purge.status = 'done'
+        purge.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        purge.status = 'failed'
+        purge.error = str(e)
+        db.session.commit()
+        print(f"❌ Erro ao excluir a conta {user_id} (etapa {purge.step}): {e}")
+        return purge.status
+
+    from .community_cache import invalidate_catalog, invalidate_user
+    if had_communities:
+        invalidate_catalog()
+    invalidate_user(user_id)
+    invalidate_user_stats([user_id])
+    print(f"🗑️ Conta {purge.user_name} (ID: {user_id}) excluída: {purge.rows_deleted} registro(s)")
+
+    process_file_cleanup()
+    return purge.status
+
+
+def purge_progress(purge):
+    """Andamento da exclusão (dicionário serializável)"""
+    step_names = [step[0] for step in PURGE_STEPS] + ['references', 'user']
+    current = step_names.index(purge.step) + 1 if purge.step in step_names else 0
+    return {
+        'id': purge.id,
+        'user_id': purge.user_id,
+        'user_name': purge.user_name,
+        'status': purge.status,
+        'step': purge.step,
+        'step_number': len(step_names) if purge.status == 'done' else current,
+        'total_steps': len(step_names),
+        'rows_deleted': purge.rows_deleted,
+        'error': purge.error,
+        'created_at': purge.created_at.isoformat() if purge.created_at else None,
+        'finished_at': purge.finished_at.isoformat() if purge.finished_at else None,
+    }
+
+
+def resume_purges(batch_size=PURGE_BATCH_SIZE):
+    """Executa as exclusões não concluídas (pendentes, com falha ou interrompidas).
+
+    Returns:
+        Lista de (purge_id, status final).
+    """
+    purge_ids = [row[0] for row in db.session.query(AccountPurge.id)
+                 .filter(AccountPurge.status != 'done')
+                 .order_by(AccountPurge.id.asc())
+                 .all()]
+    return [(purge_id, run_account_purge(purge_id, batch_size=batch_size)) for purge_id in purge_ids]
+
+
+def process_file_cleanup(batch_size=FILE_CLEANUP_BATCH_SIZE):
+    """Apaga do disco os arquivos da fila, em lotes com commit.
+
+    Returns:
+        Número de arquivos retirados da fila.
+    """
+    static_folder = current_app.static_folder
+    removed = 0
+    last_id = 0
+    while True:
+        entries = (FileCleanup.query
+                   .filter(FileCleanup.id > last_id, FileCleanup.attempts < FILE_CLEANUP_MAX_ATTEMPTS)
+                   .order_by(FileCleanup.id.asc())
+                   .limit(batch_size)
+                   .all())
+        if not entries:
+            break
+        for entry in entries:
+            full_path = os.path.join(static_folder, entry.path)
+            try:
+                if os.path.exists(full_path):
+                    os.remove(full_path)
+                db.session.delete(entry)
+                removed += 1
+            except OSError as e:
+                entry.attempts += 1
+                entry.last_error = str(e)
+        db.session.commit()
+        last_id = entries[-1].id
+    return removed
@@ -0,0 +1,171 @@
+# app/utils/activity.py
+"""
+Linha do tempo de atividades de um usuário (perfil).
+
+Avaliações, posts, comentários e curtidas vêm de uma única consulta
+UNION ALL: cada ramo já traz os dados de exibição (título do conteúdo, nome
+da comunidade, trecho do post) pelos joins, busca só as linhas necessárias
+pelo índice (usuário, created_at) da sua tabela e o banco devolve tudo
+ordenado e limitado. Nada é carregado por item depois.
+
+Paginação por cursor '<created_at ISO>_<tipo>_<id>' da última atividade
+entregue ("atividades anteriores").
+"""
+from collections import namedtuple
+from datetime import datetime
+from flask import url_for
+from sqlalchemy import select, union_all, literal, null, or_, and_, cast, Integer, String
+from ..models import db, Rating, Content, CommunityPost, CommunityPostComment, CommunityPostLike, Community
+
+# Atividades por página
+ACTIVITY_PAGE_SIZE = 10
+
+# Tamanho do trecho de texto exibido em cada atividade
+EXCERPT_LENGTH = 100
+
+ActivityRow = namedtuple('ActivityRow', [
+    'kind', 'item_id', 'created_at', 'rating', 'text', 'content_id', 'content_title',
+    'community_id', 'community_name'
+])
+
+# Ícone e cor de cada tipo de atividade
+ACTIVITY_STYLES = {
+    'rating': ('fas fa-star', 'warning'),
+    'post': ('fas fa-comment', 'primary'),
+    'comment': ('fas fa-reply', 'info'),
+    'like': ('fas fa-heart', 'danger'),
+}
+
+
+def encode_activity_cursor(row):
+    if row is None:
+        return None
+    return f"{row.created_at.isoformat()}_{row.kind}_{row.item_id}"
+
+
+def decode_activity_cursor(cursor):
+    """Converte o cursor em (created_at, tipo, id). Retorna None se inválido."""
+    if not cursor:
+        return None
+    try:
+        created_at_raw, kind, item_id_raw = cursor.rsplit('_', 2)
+        if kind not in ACTIVITY_STYLES:
+            return None
+        return datetime.fromisoformat(created_at_raw), kind, int(item_id_raw)
+    except (ValueError, TypeError):
+        return None
+
+
+def _branch(kind, id_column, created_column, user_column, user_id, columns, joins, cursor, limit):
+    """Um ramo do UNION ALL: as `limit` atividades mais recentes do tipo, antes do cursor"""
+    stmt = select(
+        literal(kind).label('kind'),
+        id_column.label('item_id'),
+        created_column.label('created_at'),
+        *columns
+    ).select_from(joins).where(user_column == user_id)
+
+    if cursor:
+        created_at, cursor_kind, item_id = cursor
+        # Mesma ordem do resultado final: (created_at, tipo, id) decrescentes
+        if kind < cursor_kind:
+            stmt = stmt.where(created_column <= created_at)
+        elif kind == cursor_kind:
+            stmt = stmt.where(or_(created_column < created_at,
+                                  and_(created_column == created_at, id_column < item_id)))
+        else:
+            stmt = stmt.where(created_column < created_at)
+
+    # Cada ramo ordenado e limitado pelo próprio índice; o SQLite só aceita isso em subconsulta
+    subquery = stmt.order_by(created_column.desc(), id_column.desc()).limit(limit).subquery()
+    return select(*subquery.c)
+
+
+def fetch_activity_page(user_id, cursor=None, limit=ACTIVITY_PAGE_SIZE):
+    """Uma página da linha do tempo do usuário.
+
+    Returns:
+        (lista de ActivityRow, próximo cursor ou None)
+    """
+    decoded = decode_activity_cursor(cursor)
+    fetch = limit + 1
+
+    ratings = _branch(
+        'rating', Rating.id, Rating.created_at, Rating.user_id, user_id,
+        [Rating.rating.label('rating'), Rating.review.label('text'),
+         Content.id.label('content_id'), Content.title.label('content_title'),
+         cast(null(), Integer).label('community_id'), cast(null(), String).label('community_name')],
+        Rating.__table__.join(Content.__table__, Content.id == Rating.content_id),
+        decoded, fetch
+    )
+    posts = _branch(
+        'post', CommunityPost.id, CommunityPost.created_at, CommunityPost.author_id, user_id,
+        [cast(null(), Integer).label('rating'), CommunityPost.content.label('text'),
+         cast(null(), Integer).label('content_id'), cast(null(), String).label('content_title'),
+         Community.id.label('community_id'), Community.name.label('community_name')],
+        CommunityPost.__table__.join(Community.__table__, Community.id == CommunityPost.community_id),
+        decoded, fetch
+    )
+    comments = _branch(
+        'comment', CommunityPostComment.id, CommunityPostComment.created_at, CommunityPostComment.user_id, user_id,
+        [cast(null(), Integer).label('rating'), CommunityPostComment.text.label('text'),
+         cast(null(), Integer).label('content_id'), cast(null(), String).label('content_title'),
+         Community.id.label('community_id'), Community.name.label('community_name')],
+        CommunityPostComment.__table__
+        .join(CommunityPost.__table__, CommunityPost.id == CommunityPostComment.post_id)
+        .join(Community.__table__, Community.id == CommunityPost.community_id),
+        decoded, fetch
+    )
+    likes = _branch(
+        'like', CommunityPostLike.id, CommunityPostLike.created_at, CommunityPostLike.user_id, user_id,
+        [cast(null(), Integer).label('rating'), CommunityPost.content.label('text'),
+         cast(null(), Integer).label('content_id'), cast(null(), String).label('content_title'),
+         Community.id.label('community_id'), Community.name.label('community_name')],
+        CommunityPostLike.__table__
+        .join(CommunityPost.__table__, CommunityPost.id == CommunityPostLike.post_id)
+        .join(Community.__table__, Community.id == CommunityPost.community_id),
+        decoded, fetch
+    )
+
+    timeline = union_all(ratings, posts, comments, likes).subquery()
+    stmt = (select(*timeline.c)
+            .order_by(timeline.c.created_at.desc(), timeline.c.kind.desc(), timeline.c.item_id.desc())
+            .limit(fetch))
+    rows = [ActivityRow(*row) for row in db.session.execute(stmt).all()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_activity_cursor(rows[-1])
+    return rows, next_cursor
+
+
+def _excerpt(text):
+    text = text or ''
+    return text[:EXCERPT_LENGTH] + ('...' if len(text) > EXCERPT_LENGTH else '')
+
+
+def describe_activity(row):
+    """Dados de exibição (ícone, título, descrição, link) de uma atividade"""
+    icon, color = ACTIVITY_STYLES[row.kind]
+    if row.kind == 'rating':
+        title = f'Avaliou "{row.content_title}"'
+        description = f'{row.rating} estrelas' + (f' - "{row.text}"' if row.text else '')
+        url = url_for('content.view_content', content_id=row.content_id)
+    else:
+        title = {
+            'post': 'Postou em "{}"',
+            'comment': 'Comentou em "{}"',
+            'like': 'Curtiu post em "{}"',
+        }[row.kind].format(row.community_name)
+        description = _excerpt(row.text)
+        url = url_for('comunidade.comunidade_users', community_id=row.community_id)
+    return {
+        'type': row.kind,
+        'icon': icon,
+        'color': color,
+        'title': title,
+        'description': description,
+        'date': row.created_at,
+        'url': url,
+    }
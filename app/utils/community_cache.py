@@ -0,0 +1,139 @@
+# app/utils/community_cache.py
+"""
+Cache das comunidades acessíveis por usuário.
+
+Três camadas, cada uma invalidada só pelo que a altera:
+
+- catálogo: snapshot das comunidades ativas (metadados + ordem), compartilhado
+  por todos os usuários. Invalidado pelas ações de administrador
+  (bloquear/desbloquear/filtrar/desfiltrar), por criação/exclusão e pela
+  troca de nome de um usuário (nome do criador no snapshot).
+- bloqueios: ids das comunidades bloqueadas por cada usuário. Invalidado por
+  Usuario.block_community / unblock_community.
+- acessíveis: ids acessíveis por (usuário, include_filtered), carimbados com a
+  versão do catálogo; uma nova versão do catálogo invalida todos de uma vez.
+
+As invalidações valem imediatamente no processo atual e são repassadas aos
+demais workers pelo broker de eventos.
+"""
+import threading
+from collections import namedtuple
+from sqlalchemy.orm import joinedload
+from .cache import TTLCache
+from ..extensions import broker
+
+INVALIDATION_CHANNEL = 'cache:communities'
+
+# Dados da comunidade usados nas listagens (não depende da sessão do banco)
+CommunitySnapshot = namedtuple('CommunitySnapshot', [
+    'id', 'owner_id', 'owner_name', 'name', 'description', 'status',
+    'is_filtered', 'filter_reason', 'created_at'
+])
+
+_catalog_cache = TTLCache(maxsize=1, ttl=600)
+_blocked_cache = TTLCache(maxsize=10000, ttl=600)
+_accessible_cache = TTLCache(maxsize=20000, ttl=600)
+
+_version_lock = threading.Lock()
+_catalog_version = 0
+
+
+def _snapshot(community):
+    return CommunitySnapshot(
+        id=community.id,
+        owner_id=community.owner_id,
+        owner_name=community.owner.nome if community.owner else '',
+        name=community.name,
+        description=community.description,
+        status=community.status,
+        is_filtered=community.is_filtered,
+        filter_reason=community.filter_reason,
+        created_at=community.created_at,
+    )
+
+
+def _load_catalog():
+    from ..models import Community
+
+    # Versão lida antes da consulta: uma invalidação durante a consulta deixa o
+    # resultado com a versão antiga, e ele é recarregado na próxima leitura
+    version = _catalog_version
+    communities = (Community.query
+                   .options(joinedload(Community.owner))
+                   .filter(Community.status == 'active')
+                   .order_by(Community.created_at.asc())
+                   .all())
+    by_id = {community.id: _snapshot(community) for community in communities}
+    return {
+        'version': version,
+        'ordered_ids': tuple(community.id for community in communities),
+        'by_id': by_id,
+    }
+
+
+def get_catalog():
+    """Comunidades ativas (snapshots) na ordem de criação"""
+    catalog = _catalog_cache.get('catalog')
+    if catalog is None or catalog['version'] != _catalog_version:
+        catalog = _load_catalog()
+        _catalog_cache.set('catalog', catalog)
+    return catalog
+
+
+def get_blocked_ids(user_id):
+    """Conjunto de ids das comunidades bloqueadas pelo usuário"""
+    from ..models import CommunityBlock
+
+    def load():
+        rows = CommunityBlock.query.with_entities(CommunityBlock.community_id).filter_by(user_id=user_id).all()
+        return frozenset(row[0] for row in rows)
+
+    return _blocked_cache.get_or_set(user_id, load)
+
+
+def get_accessible_communities(user_id, include_filtered=False):
+    """Snapshots das comunidades acessíveis ao usuário"""
+    catalog = get_catalog()
+    key = (user_id, bool(include_filtered))
+    entry = _accessible_cache.get(key)
+
+    if entry is None or entry[0] != catalog['version']:
+        blocked = get_blocked_ids(user_id)
+        ids = tuple(
+            community_id for community_id in catalog['ordered_ids']
+            if community_id not in blocked
+            and (include_filtered or not catalog['by_id'][community_id].is_filtered)
+        )
+        entry = (catalog['version'], ids)
+        _accessible_cache.set(key, entry)
+
+    by_id = catalog['by_id']
+    return [by_id[community_id] for community_id in entry[1] if community_id in by_id]
+
+
+def _apply_invalidation(event, data):
+    global _catalog_version
+    if event == 'catalog':
+        with _version_lock:
+            _catalog_version += 1
+        _catalog_cache.clear()
+    elif event == 'user':
+        user_id = data['user_id']
+        _blocked_cache.delete(user_id)
+        _accessible_cache.delete((user_id, False))
+        _accessible_cache.delete((user_id, True))
+
+
+def invalidate_catalog():
+    """Chamar depois de alterar status/filtro/metadados ou criar/excluir comunidades"""
+    _apply_invalidation('catalog', {})
+    broker.publish(INVALIDATION_CHANNEL, 'catalog', {})
+
+
+def invalidate_user(user_id):
+    """Chamar depois de alterar os bloqueios de comunidade do usuário"""
+    _apply_invalidation('user', {'user_id': user_id})
+    broker.publish(INVALIDATION_CHANNEL, 'user', {'user_id': user_id})
+
+
+broker.listen(INVALIDATION_CHANNEL, _apply_invalidation)
@@ -0,0 +1,105 @@
+# app/utils/counters.py
+"""
+Contadores desnormalizados de curtidas e comentários dos posts de comunidade.
+
+As colunas post_like_count / post_comment_count são atualizadas com
+`UPDATE ... SET col = col + delta` na mesma transação do insert/delete da
+curtida ou do comentário, então o contador nunca fica visível fora de
+sincronia com a linha que o alterou. Se algo escapar (ex.: deleções em
+massa), `reconcile_post_counters` recalcula tudo a partir das tabelas.
+
+Toda alteração de contador também recalcula a pontuação hot do post
+(utils.ranking).
+"""
+from sqlalchemy import func, select, or_
+from ..models import db, CommunityPost, CommunityPostLike, CommunityPostComment
+from .ranking import refresh_hot_scores
+
+# Quantidade de posts recalculados por transação na reconciliação
+RECONCILE_BATCH_SIZE = 500
+
+
+def bump_post_likes(post_id, delta):
+    """Soma delta ao contador de curtidas do post (sem commit)"""
+    db.session.query(CommunityPost).filter(CommunityPost.id == post_id).update(
+        {CommunityPost.like_total: CommunityPost.like_total + delta},
+        synchronize_session=False
+    )
+    refresh_hot_scores([post_id])
+
+
+def bump_post_comments(post_id, delta):
+    """Soma delta ao contador de comentários do post (sem commit)"""
+    db.session.query(CommunityPost).filter(CommunityPost.id == post_id).update(
+        {CommunityPost.comment_total: CommunityPost.comment_total + delta},
+        synchronize_session=False
+    )
+    refresh_hot_scores([post_id])
+
+
+def _like_count_subquery():
+    return (select(func.count(CommunityPostLike.id))
+            .where(CommunityPostLike.post_id == CommunityPost.id)
+            .scalar_subquery())
+
+
+def _comment_count_subquery():
+    return (select(func.count(CommunityPostComment.id))
+            .where(CommunityPostComment.post_id == CommunityPost.id)
+            .scalar_subquery())
+
+
+def recount_posts(post_ids):
+    """Recalcula os contadores dos posts informados (sem commit).
+
+    Útil depois de deleções em massa que não passam pelos bump_*.
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return 0
+    updated = db.session.query(CommunityPost).filter(CommunityPost.id.in_(post_ids)).update(
+        {
+            CommunityPost.like_total: _like_count_subquery(),
+            CommunityPost.comment_total: _comment_count_subquery(),
+        },
+        synchronize_session=False
+    )
+    refresh_hot_scores(post_ids)
+    return updated
+
+
+def reconcile_post_counters(batch_size=RECONCILE_BATCH_SIZE):
+    """Corrige a divergência dos contadores em todos os posts, em lotes.
+
+    Cada lote é um único UPDATE com subconsultas correlacionadas que só toca
+    as linhas cujo contador está errado, seguido do recálculo da pontuação
+    hot do lote e de commit.
+
+    Returns:
+        Número de posts corrigidos.
+    """
+    fixed = 0
+    last_id = 0
+    while True:
+        ids = [row[0] for row in db.session.query(CommunityPost.id)
+               .filter(CommunityPost.id > last_id)
+               .order_by(CommunityPost.id.asc())
+               .limit(batch_size)
+               .all()]
+        if not ids:
+            break
+
+        likes = _like_count_subquery()
+        comments = _comment_count_subquery()
+        fixed += db.session.query(CommunityPost).filter(
+            CommunityPost.id.in_(ids),
+            or_(CommunityPost.like_total != likes, CommunityPost.comment_total != comments)
+        ).update(
+            {CommunityPost.like_total: likes, CommunityPost.comment_total: comments},
+            synchronize_session=False
+        )
+        refresh_hot_scores(ids)
+        db.session.commit()
+        last_id = ids[-1]
+
+    return fixed
@@ -0,0 +1,144 @@
+# app/utils/directory.py
+"""
+Diretório de usuários (users.list_users) e busca para autocompletar.
+
+A listagem é paginada por cursor, em ordem de nome ou de cadastro, sem
+OFFSET: cada página é uma busca pelo índice a partir da última linha
+entregue (ix_users_search_name / ix_users_created), então a página 1000 custa
+o mesmo que a primeira.
+
+A busca é por prefixo do nome ou do e-mail sobre as colunas normalizadas
+usr_search_name / usr_search_email (minúsculas, sem acentos: "joão" e
+"JOAO" encontram "João Silva"). O prefixo vira um intervalo
+(`col >= 'joa' AND col < 'joa\\U0010ffff'`), que o banco resolve pelo índice.
+"""
+from datetime import datetime
+from sqlalchemy import select, and_, or_, bindparam
+from ..models import db, Usuario
+from .helpers import fold_text
+
+# Usuários por página do diretório
+DIRECTORY_PAGE_SIZE = 24
+
+# Sugestões devolvidas pelo autocompletar
+TYPEAHEAD_LIMIT = 10
+
+# Ordens aceitas pelo diretório
+DIRECTORY_SORTS = ('name', 'recent')
+
+# Maior caractere Unicode: limite superior do intervalo de um prefixo
+_PREFIX_END = '\U0010ffff'
+
+# Usuários normalizados por transação no preenchimento inicial
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _prefix_match(column, prefix):
+    return and_(column >= prefix, column < prefix + _PREFIX_END)
+
+
+def search_filter(search):
+    """Condição de busca por prefixo do nome ou do e-mail (None se a busca for vazia)"""
+    prefix = fold_text(search)
+    if not prefix:
+        return None
+    return or_(_prefix_match(Usuario.search_name, prefix), _prefix_match(Usuario.search_email, prefix))
+
+
+def encode_directory_cursor(usuario, sort):
+    if usuario is None:
+        return None
+    if sort == 'recent':
+        return f"{usuario.criado_em.isoformat()}_{usuario.id}"
+    return f"{usuario.search_name}_{usuario.id}"
+
+
+def decode_directory_cursor(cursor, sort):
+    """Converte o cursor em (chave de ordenação, id). Retorna None se inválido."""
+    if not cursor:
+        return None
+    try:
+        key_raw, user_id_raw = cursor.rsplit('_', 1)
+        if sort == 'recent':
+            return datetime.fromisoformat(key_raw), int(user_id_raw)
+        return key_raw, int(user_id_raw)
+    except (ValueError, TypeError):
+        return None
+
+
+def fetch_directory_page(search=None, sort='name', cursor=None, limit=DIRECTORY_PAGE_SIZE):
+    """Uma página do diretório (contas excluídas não aparecem).
+
+    Returns:
+        (lista de Usuario, próximo cursor ou None)
+    """
+    if sort not in DIRECTORY_SORTS:
+        sort = 'name'
+
+    query = Usuario.query.filter(Usuario.deleted_at.is_(None))
+    condition = search_filter(search)
+    if condition is not None:
+        query = query.filter(condition)
+
+    decoded = decode_directory_cursor(cursor, sort)
+    if sort == 'recent':
+        if decoded:
+            created_at, user_id = decoded
+            query = query.filter(or_(Usuario.criado_em < created_at,
+                                     and_(Usuario.criado_em == created_at, Usuario.id < user_id)))
+        query = query.order_by(Usuario.criado_em.desc(), Usuario.id.desc())
+    else:
+        if decoded:
+            search_name, user_id = decoded
+            query = query.filter(or_(Usuario.search_name > search_name,
+                                     and_(Usuario.search_name == search_name, Usuario.id > user_id)))
+        query = query.order_by(Usuario.search_name.asc(), Usuario.id.asc())
+
+    usuarios = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(usuarios) > limit:
+        usuarios = usuarios[:limit]
+        next_cursor = encode_directory_cursor(usuarios[-1], sort)
+    return usuarios, next_cursor
+
+
+def typeahead(search, limit=TYPEAHEAD_LIMIT):
+    """Sugestões (id, nome, e-mail) para o prefixo informado, em ordem de nome"""
+    condition = search_filter(search)
+    if condition is None:
+        return []
+    rows = (db.session.query(Usuario.id, Usuario.nome, Usuario.email)
+            .filter(Usuario.deleted_at.is_(None), condition)
+            .order_by(Usuario.search_name.asc(), Usuario.id.asc())
+            .limit(limit)
+            .all())
+    return [{'id': user_id, 'nome': nome, 'email': email} for user_id, nome, email in rows]
+
+
+def backfill_search_columns(batch_size=BACKFILL_BATCH_SIZE):
+    """Preenche usr_search_name/usr_search_email das contas que ainda não têm (com commit).
+
+    Returns:
+        Número de usuários preenchidos.
+    """
+    table = Usuario.__table__
+    total = 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.usr_id, table.c.usr_name, table.c.usr_email)
+            .where(or_(table.c.usr_search_name.is_(None), table.c.usr_search_email.is_(None)))
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(
+            table.update().where(table.c.usr_id == bindparam('user_id')).values(
+                usr_search_name=bindparam('search_name'),
+                usr_search_email=bindparam('search_email')
+            ),
+            [{'user_id': user_id, 'search_name': fold_text(nome), 'search_email': fold_text(email)}
+             for user_id, nome, email in rows]
+        )
+        db.session.commit()
+        total += len(rows)
+    return total
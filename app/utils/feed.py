@@ -0,0 +1,221 @@
+# app/utils/feed.py
+"""
+Montagem do feed das comunidades.
+
+- Paginação por cursor (keyset): em vez de OFFSET (que fica mais lento a cada
+  página), o cursor guarda o (created_at, id) do último post entregue e a
+  próxima página começa logo depois dele, usando o índice
+  (community_id, created_at, id).
+- Ordenação "em alta" (sort='hot'): mesma paginação, mas pela pontuação
+  pré-calculada (hot_score, id) e o índice (community_id, hot_score, id).
+- Agregados em lote: os comentários mais recentes de cada post e o estado
+  de curtida do usuário são carregados para a página inteira de uma vez.
+"""
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import or_, and_, func
+from sqlalchemy.orm import joinedload
+from ..models import db, CommunityPost, CommunityPostLike, CommunityPostComment
+
+# Quantidade de posts por página do feed
+FEED_PAGE_SIZE = 20
+
+# Comentários mais recentes exibidos em cada post do feed
+COMMENT_PREVIEW_SIZE = 3
+
+# Quantidade de comentários antigos por página ("Ver comentários anteriores")
+COMMENTS_PAGE_SIZE = 20
+
+# Ordenações aceitas pelo feed: cronológica e "em alta"
+FEED_SORTS = ('new', 'hot')
+
+
+def encode_cursor(item):
+    """Gera o cursor opaco '<created_at ISO>_<id>' a partir de um post/comentário"""
+    if item is None:
+        return None
+    return f"{item.created_at.isoformat()}_{item.id}"
+
+
+def decode_cursor(cursor):
+    """Converte o cursor em (created_at, id). Retorna None se inválido."""
+    if not cursor:
+        return None
+    try:
+        created_at_raw, item_id_raw = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(created_at_raw), int(item_id_raw)
+    except (ValueError, TypeError):
+        return None
+
+
+def encode_hot_cursor(post):
+    """Gera o cursor '<hot_score>_<id>' do feed em alta"""
+    if post is None:
+        return None
+    return f"{post.hot_score!r}_{post.id}"
+
+
+def decode_hot_cursor(cursor):
+    """Converte o cursor do feed em alta em (hot_score, id). Retorna None se inválido."""
+    if not cursor:
+        return None
+    try:
+        score_raw, post_id_raw = cursor.rsplit('_', 1)
+        return float(score_raw), int(post_id_raw)
+    except (ValueError, TypeError):
+        return None
+
+
+def visible_posts_query(community_id, user):
+    """Posts da comunidade visíveis para o usuário.
+
+    Admin vê tudo; usuários comuns só veem posts não ocultos ou os próprios
+    posts ocultos.
+    """
+    query = CommunityPost.query.filter(CommunityPost.community_id == community_id)
+    if not user.is_admin:
+        query = query.filter(
+            or_(
+                CommunityPost.is_hidden == False,
+                (CommunityPost.is_hidden == True) & (CommunityPost.author_id == user.id)
+            )
+        )
+    return query
+
+
+def is_valid_cursor(cursor, sort='new'):
+    """True se o cursor está vazio (primeira página) ou pode ser decodificado na ordem informada.
+
+    As rotas de "carregar mais" devem recusar (400) um cursor inválido: tratá-lo
+    como primeira página faria o cliente repetir posts que já estão na tela.
+    """
+    if not cursor:
+        return True
+    decode = decode_hot_cursor if sort == 'hot' else decode_cursor
+    return decode(cursor) is not None
+
+
+def fetch_feed_page(query, cursor=None, limit=FEED_PAGE_SIZE, sort='new'):
+    """Busca uma página do feed em ordem decrescente de data ('new') ou de
+    pontuação hot ('hot').
+
+    Returns:
+        (posts, next_cursor) — next_cursor é None quando não há mais páginas.
+    """
+    if sort == 'hot':
+        sort_column, encode, decode = CommunityPost.hot_score, encode_hot_cursor, decode_hot_cursor
+    else:
+        sort_column, encode, decode = CommunityPost.created_at, encode_cursor, decode_cursor
+
+    decoded = decode(cursor)
+    if decoded:
+        sort_value, post_id = decoded
+        query = query.filter(
+            or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, CommunityPost.id < post_id)
+            )
+        )
+
+    # Busca um item a mais só para saber se existe próxima página
+    posts = (query
+             .options(joinedload(CommunityPost.usuario))
+             .order_by(sort_column.desc(), CommunityPost.id.desc())
+             .limit(limit + 1)
+             .all())
+
+    has_more = len(posts) > limit
+    posts = posts[:limit]
+    next_cursor = encode(posts[-1]) if has_more and posts else None
+    return posts, next_cursor
+
+
+def attach_post_stats(posts, user=None, comments_limit=COMMENT_PREVIEW_SIZE):
+    """Pré-carrega os comentários mais recentes e o estado de curtida do usuário.
+
+    Faz um número fixo de consultas para a página inteira em vez de consultas
+    por post, e guarda os resultados nos próprios posts para que
+    get_comments() e is_liked_by() não voltem ao banco durante a
+    renderização. As contagens já vêm nas colunas post_like_count e
+    post_comment_count.
+
+    Só os `comments_limit` comentários mais novos de cada post são carregados
+    (ROW_NUMBER() OVER (PARTITION BY post_id)); o restante fica disponível
+    via fetch_comments_page a partir de post.older_comments_cursor.
+    """
+    if not posts:
+        return posts
+
+    post_ids = [post.id for post in posts]
+
+    liked_ids = set()
+    user_id = user.id if user is not None and user.is_authenticated else None
+    if user_id is not None:
+        liked_ids = {
+            row[0] for row in db.session.query(CommunityPostLike.post_id)
+            .filter(CommunityPostLike.user_id == user_id, CommunityPostLike.post_id.in_(post_ids))
+            .all()
+        }
+
+    ranked = (db.session.query(
+                CommunityPostComment.id.label('comment_id'),
+                func.row_number().over(
+                    partition_by=CommunityPostComment.post_id,
+                    order_by=(CommunityPostComment.created_at.desc(), CommunityPostComment.id.desc())
+                ).label('position'))
+              .filter(CommunityPostComment.post_id.in_(post_ids))
+              .subquery())
+
+    comments = (CommunityPostComment.query
+                .join(ranked, ranked.c.comment_id == CommunityPostComment.id)
+                .filter(ranked.c.position <= comments_limit)
+                .options(joinedload(CommunityPostComment.user))
+                .order_by(CommunityPostComment.created_at.desc(), CommunityPostComment.id.desc())
+                .all())
+
+    comments_by_post = defaultdict(list)
+    for comment in comments:
+        comments_by_post[comment.post_id].append(comment)
+
+    for post in posts:
+        post._comments = comments_by_post[post.id]
+        # O contador desnormalizado diz se existem comentários além da prévia
+        if post._comments and post.comments_count() > len(post._comments):
+            post.older_comments_cursor = encode_cursor(post._comments[-1])
+        else:
+            post.older_comments_cursor = None
+        if user_id is not None:
+            post._liked_by = (user_id, post.id in liked_ids)
+
+    return posts
+
+
+def fetch_comments_page(post_id, before=None, limit=COMMENTS_PAGE_SIZE):
+    """Busca comentários do post mais antigos que o cursor `before`.
+
+    Returns:
+        (comments, next_cursor) — next_cursor é None quando não há mais páginas.
+    """
+    query = (CommunityPostComment.query
+             .filter(CommunityPostComment.post_id == post_id)
+             .options(joinedload(CommunityPostComment.user)))
+
+    decoded = decode_cursor(before)
+    if decoded:
+        created_at, comment_id = decoded
+        query = query.filter(
+            or_(
+                CommunityPostComment.created_at < created_at,
+                and_(CommunityPostComment.created_at == created_at, CommunityPostComment.id < comment_id)
+            )
+        )
+
+    comments = (query
+                .order_by(CommunityPostComment.created_at.desc(), CommunityPostComment.id.desc())
+                .limit(limit + 1)
+                .all())
+
+    has_more = len(comments) > limit
+    comments = comments[:limit]
+    next_cursor = encode_cursor(comments[-1]) if has_more and comments else None
+    return comments, next_cursor
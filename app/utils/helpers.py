@@ -1,4 +1,5 @@
 # app/utils/helpers.py
+import unicodedata
 from datetime import datetime
 from flask import flash
 
@@ -115,4 +116,11 @@ def format_datetime(dt, format_str: str = '%d/%m/%Y %H:%M'):
         try:
             return dt.strftime(format_str)
         except Exception:
-            return str(dt)
\ No newline at end of file
+            return str(dt)
+
+
+def fold_text(text):
+    """Minúsculas, sem acentos e com espaços simples (ex.: busca por prefixo de nomes)"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().split())
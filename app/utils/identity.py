@@ -0,0 +1,118 @@
+# app/utils/identity.py
+"""
+Usuário da sessão (Flask-Login) servido de um cache por processo.
+
+O load_user fazia Usuario.query.get() em toda requisição autenticada. Agora
+ele devolve um SessionUser montado a partir de um snapshot com os campos
+usados por requisição (nome, papel, banimento/castigo, dados do menu do
+perfil, contador de não lidas), guardado num cache com TTL curto e tamanho
+limitado.
+
+O SessionUser se comporta como o Usuario:
+
+- campos do snapshot são lidos direto dele;
+- métodos do Usuario (can_post, is_administrador, is_community_blocked...)
+  rodam sobre o snapshot;
+- qualquer atribuição, ou leitura de um campo fora do snapshot, carrega o
+  objeto do ORM e passa a usá-lo no resto da requisição. Só rotas que alteram
+  o próprio usuário pagam essa consulta.
+
+O snapshot é invalidado na edição do perfil, banimento/castigo, exclusão da
+conta e alteração do contador de não lidas (e repassado aos demais workers
+pelo broker de eventos). Uma leitura feita entre a alteração e o commit pode
+guardar o valor antigo por no máximo IDENTITY_TTL segundos.
+"""
+import inspect
+from flask_login import UserMixin
+from ..models import db, Usuario
+from ..extensions import broker
+from .cache import TTLCache
+
+INVALIDATION_CHANNEL = 'cache:identity'
+
+# Segundos que um snapshot fica em cache
+IDENTITY_TTL = 30
+
+# Campos do snapshot (os lidos pelo base.html e pelas verificações de permissão)
+IDENTITY_FIELDS = (
+    'id', 'nome', 'email', 'role', 'is_admin', 'is_banned', 'is_muted', 'mute_until', 'mute_reason',
+    'profile_picture', 'biografia', 'criado_em', 'unread_notifications',
+)
+
+_identity_cache = TTLCache(maxsize=10000, ttl=IDENTITY_TTL)
+
+
+class SessionUser(UserMixin):
+    """Usuário da sessão: snapshot em cache, com o Usuario do ORM carregado só quando preciso"""
+
+    def __init__(self, snapshot):
+        self.__dict__['_snapshot'] = snapshot
+        self.__dict__['_usuario'] = None
+
+    def _load(self):
+        usuario = self.__dict__['_usuario']
+        if usuario is None:
+            usuario = db.session.get(Usuario, self.__dict__['_snapshot']['id'])
+            self.__dict__['_usuario'] = usuario
+        return usuario
+
+    def __getattr__(self, name):
+        usuario = self.__dict__['_usuario']
+        if usuario is not None:
+            return getattr(usuario, name)
+        snapshot = self.__dict__['_snapshot']
+        if name in snapshot:
+            return snapshot[name]
+        attribute = inspect.getattr_static(Usuario, name, None)
+        if inspect.isfunction(attribute):
+            return attribute.__get__(self)
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+        invalidate_identity([self.__dict__['_snapshot']['id']])
+
+    def __repr__(self):
+        return f"<SessionUser {self.__dict__['_snapshot']['email']}>"
+
+
+def _load_snapshot(user_id):
+    row = (db.session.query(*[getattr(Usuario, field) for field in IDENTITY_FIELDS])
+           .filter(Usuario.id == user_id, Usuario.deleted_at.is_(None))
+           .first())
+    return dict(zip(IDENTITY_FIELDS, row)) if row else None
+
+
+def load_session_user(user_id):
+    """SessionUser do id salvo na sessão, ou None se a conta não existe (ou foi excluída)"""
+    snapshot = _identity_cache.get(user_id)
+    if snapshot is None:
+        snapshot = _load_snapshot(user_id)
+        if snapshot is None:
+            return None
+        _identity_cache.set(user_id, snapshot)
+    return SessionUser(snapshot)
+
+
+def _apply_invalidation(event, data):
+    if event == 'all':
+        _identity_cache.clear()
+        return
+    for user_id in data['user_ids']:
+        _identity_cache.delete(user_id)
+
+
+def invalidate_identity(user_ids):
+    """Chamar depois de alterar campos do snapshot dos usuários"""
+    data = {'user_ids': list(user_ids)}
+    _apply_invalidation('users', data)
+    broker.publish(INVALIDATION_CHANNEL, 'users', data)
+
+
+def invalidate_all_identities():
+    """Descarta todos os snapshots (alterações em massa, ex.: reconciliação de contadores)"""
+    _apply_invalidation('all', {})
+    broker.publish(INVALIDATION_CHANNEL, 'all', {})
+
+
+broker.listen(INVALIDATION_CHANNEL, _apply_invalidation)
@@ -0,0 +1,73 @@
+# app/utils/jobs.py
+"""
+Execução de tarefas em segundo plano dentro do próprio processo.
+
+Para trabalho que não precisa atrasar a resposta (ex.: distribuir
+notificações para todos os administradores). Cada tarefa roda num pool de
+threads, dentro de um contexto de aplicação próprio, e a sessão do banco é
+descartada ao final.
+
+Tarefas periódicas (`schedule`) rodam numa thread própria a cada intervalo,
+pelo mesmo caminho das demais (contexto de aplicação, rollback em erro).
+
+Configuração: JOBS_WORKERS (tamanho do pool) e JOBS_EAGER (executa na hora,
+na própria requisição — útil em testes e scripts; desliga as periódicas).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundJobs:
+    """Pool de tarefas em segundo plano (padrão init_app das extensões)"""
+
+    def __init__(self):
+        self.app = None
+        self.eager = False
+        self._executor = None
+
+    def init_app(self, app):
+        self.app = app
+        self.eager = app.config.get('JOBS_EAGER', False)
+        if not self.eager:
+            self._executor = ThreadPoolExecutor(
+                max_workers=app.config.get('JOBS_WORKERS', 2),
+                thread_name_prefix='background-job'
+            )
+
+    def submit(self, func, *args, **kwargs):
+        """Agenda func(*args, **kwargs); os argumentos devem ser valores simples, não objetos do ORM"""
+        if self.app is None:
+            raise RuntimeError("BackgroundJobs não inicializado (chame init_app)")
+        if self.eager:
+            return func(*args, **kwargs)
+        return self._executor.submit(self._run, func, args, kwargs)
+
+    def schedule(self, func, interval):
+        """Roda func() a cada `interval` segundos numa thread daemon (não roda com JOBS_EAGER ou interval <= 0)"""
+        if self.app is None:
+            raise RuntimeError("BackgroundJobs não inicializado (chame init_app)")
+        if self.eager or not interval or interval <= 0:
+            return None
+        thread = threading.Thread(
+            target=self._run_every, args=(func, interval),
+            name=f'periodic-job-{func.__name__}', daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _run_every(self, func, interval):
+        stop = threading.Event()
+        while not stop.wait(interval):
+            self._run(func, (), {})
+
+    def _run(self, func, args, kwargs):
+        from ..models import db
+
+        with self.app.app_context():
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Erro na tarefa em segundo plano {func.__name__}: {e}")
+            finally:
+                db.session.remove()
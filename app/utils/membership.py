@@ -0,0 +1,77 @@
+# app/utils/membership.py
+"""
+Participação materializada em comunidades (tb_community_members).
+
+Um usuário é membro de uma comunidade quando é o dono ou quando postou,
+comentou ou curtiu algo nela. Em vez de descobrir isso varrendo o histórico
+de interações a cada requisição, cada interação chama `touch_membership`
+na mesma transação, e `rebuild_memberships` reconstrói a tabela a partir
+dos dados existentes.
+"""
+from datetime import datetime
+from sqlalchemy import select, union_all, func, insert
+from ..models import db, Community, CommunityPost, CommunityPostComment, CommunityPostLike, CommunityMember
+
+
+def touch_membership(user_id, community_id, when=None):
+    """Registra atividade do usuário na comunidade (upsert, sem commit)"""
+    when = when or datetime.utcnow()
+    table = CommunityMember.__table__
+    dialect = db.engine.dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table).values(
+            mem_user_id=user_id,
+            mem_community_id=community_id,
+            mem_first_seen=when,
+            mem_last_activity=when
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.mem_user_id, table.c.mem_community_id],
+            set_={'mem_last_activity': stmt.excluded.mem_last_activity}
+        )
+        db.session.execute(stmt)
+        return
+
+    # Outros bancos: atualiza e, se não havia linha, insere
+    updated = db.session.query(CommunityMember).filter_by(
+        user_id=user_id, community_id=community_id
+    ).update({CommunityMember.last_activity: when}, synchronize_session=False)
+    if not updated:
+        db.session.add(CommunityMember(user_id=user_id, community_id=community_id,
+                                       first_seen=when, last_activity=when))
+
+
+def rebuild_memberships():
+    """Reconstrói tb_community_members a partir de donos, posts, comentários e curtidas.
+
+    Um único INSERT ... SELECT agrupado por (usuário, comunidade).
+
+    Returns:
+        Número de participações gravadas.
+    """
+    activity = union_all(
+        select(Community.owner_id.label('user_id'), Community.id.label('community_id'),
+               Community.created_at.label('seen_at')),
+        select(CommunityPost.author_id, CommunityPost.community_id, CommunityPost.created_at),
+        select(CommunityPostComment.user_id, CommunityPost.community_id, CommunityPostComment.created_at)
+        .join(CommunityPost, CommunityPost.id == CommunityPostComment.post_id),
+        select(CommunityPostLike.user_id, CommunityPost.community_id, CommunityPostLike.created_at)
+        .join(CommunityPost, CommunityPost.id == CommunityPostLike.post_id),
+    ).subquery()
+
+    grouped = (select(activity.c.user_id, activity.c.community_id,
+                      func.min(activity.c.seen_at), func.max(activity.c.seen_at))
+               .group_by(activity.c.user_id, activity.c.community_id))
+
+    table = CommunityMember.__table__
+    db.session.execute(table.delete())
+    db.session.execute(insert(table).from_select(
+        ['mem_user_id', 'mem_community_id', 'mem_first_seen', 'mem_last_activity'], grouped
+    ))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(table).scalar()
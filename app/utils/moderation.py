@@ -0,0 +1,219 @@
+# app/utils/moderation.py
+"""
+Revisão de denúncias em lote.
+
+Limpar uma onda de spam com review_report exigia uma requisição, um commit e
+uma notificação por denúncia. `bulk_review_reports` faz tudo numa transação:
+
+- um UPDATE ... WHERE rpt_id IN (...) com o novo status;
+- uma notificação por item para os autores das denúncias (um payload e um
+  INSERT com todos os destinatários, via notify_users);
+- opcionalmente oculta ou exclui os itens denunciados, com operações em lote
+  por tipo.
+
+Os avisos em tempo real (streams de notificação, feed da comunidade, cache do
+catálogo) só saem depois do commit.
+
+`delete_posts` é a exclusão de posts usada por todas as rotas (post,
+comunidade, revisão em lote): o SQLite não aplica ON DELETE CASCADE, então
+comentários, curtidas e impressões digitais de spam são apagados
+explicitamente e os contadores do perfil de todos os envolvidos são
+recalculados.
+"""
+from collections import defaultdict
+from datetime import datetime
+from ..models import db, Report, CommunityPost, CommunityPostComment, CommunityPostLike, Community
+from ..extensions import broker
+from .counters import bump_post_comments
+from .notifications import notify_users, announce_notifications
+from .realtime import community_channel
+from .spam import forget_post_fingerprints
+from .user_stats import recount_user_stats
+
+# Status finais aplicados pela revisão em lote
+BULK_REVIEW_STATUSES = {'resolve': 'resolved', 'dismiss': 'dismissed'}
+
+# Ação sobre o item denunciado → tipos que a suportam
+ITEM_ACTIONS = {
+    'hide': ('post', 'community'),
+    'delete': ('post', 'comment'),
+}
+
+# Máximo de denúncias por revisão em lote
+BULK_REVIEW_LIMIT = 1000
+
+
+def pending_report_rows(report_ids=None, reported_type=None, reported_id=None):
+    """(id, reporter_id, type, reported_id) das denúncias pendentes selecionadas.
+
+    Pelos ids informados ou, com reported_type/reported_id, todas as
+    pendentes daquele item.
+    """
+    query = db.session.query(Report.id, Report.reporter_id, Report.reported_type, Report.reported_id)\
+        .filter(Report.status == 'pending')
+    if report_ids is not None:
+        query = query.filter(Report.id.in_(list(report_ids)))
+    else:
+        query = query.filter(Report.reported_type == reported_type, Report.reported_id == reported_id)
+    return query.order_by(Report.id.asc()).limit(BULK_REVIEW_LIMIT).all()
+
+
+def _hide_items(reported_type, item_ids, admin_id):
+    """Oculta os itens (sem commit). Devolve (itens afetados, avisos a publicar após o commit)"""
+    now = datetime.utcnow()
+    affected = 0
+    after_commit = []
+    if reported_type == 'post':
+        posts = db.session.query(CommunityPost.id, CommunityPost.community_id)\
+            .filter(CommunityPost.id.in_(item_ids)).all()
+        affected = db.session.query(CommunityPost).filter(CommunityPost.id.in_(item_ids)).update(
+            {CommunityPost.is_hidden: True, CommunityPost.hidden_by: admin_id, CommunityPost.hidden_at: now},
+            synchronize_session=False
+        )
+        for post_id, community_id in posts:
+            after_commit.append(lambda post_id=post_id, community_id=community_id: broker.publish(
+                community_channel(community_id), 'post_visibility', {'post_id': post_id, 'hidden': True}))
+    elif reported_type == 'community':
+        from .community_cache import invalidate_catalog
+
+        affected = db.session.query(Community).filter(Community.id.in_(item_ids)).update(
+            {Community.status: 'blocked'}, synchronize_session=False
+        )
+        after_commit.append(invalidate_catalog)
+    return affected, after_commit
+
+
+def delete_posts(post_ids):
+    """Exclui os posts com seus comentários, curtidas e impressões digitais de spam (sem commit).
+
+    Recalcula os contadores do perfil do autor e de quem comentou/curtiu.
+
+    Returns:
+        Lista de (post_id, community_id) excluídos, para publicar
+        'post_deleted' depois do commit.
+    """
+    posts = db.session.query(CommunityPost.id, CommunityPost.community_id)\
+        .filter(CommunityPost.id.in_(list(post_ids))).all()
+    post_ids = [post_id for post_id, _ in posts]
+    if not post_ids:
+        return []
+    affected_user_ids = {row[0] for row in db.session.query(CommunityPost.author_id)
+                         .filter(CommunityPost.id.in_(post_ids))}
+    affected_user_ids.update(row[0] for row in db.session.query(CommunityPostComment.user_id)
+                             .filter(CommunityPostComment.post_id.in_(post_ids)))
+    affected_user_ids.update(row[0] for row in db.session.query(CommunityPostLike.user_id)
+                             .filter(CommunityPostLike.post_id.in_(post_ids)))
+    CommunityPostComment.query.filter(CommunityPostComment.post_id.in_(post_ids)).delete(synchronize_session=False)
+    CommunityPostLike.query.filter(CommunityPostLike.post_id.in_(post_ids)).delete(synchronize_session=False)
+    forget_post_fingerprints(post_ids)
+    CommunityPost.query.filter(CommunityPost.id.in_(post_ids)).delete(synchronize_session=False)
+    recount_user_stats(affected_user_ids)
+    return posts
+
+
+def _delete_items(reported_type, item_ids):
+    """Exclui os itens (sem commit). Devolve (itens afetados, avisos a publicar após o commit)"""
+    after_commit = []
+    if reported_type == 'post':
+        posts = delete_posts(item_ids)
+        for post_id, community_id in posts:
+            after_commit.append(lambda post_id=post_id, community_id=community_id: broker.publish(
+                community_channel(community_id), 'post_deleted', {'post_id': post_id}))
+        return len(posts), after_commit
+    elif reported_type == 'comment':
+        comments = (db.session.query(CommunityPostComment.id, CommunityPostComment.post_id, CommunityPost.community_id,
+                                     CommunityPostComment.user_id)
+                    .join(CommunityPost, CommunityPost.id == CommunityPostComment.post_id)
+                    .filter(CommunityPostComment.id.in_(item_ids))
+                    .all())
+        if not comments:
+            return 0, after_commit
+        CommunityPostComment.query.filter(CommunityPostComment.id.in_([row[0] for row in comments]))\
+            .delete(synchronize_session=False)
+        removed_per_post = defaultdict(int)
+        for _, post_id, _, _ in comments:
+            removed_per_post[post_id] += 1
+        for post_id, removed in removed_per_post.items():
+            bump_post_comments(post_id, -removed)
+        recount_user_stats(row[3] for row in comments)
+
+        def publish_deleted_comments():
+            totals = dict(db.session.query(CommunityPost.id, CommunityPost.comment_total)
+                          .filter(CommunityPost.id.in_(list(removed_per_post))).all())
+            for comment_id, post_id, community_id, _ in comments:
+                broker.publish(community_channel(community_id), 'comment_deleted', {
+                    'post_id': post_id, 'comment_id': comment_id, 'comments_count': totals.get(post_id) or 0
+                })
+        after_commit.append(publish_deleted_comments)
+        return len(comments), after_commit
+    return 0, after_commit
+
+
+def bulk_review_reports(rows, action, admin_id, admin_notes='', item_action=None, build_message=None):
+    """Aplica resolve/dismiss às denúncias selecionadas numa única transação, com commit.
+
+    Args:
+        rows: resultado de pending_report_rows.
+        action: 'resolve' ou 'dismiss'.
+        admin_id: administrador que está revisando.
+        admin_notes: notas gravadas em todas as denúncias.
+        item_action: None, 'hide' ou 'delete' (aplicada a cada item denunciado
+            cujo tipo a suporta; os demais ficam como estão).
+        build_message: função (reported_type, reported_id, status) -> (título,
+            mensagem, link) da notificação enviada aos autores.
+
+    Returns:
+        Dicionário com 'updated', 'notified' e 'items' (itens afetados pela item_action).
+    """
+    status = BULK_REVIEW_STATUSES[action]
+    if item_action is not None and item_action not in ITEM_ACTIONS:
+        raise ValueError(f"Ação inválida sobre o item: {item_action}")
+
+    report_ids = [row[0] for row in rows]
+    if not report_ids:
+        return {'updated': 0, 'notified': 0, 'items': 0}
+
+    db.session.query(Report).filter(Report.id.in_(report_ids)).update(
+        {
+            Report.status: status,
+            Report.reviewed_by: admin_id,
+            Report.reviewed_at: datetime.utcnow(),
+            Report.admin_notes: admin_notes,
+        },
+        synchronize_session=False
+    )
+
+    # Um payload por item: todos os autores de denúncias do mesmo item recebem o mesmo texto
+    reporters_per_item = defaultdict(list)
+    for _, reporter_id, reported_type, reported_id in rows:
+        reporters_per_item[(reported_type, reported_id)].append(reporter_id)
+
+    notified = []
+    if build_message is not None:
+        for (reported_type, reported_id), reporter_ids in reporters_per_item.items():
+            title, message, link = build_message(reported_type, reported_id, status)
+            notified += notify_users(reporter_ids, 'report_response', title, message, link)
+
+    after_commit = []
+    affected_items = 0
+    if item_action is not None:
+        ids_per_type = defaultdict(set)
+        for reported_type, reported_id in reporters_per_item:
+            if reported_type in ITEM_ACTIONS[item_action]:
+                ids_per_type[reported_type].add(reported_id)
+        for reported_type, item_ids in ids_per_type.items():
+            item_ids = list(item_ids)
+            if item_action == 'hide':
+                affected, callbacks = _hide_items(reported_type, item_ids, admin_id)
+            else:
+                affected, callbacks = _delete_items(reported_type, item_ids)
+            affected_items += affected
+            after_commit += callbacks
+
+    db.session.commit()
+
+    announce_notifications(notified)
+    for callback in after_commit:
+        callback()
+
+    return {'updated': len(report_ids), 'notified': len(set(notified)), 'items': affected_items}
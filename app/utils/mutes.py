@@ -0,0 +1,40 @@
+# app/utils/mutes.py
+"""
+Encerramento de castigos vencidos.
+
+`Usuario.is_currently_muted()` limpava o castigo vencido com um commit dentro
+da própria leitura (inclusive durante a renderização de templates), e
+requisições de leitura acabavam pegando a trava de escrita do SQLite. A
+leitura agora é pura: um castigo com usr_mute_until no passado já conta como
+encerrado. O banco é acertado por `sweep_expired_mutes`, agendada a cada
+MUTE_SWEEP_INTERVAL segundos (e disponível em `flask sweep-mutes`), com um
+único UPDATE pelo índice ix_users_mute_until.
+"""
+from datetime import datetime
+from sqlalchemy import select, update
+from ..models import db, Usuario
+from .identity import invalidate_identity
+
+
+def _expired(now):
+    return (Usuario.is_muted.is_(True), Usuario.mute_until.isnot(None), Usuario.mute_until < now)
+
+
+def sweep_expired_mutes(now=None):
+    """Encerra os castigos vencidos num único UPDATE (com commit).
+
+    Returns:
+        Número de usuários liberados.
+    """
+    now = now or datetime.utcnow()
+    user_ids = db.session.execute(select(Usuario.id).where(*_expired(now))).scalars().all()
+    if not user_ids:
+        return 0
+
+    db.session.execute(
+        update(Usuario).where(*_expired(now)).values(is_muted=False, mute_until=None),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    invalidate_identity(user_ids)
+    return len(user_ids)
@@ -0,0 +1,75 @@
+# app/utils/notification_retention.py
+"""
+Política de retenção das notificações.
+
+Notificações lidas há mais de N dias (pela data de criação) saem da tabela
+principal (tb_notification_recipients), que fica com o tamanho limitado ao
+volume recente:
+
+- 'archive': vão para tb_notification_archive, onde o usuário ainda pode
+  consultá-las (notifications.archive).
+- 'purge': são apagadas.
+
+O trabalho é feito em lotes limitados (um commit por lote) para não segurar
+o banco. Notificações não lidas nunca são removidas, então o contador de não
+lidas não muda. Payloads que ficam sem nenhuma referência são apagados.
+
+Execução: `flask prune-notifications` (ex.: diariamente via cron).
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, literal
+from ..models import db, Notification, NotificationArchive
+from .notifications import delete_orphan_payloads
+
+RETENTION_MODES = ('archive', 'purge')
+
+# Notificações processadas por transação
+RETENTION_BATCH_SIZE = 1000
+
+
+def apply_notification_retention(days, mode='archive', batch_size=RETENTION_BATCH_SIZE):
+    """Arquiva ou apaga as notificações lidas criadas há mais de `days` dias.
+
+    Returns:
+        Número de notificações retiradas da tabela principal.
+    """
+    if mode not in RETENTION_MODES:
+        raise ValueError(f"Modo de retenção inválido: {mode}")
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    total = 0
+    while True:
+        rows = (db.session.query(Notification.id, Notification.payload_id)
+                .filter(Notification.is_read.is_(True), Notification.created_at < cutoff)
+                .order_by(Notification.id.asc())
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+
+        ids = [row[0] for row in rows]
+        payload_ids = {row[1] for row in rows}
+
+        if mode == 'archive':
+            archived = select(
+                Notification.id,
+                Notification.user_id,
+                Notification.payload_id,
+                Notification.created_at,
+                Notification.count,
+                Notification.last_at,
+                literal(datetime.utcnow()),
+            ).where(Notification.id.in_(ids))
+            db.session.execute(insert(NotificationArchive.__table__).from_select(
+                ['nar_id', 'nar_user_id', 'nar_payload_id', 'nar_created_at',
+                 'nar_count', 'nar_last_at', 'nar_archived_at'],
+                archived
+            ))
+
+        db.session.query(Notification).filter(Notification.id.in_(ids)).delete(synchronize_session=False)
+        if mode == 'purge':
+            delete_orphan_payloads(payload_ids)
+        db.session.commit()
+        total += len(ids)
+
+    return total
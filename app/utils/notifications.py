@@ -0,0 +1,330 @@
+# app/utils/notifications.py
+"""
+Entrega das notificações em tempo real.
+
+Em vez de cada aba aberta perguntar periodicamente por novidades, o
+cabeçalho mantém um stream SSE (notifications.stream). O stream só vai ao
+banco quando recebe um sinal no canal do usuário:
+
+- 'created': há notificações novas; envia apenas as que ainda não foram
+  entregues (id maior que o último enviado) e o total de não lidas.
+- 'changed': notificações foram lidas/apagadas; envia a lista recente de novo.
+
+Os sinais passam pelo broker de eventos (extensions.broker), então chegam a
+todos os workers quando o backend 'sqlite' está em uso. Quem grava as
+notificações chama announce_* depois do commit.
+
+O total de não lidas fica em tb_users.usr_unread_notifications, atualizado
+com bump_unread na mesma transação que cria, lê ou apaga notificações; o
+badge é só a leitura dessa coluna. `reconcile_unread_counters` recalcula
+tudo a partir de tb_notifications.
+
+O texto de cada notificação fica uma única vez em tb_notification_payloads;
+cada destinatário é uma linha estreita em tb_notification_recipients
+(modelo Notification: usuário, payload, lida/não lida). Avisos para todos os
+administradores (denúncias, recursos) gravam um payload e os destinatários
+com um INSERT ... SELECT sobre tb_users (notify_admins), agendado em segundo
+plano a partir das rotas com notify_admins_async. Avisos repetidos sobre o
+mesmo item (group_key) são agrupados numa única linha por administrador,
+com contador.
+"""
+import queue
+from datetime import datetime
+from sqlalchemy import func, select, insert, literal
+from ..models import db, Notification, NotificationPayload, NotificationArchive, Usuario
+from ..extensions import broker, jobs
+from .realtime import format_sse
+from .identity import invalidate_identity, invalidate_all_identities
+
+# Quantidade de notificações exibidas no dropdown do cabeçalho
+RECENT_LIMIT = 10
+
+
+def notifications_channel(user_id):
+    return f'notifications:{user_id}'
+
+
+def serialize_notification(notification):
+    return {
+        'id': notification.id,
+        'type': notification.type,
+        'title': notification.title,
+        'message': notification.message,
+        'link': notification.link,
+        'is_read': notification.is_read,
+        'count': notification.count,
+        'last_at': notification.last_at.isoformat() if notification.last_at else None,
+        'created_at': notification.created_at.isoformat() if notification.created_at else None
+    }
+
+
+def count_unread(user_id):
+    """Total de não lidas do usuário (contador desnormalizado)"""
+    return db.session.query(Usuario.unread_notifications).filter(Usuario.id == user_id).scalar() or 0
+
+
+def bump_unread(user_ids, delta=1):
+    """Soma delta ao contador de não lidas de cada usuário (sem commit).
+
+    O snapshot da sessão (utils.identity) é invalidado por announce_* depois
+    do commit; antes dele, outra requisição guardaria o valor antigo.
+    """
+    user_ids = list(user_ids)
+    if not user_ids or not delta:
+        return
+    db.session.query(Usuario).filter(Usuario.id.in_(user_ids)).update(
+        {Usuario.unread_notifications: Usuario.unread_notifications + delta},
+        synchronize_session=False
+    )
+
+
+def create_notification(user_id, type, title, message, link=None):
+    """Cria uma notificação para um usuário (payload + destinatário, sem commit)"""
+    payload = NotificationPayload(type=type, title=title, message=message, link=link)
+    notification = Notification(user_id=user_id, payload=payload, is_read=False)
+    db.session.add(notification)
+    bump_unread([user_id])
+    return notification
+
+
+def notify_users(user_ids, type, title, message, link=None):
+    """Cria a mesma notificação para vários usuários, em lote (sem commit).
+
+    Um único payload e um INSERT com todos os destinatários. Chame
+    announce_notifications(user_ids) depois do commit.
+
+    Returns:
+        Lista (sem repetição) dos usuários notificados.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return []
+
+    now = datetime.utcnow()
+    payload = NotificationPayload(type=type, title=title, message=message, link=link, created_at=now)
+    db.session.add(payload)
+    db.session.flush()
+
+    db.session.execute(insert(Notification.__table__), [
+        {'nrc_user_id': user_id, 'nrc_payload_id': payload.id, 'nrc_is_read': False,
+         'nrc_count': 1, 'nrc_created_at': now}
+        for user_id in user_ids
+    ])
+    bump_unread(user_ids)
+    return user_ids
+
+
+def _payload_has_history(payload_id):
+    """True se alguma linha lida ou arquivada aponta para o payload (o texto dele não pode mais mudar)"""
+    read = select(Notification.id).where(Notification.payload_id == payload_id, Notification.is_read.is_(True))
+    archived = select(NotificationArchive.id).where(NotificationArchive.payload_id == payload_id)
+    return db.session.query(read.exists() | archived.exists()).scalar()
+
+
+def notify_admins(type, title, message, link=None, group_key=None):
+    """Cria a mesma notificação para todos os administradores, em lote, e faz commit.
+
+    Um único payload com o texto e um INSERT ... SELECT dos destinatários.
+
+    Com group_key (ex.: 'report:post:42'), avisos sobre o mesmo item são
+    agrupados: o administrador que ainda tem uma notificação não lida da
+    chave só tem o contador (nrc_count) e nrc_last_at atualizados, sem linha
+    nova nem mudança no total de não lidas. Quem já leu recebe uma linha nova.
+
+    O payload da chave só é reaproveitado (com o texto do aviso mais recente)
+    enquanto todas as linhas que apontam para ele estão não lidas; se alguma
+    já foi lida ou arquivada, ele faz parte do histórico e um payload novo é
+    criado para a mesma chave.
+
+    Returns:
+        Número de administradores notificados.
+    """
+    admin_ids = [row[0] for row in db.session.query(Usuario.id).filter(Usuario.is_admin.is_(True)).all()]
+    if not admin_ids:
+        return 0
+
+    now = datetime.utcnow()
+    bumped_ids = []
+    if group_key:
+        group_payloads = select(NotificationPayload.id).where(NotificationPayload.group_key == group_key)
+        unread_in_group = (Notification.payload_id.in_(group_payloads),
+                           Notification.is_read.is_(False),
+                           Notification.user_id.in_(admin_ids))
+        bumped_ids = list({row[0] for row in db.session.query(Notification.user_id)
+                           .filter(*unread_in_group).all()})
+        if bumped_ids:
+            db.session.query(Notification).filter(*unread_in_group).update(
+                {Notification.count: Notification.count + 1, Notification.last_at: now},
+                synchronize_session=False
+            )
+
+    bumped = set(bumped_ids)
+    new_ids = [user_id for user_id in admin_ids if user_id not in bumped]
+
+    payload = None
+    if group_key:
+        payload = (NotificationPayload.query
+                   .filter(NotificationPayload.group_key == group_key)
+                   .order_by(NotificationPayload.id.desc())
+                   .first())
+        if payload is not None and _payload_has_history(payload.id):
+            payload = None
+    if payload is not None:
+        # Só linhas não lidas apontam para ele: atualizar o texto não reescreve o histórico
+        payload.title = title
+        payload.message = message
+        payload.link = link
+    elif new_ids:
+        payload = NotificationPayload(type=type, title=title, message=message, link=link,
+                                      group_key=group_key, created_at=now)
+        db.session.add(payload)
+    db.session.flush()
+
+    if new_ids:
+        rows = select(
+            Usuario.id,
+            literal(payload.id),
+            literal(False),
+            literal(now),
+        ).where(Usuario.id.in_(new_ids))
+        db.session.execute(insert(Notification.__table__).from_select(
+            ['nrc_user_id', 'nrc_payload_id', 'nrc_is_read', 'nrc_created_at'],
+            rows
+        ))
+        bump_unread(new_ids)
+    db.session.commit()
+    announce_notifications(new_ids)
+    for user_id in bumped_ids:
+        announce_notifications_changed(user_id)
+    return len(admin_ids)
+
+
+def notify_admins_async(type, title, message, link=None, group_key=None):
+    """Agenda notify_admins em segundo plano (chamar depois do commit da requisição)"""
+    return jobs.submit(notify_admins, type, title, message, link, group_key)
+
+
+def delete_orphan_payloads(payload_ids=None):
+    """Apaga payloads sem nenhum destinatário, nem no arquivo (sem commit).
+
+    Com payload_ids, verifica só esses; sem, varre a tabela toda.
+    """
+    recipients = select(Notification.id).where(Notification.payload_id == NotificationPayload.id)
+    archived = select(NotificationArchive.id).where(NotificationArchive.payload_id == NotificationPayload.id)
+    query = db.session.query(NotificationPayload).filter(~recipients.exists(), ~archived.exists())
+    if payload_ids is not None:
+        payload_ids = list(payload_ids)
+        if not payload_ids:
+            return 0
+        query = query.filter(NotificationPayload.id.in_(payload_ids))
+    return query.delete(synchronize_session=False)
+
+
+def reconcile_unread_counters():
+    """Recalcula o contador de não lidas dos usuários em que ele divergiu.
+
+    Returns:
+        Número de usuários corrigidos.
+    """
+    unread = (select(func.count(Notification.id))
+              .where(Notification.user_id == Usuario.id, Notification.is_read.is_(False))
+              .scalar_subquery())
+    fixed = db.session.query(Usuario).filter(Usuario.unread_notifications != unread).update(
+        {Usuario.unread_notifications: unread},
+        synchronize_session=False
+    )
+    db.session.commit()
+    if fixed:
+        invalidate_all_identities()
+    return fixed
+
+
+def recent_notifications_payload(user_id, limit=RECENT_LIMIT):
+    """Notificações mais recentes do usuário e o total de não lidas"""
+    notifications = (Notification.query.filter_by(user_id=user_id)
+                     .order_by(Notification.activity_at.desc(), Notification.id.desc())
+                     .limit(limit)
+                     .all())
+    return {
+        'notifications': [serialize_notification(n) for n in notifications],
+        'unread_count': count_unread(user_id)
+    }
+
+
+def announce_notifications(user_ids):
+    """Avisa os streams dos usuários que há notificações novas (chamar após o commit)"""
+    user_ids = set(user_ids)
+    if user_ids:
+        # Contador de não lidas já commitado: o snapshot da sessão pode ser recarregado
+        invalidate_identity(user_ids)
+    for user_id in user_ids:
+        broker.publish(notifications_channel(user_id), 'created', {})
+
+
+def announce_notifications_changed(user_id):
+    """Avisa o stream do usuário que notificações foram lidas/apagadas (chamar após o commit)"""
+    invalidate_identity([user_id])
+    broker.publish(notifications_channel(user_id), 'changed', {})
+
+
+def notification_stream(user_id, keepalive=15):
+    """Gerador SSE das notificações do usuário.
+
+    Envia um 'snapshot' ao conectar e, a partir daí, 'delta' (só as novas +
+    total de não lidas) ou um novo 'snapshot' conforme os sinais recebidos.
+    A sessão do banco é liberada depois de cada consulta, já que a conexão
+    HTTP fica aberta por muito tempo.
+    """
+    channel = notifications_channel(user_id)
+    # Assina antes do snapshot para não perder notificações criadas no meio
+    subscriber = broker.subscribe(channel)
+    try:
+        yield 'retry: 5000\n\n'
+
+        payload = recent_notifications_payload(user_id)
+        db.session.close()
+        last_id = max((n['id'] for n in payload['notifications']), default=0)
+        yield format_sse('snapshot', payload)
+
+        while True:
+            try:
+                message = subscriber.get(timeout=keepalive)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+
+            # Junta os sinais acumulados numa única ida ao banco
+            signals = {message['event']}
+            while True:
+                try:
+                    signals.add(subscriber.get_nowait()['event'])
+                except queue.Empty:
+                    break
+
+            new_notifications = []
+            if 'changed' not in signals:
+                # Uma a mais só para saber se cabe tudo num delta
+                new_notifications = (Notification.query
+                                     .filter(Notification.user_id == user_id, Notification.id > last_id)
+                                     .order_by(Notification.id.asc())
+                                     .limit(RECENT_LIMIT + 1)
+                                     .all())
+                if not new_notifications:
+                    db.session.close()
+                    continue
+
+            if 'changed' in signals or len(new_notifications) > RECENT_LIMIT:
+                payload = recent_notifications_payload(user_id)
+                last_id = max([last_id] + [n['id'] for n in payload['notifications']])
+                event = 'snapshot'
+            else:
+                last_id = new_notifications[-1].id
+                payload = {
+                    'notifications': [serialize_notification(n) for n in new_notifications],
+                    'unread_count': count_unread(user_id)
+                }
+                event = 'delta'
+            db.session.close()
+            yield format_sse(event, payload)
+    finally:
+        broker.unsubscribe(channel, subscriber)
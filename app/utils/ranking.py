@@ -0,0 +1,86 @@
+# app/utils/ranking.py
+"""
+Pontuação "em alta" (hot) dos posts de comunidade.
+
+A pontuação segue a ideia do ranking do Reddit:
+
+    score = log10(max(curtidas + 2 * comentários, 1)) + idade / HOT_GRAVITY
+
+`idade` são os segundos desde uma época fixa, então a pontuação de um post
+não muda com o passar do tempo — o decaimento vem de posts novos nascerem
+com pontuação maior (a cada HOT_GRAVITY segundos, um post precisa de 10x
+mais engajamento para empatar com um mais novo). Por isso o valor pode ser
+gravado em post_hot_score e só precisa ser recalculado quando curtidas ou
+comentários mudam; a leitura é uma consulta ordenada pelo índice
+(community_id, hot_score, id), igual ao feed cronológico.
+"""
+import math
+from datetime import datetime
+from sqlalchemy import bindparam
+from ..models import db, CommunityPost
+
+# Segundos para o peso de um post cair uma ordem de grandeza (12,5 horas)
+HOT_GRAVITY = 45000
+
+# Um comentário pesa mais do que uma curtida
+COMMENT_WEIGHT = 2
+
+# Época fixa para manter os valores pequenos
+HOT_EPOCH = datetime(2024, 1, 1)
+
+# Quantidade de posts recalculados por transação em rebuild_hot_scores
+REBUILD_BATCH_SIZE = 500
+
+
+def hot_score(likes, comments, created_at):
+    """Pontuação hot de um post a partir do engajamento e da data de criação"""
+    engagement = (likes or 0) + COMMENT_WEIGHT * (comments or 0)
+    order = math.log10(max(engagement, 1))
+    age = (created_at - HOT_EPOCH).total_seconds()
+    return round(order + age / HOT_GRAVITY, 7)
+
+
+def refresh_hot_scores(post_ids):
+    """Recalcula post_hot_score dos posts informados a partir dos contadores (sem commit)"""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return 0
+
+    rows = (db.session.query(CommunityPost.id, CommunityPost.like_total,
+                             CommunityPost.comment_total, CommunityPost.created_at)
+            .filter(CommunityPost.id.in_(post_ids))
+            .all())
+    if not rows:
+        return 0
+
+    table = CommunityPost.__table__
+    stmt = (table.update()
+            .where(table.c.post_id == bindparam('b_post_id'))
+            .values(post_hot_score=bindparam('b_score')))
+    db.session.execute(stmt, [
+        {'b_post_id': post_id, 'b_score': hot_score(likes, comments, created_at)}
+        for post_id, likes, comments, created_at in rows
+    ])
+    return len(rows)
+
+
+def rebuild_hot_scores(batch_size=REBUILD_BATCH_SIZE):
+    """Recalcula a pontuação de todos os posts, em lotes com commit.
+
+    Returns:
+        Número de posts recalculados.
+    """
+    total = 0
+    last_id = 0
+    while True:
+        ids = [row[0] for row in db.session.query(CommunityPost.id)
+               .filter(CommunityPost.id > last_id)
+               .order_by(CommunityPost.id.asc())
+               .limit(batch_size)
+               .all()]
+        if not ids:
+            break
+        total += refresh_hot_scores(ids)
+        db.session.commit()
+        last_id = ids[-1]
+    return total
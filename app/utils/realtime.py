@@ -0,0 +1,205 @@
+# app/utils/realtime.py
+"""
+Broker de eventos em tempo real (pub/sub) usado pelos streams SSE.
+
+Os assinantes são filas em memória do próprio processo. O backend define
+como uma publicação chega até elas:
+
+- 'memory': entrega direta, só enxerga assinantes do mesmo processo.
+- 'sqlite': a publicação é gravada num arquivo SQLite local e cada processo
+  (worker) lê as novas linhas em segundo plano, então todos os workers da
+  máquina recebem o evento.
+
+Configuração: REALTIME_BACKEND ('memory' | 'sqlite') e REALTIME_SQLITE_PATH.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+# Eventos pendentes por assinante; se um cliente lento encher a fila, os
+# eventos excedentes são descartados em vez de travar quem publica
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class MemoryBackend:
+    """Entrega os eventos diretamente aos assinantes do processo atual"""
+
+    def start(self, dispatch):
+        self._dispatch = dispatch
+
+    def publish(self, channel, message):
+        self._dispatch(channel, message)
+
+
+class SQLiteBackend:
+    """Compartilha os eventos entre processos por uma tabela SQLite local"""
+
+    # Intervalo de leitura de novos eventos (segundos)
+    POLL_INTERVAL = 0.5
+    # Eventos mais antigos que isso são apagados (segundos)
+    RETENTION = 60
+
+    def __init__(self, path):
+        self.path = path
+        self._thread = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def start(self, dispatch):
+        self._dispatch = dispatch
+        db_dir = os.path.dirname(self.path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+
+        conn = self._connect()
+        try:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS tb_realtime_events ('
+                'evt_id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'evt_channel VARCHAR(100) NOT NULL, '
+                'evt_payload TEXT NOT NULL, '
+                'evt_created_at REAL NOT NULL)'
+            )
+            conn.commit()
+            # Só interessam os eventos publicados a partir de agora
+            self._last_id = conn.execute('SELECT COALESCE(MAX(evt_id), 0) FROM tb_realtime_events').fetchone()[0]
+        finally:
+            conn.close()
+
+        self._thread = threading.Thread(target=self._poll_loop, name='realtime-sqlite-poller', daemon=True)
+        self._thread.start()
+
+    def publish(self, channel, message):
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT INTO tb_realtime_events (evt_channel, evt_payload, evt_created_at) VALUES (?, ?, ?)',
+                (channel, json.dumps(message), time.time())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _poll_loop(self):
+        conn = self._connect()
+        last_cleanup = time.time()
+        while True:
+            try:
+                rows = conn.execute(
+                    'SELECT evt_id, evt_channel, evt_payload FROM tb_realtime_events '
+                    'WHERE evt_id > ? ORDER BY evt_id',
+                    (self._last_id,)
+                ).fetchall()
+                for evt_id, channel, payload in rows:
+                    self._last_id = evt_id
+                    self._dispatch(channel, json.loads(payload))
+
+                if time.time() - last_cleanup > self.RETENTION:
+                    conn.execute('DELETE FROM tb_realtime_events WHERE evt_created_at < ?', (time.time() - self.RETENTION,))
+                    conn.commit()
+                    last_cleanup = time.time()
+            except sqlite3.Error as e:
+                print(f"⚠️  Erro ao ler eventos em tempo real: {e}")
+            time.sleep(self.POLL_INTERVAL)
+
+
+class EventBroker:
+    """Pub/sub por canal com backend plugável (padrão init_app das extensões)"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._listeners = defaultdict(list)
+        self._lock = threading.Lock()
+        self.backend = None
+
+    def init_app(self, app):
+        backend_name = app.config.get('REALTIME_BACKEND', 'memory')
+        if backend_name == 'sqlite':
+            self.backend = SQLiteBackend(app.config['REALTIME_SQLITE_PATH'])
+        elif backend_name == 'memory':
+            self.backend = MemoryBackend()
+        else:
+            raise ValueError(f"REALTIME_BACKEND inválido: {backend_name}")
+        self.backend.start(self._dispatch)
+
+    def subscribe(self, channel):
+        """Registra um assinante e retorna a fila que receberá os eventos"""
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[channel].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def listen(self, channel, callback):
+        """Registra um callback(event, data) chamado neste processo a cada evento do canal"""
+        with self._lock:
+            self._listeners[channel].append(callback)
+
+    def publish(self, channel, event, data):
+        """Publica um evento ({'event': ..., 'data': ...}) no canal"""
+        if self.backend is None:
+            return
+        try:
+            self.backend.publish(channel, {'event': event, 'data': data})
+        except Exception as e:
+            # Tempo real é um complemento: nunca derrubar a requisição que publicou
+            print(f"⚠️  Erro ao publicar evento {event} em {channel}: {e}")
+
+    def _dispatch(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+            listeners = list(self._listeners.get(channel, ()))
+        for callback in listeners:
+            try:
+                callback(message['event'], message['data'])
+            except Exception as e:
+                print(f"⚠️  Erro no listener de {channel}: {e}")
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                pass
+
+
+def sse_stream(broker, channel, keepalive=15):
+    """Gerador de Server-Sent Events para um canal do broker.
+
+    Não usa o banco: quem chama deve fazer as verificações de acesso e
+    liberar a sessão antes de começar a transmitir.
+    """
+    subscriber = broker.subscribe(channel)
+    try:
+        # Indica ao navegador o intervalo de reconexão
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                message = subscriber.get(timeout=keepalive)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            yield format_sse(message['event'], message['data'])
+    finally:
+        broker.unsubscribe(channel, subscriber)
+
+
+def format_sse(event, data):
+    """Formata um evento no protocolo Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def community_channel(community_id):
+    return f'community:{community_id}'
@@ -0,0 +1,107 @@
+# app/utils/reported_items.py
+"""
+Itens denunciados (Report.reported_type + Report.reported_id).
+
+REPORTED_MODELS é o registro único tipo → modelo usado por todas as rotas de
+denúncia. `attach_reported_items` carrega os itens de uma lista de denúncias
+agrupando por tipo: uma consulta IN (...) por tipo presente, em vez de uma
+consulta por denúncia.
+
+`pending_items_by_priority` monta a visão por prioridade da moderação: as
+denúncias pendentes (índice ix_reports_status_created) agrupadas por item no
+próprio banco, com a contagem, ordenadas da maior para a menor.
+"""
+from collections import defaultdict, namedtuple
+from sqlalchemy import func
+from ..models import db, Report, CommunityPost, Content, Usuario, CommunityPostComment, Community
+
+REPORTED_MODELS = {
+    'post': CommunityPost,
+    'content': Content,
+    'user': Usuario,
+    'comment': CommunityPostComment,
+    'community': Community,
+}
+
+# Ids por consulta IN (limite de parâmetros do SQLite)
+LOAD_CHUNK_SIZE = 500
+
+
+def get_reported_model(reported_type):
+    """Modelo do tipo de denúncia, ou None se o tipo não existe"""
+    return REPORTED_MODELS.get(reported_type)
+
+
+def load_reported_item(reported_type, reported_id):
+    """Item denunciado, ou None se o tipo é inválido ou o item não existe"""
+    model = get_reported_model(reported_type)
+    if model is None:
+        return None
+    return db.session.get(model, reported_id)
+
+
+def load_reported_items(keys):
+    """Carrega vários itens de uma vez.
+
+    Args:
+        keys: pares (reported_type, reported_id).
+
+    Returns:
+        Dicionário {(reported_type, reported_id): item} só com os itens encontrados.
+    """
+    ids_by_type = defaultdict(set)
+    for reported_type, reported_id in keys:
+        if reported_type in REPORTED_MODELS:
+            ids_by_type[reported_type].add(reported_id)
+
+    items = {}
+    for reported_type, ids in ids_by_type.items():
+        model = REPORTED_MODELS[reported_type]
+        ids = sorted(ids)
+        for start in range(0, len(ids), LOAD_CHUNK_SIZE):
+            chunk = ids[start:start + LOAD_CHUNK_SIZE]
+            for item in model.query.filter(model.id.in_(chunk)).all():
+                items[(reported_type, item.id)] = item
+    return items
+
+
+def attach_reported_items(reports):
+    """Preenche report.reported_item em cada denúncia (None se o item sumiu)"""
+    items = load_reported_items((report.reported_type, report.reported_id) for report in reports)
+    for report in reports:
+        report.reported_item = items.get((report.reported_type, report.reported_id))
+    return reports
+
+
+# Um item com denúncias pendentes na visão por prioridade
+PendingItem = namedtuple('PendingItem', [
+    'reported_type', 'reported_id', 'report_count', 'first_reported_at', 'last_reported_at',
+    'latest_report_id', 'item'
+])
+
+
+def pending_items_by_priority(limit, offset=0):
+    """Itens com denúncias pendentes, do mais denunciado para o menos.
+
+    Empates ficam com a denúncia mais recente primeiro. Cada PendingItem traz o
+    item carregado (None se ele já foi apagado).
+    """
+    report_count = func.count(Report.id).label('report_count')
+    last_reported_at = func.max(Report.created_at).label('last_reported_at')
+    rows = (db.session.query(
+                Report.reported_type,
+                Report.reported_id,
+                report_count,
+                func.min(Report.created_at),
+                last_reported_at,
+                func.max(Report.id))
+            .filter(Report.status == 'pending')
+            .group_by(Report.reported_type, Report.reported_id)
+            .order_by(report_count.desc(), last_reported_at.desc(),
+                      Report.reported_type, Report.reported_id)
+            .limit(limit)
+            .offset(offset)
+            .all())
+
+    items = load_reported_items((row[0], row[1]) for row in rows)
+    return [PendingItem(*row, item=items.get((row[0], row[1]))) for row in rows]
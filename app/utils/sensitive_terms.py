@@ -0,0 +1,317 @@
+# app/utils/sensitive_terms.py
+"""
+Varredura automática de termos sensíveis.
+
+Os administradores mantêm a lista em tb_sensitive_terms (reports.sensitive_terms).
+A lista é compilada uma vez num autômato de Aho-Corasick, que encontra todos
+os termos de uma só passada pelo texto — O(tamanho do texto + ocorrências),
+independente de quantos termos existem. O autômato fica em memória e é
+recompilado quando a lista muda (invalidação repassada aos demais workers
+pelo broker de eventos).
+
+Os termos casam com palavras inteiras do texto normalizado (minúsculas, sem
+acentos nem pontuação, ver spam.normalize_text): "vaca" não casa com
+"vacation". Os resultados alimentam as marcações que já existem:
+
+- posts: ocultados (is_hidden, sem hidden_by: ocultação automática);
+- comunidades: filtradas (is_filtered + filter_reason);
+- comentários: não têm marcação própria, então os administradores são
+  avisados.
+
+Além da verificação na escrita, `rescan_existing` revarre as linhas já
+gravadas com um pool de processos (`flask scan-sensitive-terms`).
+"""
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from flask import url_for, has_request_context
+from ..models import db, SensitiveTerm, CommunityPost, CommunityPostComment, Community, Usuario
+from ..extensions import broker
+from .notifications import notify_admins, notify_admins_async
+from .spam import normalize_text
+
+INVALIDATION_CHANNEL = 'cache:sensitive_terms'
+
+# Linhas lidas do banco por lote na revarredura
+RESCAN_BATCH_SIZE = 500
+
+
+class TermAutomaton:
+    """Autômato de Aho-Corasick sobre termos normalizados (palavras inteiras)"""
+
+    def __init__(self, terms):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for term in terms:
+            self._add(term)
+        self._build_failure_links()
+
+    def _add(self, term):
+        # Espaços nas pontas: o termo só casa com palavras inteiras do texto
+        state = 0
+        for char in f' {term} ':
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state] = self._output[state] + (term,)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def __bool__(self):
+        return len(self._goto) > 1
+
+    def search(self, text):
+        """Conjunto dos termos presentes no texto"""
+        found = set()
+        if not text or not self:
+            return found
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in f' {normalize_text(text)} ':
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+_automaton_lock = threading.Lock()
+_automaton = None
+
+
+def get_automaton():
+    """Autômato da lista atual (compilado na primeira chamada após cada mudança)"""
+    global _automaton
+    automaton = _automaton
+    if automaton is None:
+        with _automaton_lock:
+            if _automaton is None:
+                terms = [row[0] for row in db.session.query(SensitiveTerm.term).all()]
+                _automaton = TermAutomaton(terms)
+            automaton = _automaton
+    return automaton
+
+
+def _apply_invalidation(event, data):
+    global _automaton
+    with _automaton_lock:
+        _automaton = None
+
+
+def invalidate_terms():
+    """Chamar depois de alterar a lista de termos"""
+    _apply_invalidation('terms', {})
+    broker.publish(INVALIDATION_CHANNEL, 'terms', {})
+
+
+broker.listen(INVALIDATION_CHANNEL, _apply_invalidation)
+
+
+def add_term(raw_term, user_id=None):
+    """Cadastra um termo (com commit). Retorna o termo normalizado, ou None se vazio/repetido."""
+    term = normalize_text(raw_term)
+    if not term or SensitiveTerm.query.filter_by(term=term).first():
+        return None
+    db.session.add(SensitiveTerm(term=term, created_by=user_id))
+    db.session.commit()
+    invalidate_terms()
+    return term
+
+
+def remove_term(term_id):
+    """Remove um termo (com commit). Retorna True se existia."""
+    deleted = SensitiveTerm.query.filter_by(id=term_id).delete(synchronize_session=False)
+    db.session.commit()
+    invalidate_terms()
+    return bool(deleted)
+
+
+def find_terms(*texts):
+    """Termos da lista presentes em qualquer um dos textos, em ordem alfabética"""
+    automaton = get_automaton()
+    found = set()
+    for text in texts:
+        found |= automaton.search(text)
+    return sorted(found)
+
+
+def _filter_reason(terms):
+    return f"Termos sensíveis: {', '.join(terms)}"[:255]
+
+
+def screen_post_terms(post, author):
+    """Oculta o post se ele contém termos sensíveis (sem commit). Retorna os termos encontrados."""
+    if author.is_admin:
+        return []
+    terms = find_terms(post.content)
+    if terms and not post.is_hidden:
+        post.is_hidden = True
+        post.hidden_by = None
+        post.hidden_at = datetime.utcnow()
+    return terms
+
+
+def screen_community_terms(community, author):
+    """Marca a comunidade como filtrada se nome/descrição têm termos sensíveis (sem commit)"""
+    if author.is_admin:
+        return []
+    terms = find_terms(community.name, community.description)
+    if terms:
+        community.is_filtered = True
+        community.filter_reason = _filter_reason(terms)
+    return terms
+
+
+def screen_comment_terms(comment, author):
+    """Termos sensíveis do comentário (comentários não têm marcação; quem chama avisa os administradores)"""
+    if author.is_admin:
+        return []
+    return find_terms(comment.text)
+
+
+SENSITIVE_KIND_LABELS = {
+    'post': ('Post ocultado', 'O post'),
+    'comment': ('Comentário sinalizado', 'O comentário'),
+    'community': ('Comunidade filtrada', 'A comunidade'),
+}
+
+
+def announce_sensitive_terms(kind, item_id, terms, link=None):
+    """Avisa os administradores sobre um item com termos sensíveis (chamar depois do commit)"""
+    title, subject = SENSITIVE_KIND_LABELS[kind]
+    notify_admins_async(
+        'sensitive_terms',
+        f"{title}: termos sensíveis",
+        f"{subject} {item_id} contém: {', '.join(terms)}.",
+        link,
+        group_key=f'terms:{kind}:{item_id}'
+    )
+
+
+# --- Revarredura em lote (pool de processos) ---
+
+_worker_automaton = None
+
+
+def _init_worker(terms):
+    global _worker_automaton
+    _worker_automaton = TermAutomaton(terms)
+
+
+def _scan_chunk(rows):
+    """Executado nos processos do pool: [(id, (textos...))] -> [(id, termos)]"""
+    matches = []
+    for item_id, texts in rows:
+        found = set()
+        for text in texts:
+            found |= _worker_automaton.search(text)
+        if found:
+            matches.append((item_id, sorted(found)))
+    return matches
+
+
+def _iter_batches(query, id_column, batch_size):
+    last_id = 0
+    while True:
+        rows = query.filter(id_column > last_id).order_by(id_column.asc()).limit(batch_size).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield [(row[0], tuple(row[1:])) for row in rows]
+
+
+def rescan_existing(workers=4, batch_size=RESCAN_BATCH_SIZE):
+    """Revarre posts visíveis, comunidades não filtradas e comentários com a lista atual.
+
+    Como na gravação, itens de administradores (autor, dono, quem comentou)
+    ficam de fora.
+
+    A leitura do banco e as marcações ficam no processo principal; a busca
+    dos termos roda em `workers` processos. Posts encontrados são ocultados,
+    comunidades filtradas; os comentários encontrados geram um único aviso
+    aos administradores.
+
+    Returns:
+        Dicionário {'post': n, 'community': n, 'comment': n} com os itens encontrados.
+    """
+    terms = [row[0] for row in db.session.query(SensitiveTerm.term).all()]
+    totals = {'post': 0, 'community': 0, 'comment': 0}
+    if not terms:
+        return totals
+
+    # Mesma política da gravação (screen_*_terms): itens de administradores não são avaliados
+    sources = {
+        'post': (db.session.query(CommunityPost.id, CommunityPost.content)
+                 .join(Usuario, Usuario.id == CommunityPost.author_id)
+                 .filter(CommunityPost.is_hidden.is_(False), Usuario.is_admin.is_(False)), CommunityPost.id),
+        'community': (db.session.query(Community.id, Community.name, Community.description)
+                      .join(Usuario, Usuario.id == Community.owner_id)
+                      .filter(Community.is_filtered.is_(False), Usuario.is_admin.is_(False)), Community.id),
+        'comment': (db.session.query(CommunityPostComment.id, CommunityPostComment.text)
+                    .join(Usuario, Usuario.id == CommunityPostComment.user_id)
+                    .filter(Usuario.is_admin.is_(False)), CommunityPostComment.id),
+    }
+
+    flagged_comments = []
+
+    def apply(kind, matches):
+        if not matches:
+            return
+        totals[kind] += len(matches)
+        if kind == 'post':
+            CommunityPost.query.filter(CommunityPost.id.in_([item_id for item_id, _ in matches])).update(
+                {CommunityPost.is_hidden: True, CommunityPost.hidden_at: datetime.utcnow()},
+                synchronize_session=False
+            )
+        elif kind == 'community':
+            for item_id, found in matches:
+                Community.query.filter(Community.id == item_id).update(
+                    {Community.is_filtered: True, Community.filter_reason: _filter_reason(found)},
+                    synchronize_session=False
+                )
+        else:
+            flagged_comments.extend(item_id for item_id, _ in matches)
+        db.session.commit()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(terms,)) as pool:
+        for kind, (query, id_column) in sources.items():
+            # Poucos lotes em voo por vez: a memória não cresce com o tamanho da tabela
+            in_flight = deque()
+            for batch in _iter_batches(query, id_column, batch_size):
+                in_flight.append(pool.submit(_scan_chunk, batch))
+                if len(in_flight) >= workers * 2:
+                    apply(kind, in_flight.popleft().result())
+            while in_flight:
+                apply(kind, in_flight.popleft().result())
+
+    if totals['community']:
+        from .community_cache import invalidate_catalog
+        invalidate_catalog()
+    if any(totals.values()):
+        message = (f"Revarredura de termos sensíveis: {totals['post']} post(s) ocultado(s), "
+                   f"{totals['community']} comunidade(s) filtrada(s), {totals['comment']} comentário(s) sinalizado(s).")
+        if flagged_comments:
+            shown = ', '.join(str(comment_id) for comment_id in flagged_comments[:20])
+            message += f" Comentários: {shown}{'...' if len(flagged_comments) > 20 else ''}."
+        notify_admins('sensitive_terms', "Revarredura de termos sensíveis", message,
+                      url_for('reports.sensitive_terms') if has_request_context() else None)
+    return totals
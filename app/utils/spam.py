@@ -0,0 +1,199 @@
+# app/utils/spam.py
+"""
+Detecção de spam repetido nos posts das comunidades (quase-duplicatas).
+
+Ondas de spam repostam o mesmo texto com pequenas alterações em várias
+comunidades. Na criação de cada post:
+
+1. O texto é normalizado (minúsculas, sem acentos nem pontuação) e quebrado
+   em shingles de SHINGLE_SIZE caracteres.
+2. A assinatura MinHash (NUM_PERMUTATIONS valores) estima a similaridade de
+   Jaccard entre os conjuntos de shingles.
+3. A assinatura é dividida em LSH_BANDS faixas; o hash de cada faixa é um
+   bucket gravado em tb_post_fingerprints. Posts parecidos caem no mesmo
+   bucket em pelo menos uma faixa com alta probabilidade.
+
+Os candidatos vêm só dos buckets coincidentes (uma busca por índice por
+faixa, limitada à janela recente), nunca de uma comparação com todos os
+posts; a similaridade real é conferida só entre eles. Quando o post repete
+SPAM_DUPLICATE_MIN_MATCHES posts recentes, ele é ocultado (is_hidden, sem
+hidden_by: ocultação automática) ou só sinalizado aos administradores,
+conforme SPAM_DUPLICATE_ACTION.
+
+Os buckets só servem dentro da janela (SPAM_DUPLICATE_WINDOW_HOURS); os
+antigos são apagados com `flask prune-post-fingerprints`.
+"""
+import hashlib
+import random
+import re
+import struct
+import unicodedata
+import zlib
+from datetime import datetime, timedelta
+from flask import current_app, url_for
+from sqlalchemy import and_, insert, or_
+from ..models import db, CommunityPost, PostFingerprint
+from .notifications import notify_admins_async
+
+SHINGLE_SIZE = 5
+
+NUM_PERMUTATIONS = 64
+
+# 16 faixas x 4 linhas: pares com similaridade ~0,5 ou mais já tendem a colidir
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+# Textos curtos demais ("bom dia!") não são avaliados
+MIN_TEXT_LENGTH = 40
+
+# Máximo de candidatos conferidos por post
+MAX_CANDIDATES = 50
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Coeficientes fixos: assinaturas precisam ser comparáveis entre processos e reinícios
+_rng = random.Random(20240101)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def normalize_text(text):
+    """Minúsculas, sem acentos, só letras/dígitos separados por um espaço"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'[^a-z0-9]+', ' ', text.lower()).strip()
+
+
+def shingles(text):
+    """Conjunto de shingles de caracteres do texto normalizado (vazio se curto demais)"""
+    normalized = normalize_text(text)
+    if len(normalized) < MIN_TEXT_LENGTH:
+        return set()
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def minhash_signature(shingle_set):
+    """Assinatura MinHash: para cada permutação, o menor hash entre os shingles"""
+    hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingle_set]
+    return [
+        min(((a * value + b) % _MERSENNE_PRIME) & _MAX_HASH for value in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def lsh_buckets(signature):
+    """Hash (inteiro de 64 bits com sinal) de cada faixa da assinatura"""
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(struct.pack(f'>{LSH_ROWS}I', *rows), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'big', signed=True))
+    return buckets
+
+
+def _window_start():
+    return datetime.utcnow() - timedelta(hours=current_app.config.get('SPAM_DUPLICATE_WINDOW_HOURS', 24))
+
+
+def find_near_duplicates(post_id, shingle_set, buckets):
+    """Ids dos posts recentes quase iguais (candidatos pelos buckets, conferidos por Jaccard)"""
+    same_bucket = or_(*[
+        and_(PostFingerprint.band == band, PostFingerprint.bucket == bucket)
+        for band, bucket in enumerate(buckets)
+    ])
+    # Join com os posts: impressões de posts já apagados não ocupam o limite de candidatos
+    candidate_ids = [row[0] for row in db.session.query(PostFingerprint.post_id)
+                     .join(CommunityPost, CommunityPost.id == PostFingerprint.post_id)
+                     .filter(same_bucket,
+                             PostFingerprint.created_at >= _window_start(),
+                             PostFingerprint.post_id != post_id)
+                     .distinct()
+                     .limit(MAX_CANDIDATES)
+                     .all()]
+    if not candidate_ids:
+        return []
+
+    threshold = current_app.config.get('SPAM_DUPLICATE_SIMILARITY', 0.8)
+    candidates = db.session.query(CommunityPost.id, CommunityPost.content)\
+        .filter(CommunityPost.id.in_(candidate_ids)).all()
+    return sorted(candidate_id for candidate_id, content in candidates
+                  if jaccard(shingle_set, shingles(content)) >= threshold)
+
+
+def screen_new_post(post, author):
+    """Grava a impressão digital do post e aplica a política de spam repetido (sem commit).
+
+    Chamar depois de db.session.add(post). Posts de administradores não são
+    avaliados.
+
+    Returns:
+        Ids dos posts recentes dos quais este é quase-duplicata, quando a
+        política foi acionada; senão, lista vazia.
+    """
+    action = current_app.config.get('SPAM_DUPLICATE_ACTION', 'hide')
+    if action == 'off' or author.is_admin:
+        return []
+
+    shingle_set = shingles(post.content)
+    if not shingle_set:
+        return []
+
+    db.session.flush()
+    buckets = lsh_buckets(minhash_signature(shingle_set))
+    duplicates = find_near_duplicates(post.id, shingle_set, buckets)
+
+    now = datetime.utcnow()
+    db.session.execute(insert(PostFingerprint.__table__), [
+        {'pfp_post_id': post.id, 'pfp_band': band, 'pfp_bucket': bucket, 'pfp_created_at': now}
+        for band, bucket in enumerate(buckets)
+    ])
+
+    if len(duplicates) < current_app.config.get('SPAM_DUPLICATE_MIN_MATCHES', 2):
+        return []
+    if action == 'hide':
+        post.is_hidden = True
+        post.hidden_by = None
+        post.hidden_at = now
+    return duplicates
+
+
+def forget_post_fingerprints(post_ids):
+    """Remove as impressões digitais dos posts (sem commit).
+
+    Chamar ao excluir posts (o SQLite não aplica o ON DELETE CASCADE sem
+    PRAGMA foreign_keys) e antes de avaliar um post de novo após uma edição.
+    post_ids: lista de ids ou um select de ids.
+    """
+    PostFingerprint.query.filter(PostFingerprint.post_id.in_(post_ids)).delete(synchronize_session=False)
+
+
+def announce_duplicate_post(post, duplicates):
+    """Avisa os administradores sobre o post repetido (chamar depois do commit).
+
+    Avisos da mesma onda (mesmo post original) são agrupados numa notificação.
+    """
+    status = 'ocultado automaticamente' if post.is_hidden else 'sinalizado'
+    notify_admins_async(
+        'spam',
+        f"Post repetido {status}",
+        f"O post {post.id} repete {len(duplicates)} post(s) recente(s) (ex.: ID {duplicates[0]}).",
+        url_for('posts.view_post', post_id=post.id),
+        group_key=f'spam:post:{duplicates[0]}'
+    )
+
+
+def prune_fingerprints():
+    """Apaga as impressões digitais de fora da janela de detecção (com commit)"""
+    deleted = PostFingerprint.query.filter(PostFingerprint.created_at < _window_start())\
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -0,0 +1,160 @@
+# app/utils/user_stats.py
+"""
+Contadores do perfil de cada usuário (tb_user_stats).
+
+O perfil exibia usuario.comentarios.count(), likes.count() e
+avaliacoes.count(): três COUNT por visualização. Agora cada usuário tem uma
+linha com os totais de posts, comentários e curtidas em posts, avaliações,
+conteúdos e comunidades criadas:
+
+- cada escrita chama `bump_user_stat` na mesma transação
+  (`UPDATE ... SET col = col + delta`); se o usuário ainda não tem linha,
+  ela é calculada a partir das tabelas;
+- deleções em massa (post com comentários de terceiros, comunidade,
+  conteúdo com avaliações) chamam `recount_user_stats` para os usuários
+  afetados;
+- `rebuild_user_stats` recalcula tudo em lotes (`flask rebuild-user-stats`).
+
+A leitura (`get_user_stats`) passa por um cache em memória invalidado a cada
+alteração (e repassado aos demais workers pelo broker de eventos); o TTL
+curto limita o atraso de uma leitura feita entre a alteração e o commit.
+"""
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import select, func, insert
+from ..models import (db, Usuario, UserStats, CommunityPost, CommunityPostComment, CommunityPostLike,
+                      Rating, Content, Community)
+from ..extensions import broker
+from .cache import TTLCache
+
+INVALIDATION_CHANNEL = 'cache:user_stats'
+
+# Usuários recalculados por transação na reconstrução
+REBUILD_BATCH_SIZE = 500
+
+# Contador → (coluna do usuário na tabela de origem, chave primária da tabela)
+STAT_SOURCES = {
+    'posts': (CommunityPost.author_id, CommunityPost.id),
+    'comments': (CommunityPostComment.user_id, CommunityPostComment.id),
+    'likes': (CommunityPostLike.user_id, CommunityPostLike.id),
+    'ratings': (Rating.user_id, Rating.id),
+    'contents': (Content.user_id, Content.id),
+    'communities': (Community.owner_id, Community.id),
+}
+
+# Dados exibidos no perfil (não depende da sessão do banco)
+UserStatsSnapshot = namedtuple('UserStatsSnapshot', list(STAT_SOURCES))
+
+_stats_cache = TTLCache(maxsize=10000, ttl=60)
+
+
+def _count_subquery(field, user_id_column):
+    user_column, id_column = STAT_SOURCES[field]
+    return (select(func.count(id_column))
+            .where(user_column == user_id_column)
+            .scalar_subquery())
+
+
+def _insert_counts(user_ids):
+    """Grava as linhas dos usuários com contagens feitas nas tabelas de origem (sem commit)"""
+    table = UserStats.__table__
+    counts = select(
+        Usuario.id,
+        *[_count_subquery(field, Usuario.id) for field in STAT_SOURCES],
+        func.current_timestamp()
+    ).where(Usuario.id.in_(user_ids))
+    db.session.execute(table.delete().where(table.c.ust_user_id.in_(user_ids)))
+    db.session.execute(insert(table).from_select(
+        ['ust_user_id', *[f'ust_{field}' for field in STAT_SOURCES], 'ust_updated_at'], counts
+    ))
+
+
+def recount_user_stats(user_ids):
+    """Recalcula os contadores dos usuários informados (sem commit).
+
+    Usar depois de deleções em massa que não passam por bump_user_stat.
+    """
+    user_ids = sorted(set(user_id for user_id in user_ids if user_id is not None))
+    if not user_ids:
+        return 0
+    db.session.flush()
+    _insert_counts(user_ids)
+    invalidate_user_stats(user_ids)
+    return len(user_ids)
+
+
+def bump_user_stat(user_id, field, delta=1):
+    """Soma delta a um contador do usuário (sem commit).
+
+    Chamar depois de db.session.add/delete da linha que alterou o contador.
+    """
+    column = getattr(UserStats, field)
+    updated = db.session.query(UserStats).filter(UserStats.user_id == user_id).update(
+        {column: column + delta, UserStats.updated_at: datetime.utcnow()},
+        synchronize_session=False
+    )
+    if not updated:
+        # Sem linha ainda: a contagem já inclui a alteração pendente (flush)
+        recount_user_stats([user_id])
+        return
+    invalidate_user_stats([user_id])
+
+
+def delete_user_stats(user_id):
+    """Remove a linha do usuário (sem commit), antes de excluir a conta"""
+    UserStats.query.filter(UserStats.user_id == user_id).delete(synchronize_session=False)
+    invalidate_user_stats([user_id])
+
+
+def _load_stats(user_id):
+    row = db.session.query(*[getattr(UserStats, field) for field in STAT_SOURCES])\
+        .filter(UserStats.user_id == user_id).first()
+    if row is None:
+        # Usuário sem linha (ex.: antes da reconstrução): conta sem gravar
+        row = db.session.query(*[_count_subquery(field, user_id) for field in STAT_SOURCES]).one()
+    return UserStatsSnapshot(*row)
+
+
+def get_user_stats(user_id):
+    """Contadores do perfil do usuário (UserStatsSnapshot)"""
+    return _stats_cache.get_or_set(user_id, lambda: _load_stats(user_id))
+
+
+def _apply_invalidation(event, data):
+    for user_id in data['user_ids']:
+        _stats_cache.delete(user_id)
+
+
+def invalidate_user_stats(user_ids):
+    """Descarta os contadores em cache dos usuários (neste e nos demais workers)"""
+    data = {'user_ids': list(user_ids)}
+    _apply_invalidation('users', data)
+    broker.publish(INVALIDATION_CHANNEL, 'users', data)
+
+
+broker.listen(INVALIDATION_CHANNEL, _apply_invalidation)
+
+
+def rebuild_user_stats(batch_size=REBUILD_BATCH_SIZE):
+    """Recalcula os contadores de todos os usuários, em lotes com commit.
+
+    Returns:
+        Número de usuários recalculados.
+    """
+    total = 0
+    last_id = 0
+    while True:
+        ids = [row[0] for row in db.session.query(Usuario.id)
+               .filter(Usuario.id > last_id)
+               .order_by(Usuario.id.asc())
+               .limit(batch_size)
+               .all()]
+        if not ids:
+            break
+        _insert_counts(ids)
+        db.session.commit()
+        invalidate_user_stats(ids)
+        total += len(ids)
+        last_id = ids[-1]
+
+    return total